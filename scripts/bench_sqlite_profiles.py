@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Compare SQLITE_PROFILE settings on autosave writes and asset listing.
+
+Each profile gets a fresh database in a temp directory, seeded with one
+user's assets.  Reported times are per call, in milliseconds.
+
+    python scripts/bench_sqlite_profiles.py --rooms 20 --state-kb 256 --rounds 30
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from server import storage_assets, storage_blobs, storage_db, storage_rooms  # noqa: E402
+from server.storage_models import AssetRow  # noqa: E402
+
+
+def _timed(fn: Callable[[], object], rounds: int) -> List[float]:
+    times: List[float] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return times
+
+
+def _summary(times: List[float]) -> str:
+    ordered = sorted(times)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"median {statistics.median(ordered):8.2f}  p95 {p95:8.2f}"
+
+
+def bench_profile(profile: str, args: argparse.Namespace, workdir: Path) -> Dict[str, List[float]]:
+    engine = storage_db.make_engine(f"sqlite:///{workdir / (profile + '.db')}", profile)
+    SQLModel.metadata.create_all(engine)
+    storage_rooms.set_engine(engine)
+    storage_assets.set_engine(engine)
+
+    with Session(engine) as s:
+        for i in range(args.assets):
+            s.add(
+                AssetRow(
+                    asset_id=f"a{i:06d}",
+                    uploader_user_id=1,
+                    name=f"asset {i}",
+                    folder_path=f"folder{i % 20}",
+                    tags_json=json.dumps(["bench", f"t{i % 7}"]),
+                    mime="image/png",
+                    width=256,
+                    height=256,
+                    url_original=f"/uploads/{i}.png",
+                    url_thumb=f"/uploads/{i}.thumb.png",
+                    created_at=f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}",
+                )
+            )
+        s.commit()
+
+    # Stored the way autosave hands checkpoints to the writer: already compressed.
+    blob = storage_blobs.encode_state_blob(json.dumps({"pad": "x" * (args.state_kb * 1024)}))
+    counter = iter(range(1 << 30))
+
+    def autosave() -> None:
+        round_no = next(counter)
+        states = {f"room{r}": blob for r in range(args.rooms)}
+        journal = [(f"room{r}", round_no, '{"v":1}') for r in range(args.rooms)]
+        storage_rooms.commit_room_writes({}, journal, "now")
+        storage_rooms.commit_room_writes(states, [], "now")
+
+    def list_assets() -> None:
+        storage_assets.list_assets_for_user(1, q="asset 1")
+
+    results = {
+        "autosave": _timed(autosave, args.rounds),
+        "asset list": _timed(list_assets, args.rounds),
+    }
+    engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=sorted(storage_db.SQLITE_PROFILES))
+    parser.add_argument("--rooms", type=int, default=20, help="rooms checkpointed per autosave")
+    parser.add_argument("--state-kb", type=int, default=256, help="size of each room state blob")
+    parser.add_argument("--assets", type=int, default=5000, help="asset rows seeded for the listing query")
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            results = bench_profile(profile, args, Path(tmp))
+            for name, times in results.items():
+                print(f"{profile:<12} {name:<12} {_summary(times)} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Move room checkpoints, journal patches and snapshots between database files.
+
+Set ROOM_STATE_DB_PATH to the file the server should use for room state, stop
+the server, then run:
+
+    ROOM_STATE_DB_PATH=warhamster-rooms.db python scripts/move_room_state.py
+
+``--back`` moves everything into the main database again (run it before
+unsetting ROOM_STATE_DB_PATH).  The move is batched and can be re-run safely
+if it is interrupted.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+from server import storage_db  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--back", action="store_true", help="move room state into the main database")
+    parser.add_argument("--batch-size", type=int, default=50, help="rows per transaction")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the source database afterwards")
+    args = parser.parse_args()
+
+    if storage_db.state_engine is None:
+        raise SystemExit("ROOM_STATE_DB_PATH is not set; there is no separate room state database")
+    storage_db.init_db(allow_unmoved_room_state=True)
+    source, target = storage_db.engine, storage_db.state_engine
+    if args.back:
+        source, target = target, source
+    print(f"Moving room state from {source.url} to {target.url}")
+    moved = storage_db.move_room_state(source, target, batch_size=max(1, args.batch_size))
+    for table, count in moved.items():
+        print(f"  {table}: {count} rows")
+    if args.vacuum:
+        with source.connect() as conn:
+            conn.execute(text("VACUUM"))
+        print(f"Vacuumed {source.url}")
+
+
+if __name__ == "__main__":
+    main()
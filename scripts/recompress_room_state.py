@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Rewrite stored room state and snapshot blobs with the configured compression.
+
+Run it with the server stopped.  Uses ROOM_STATE_COMPRESSION (and
+ROOM_STATE_DB_PATH, if room state lives in its own file) unless overridden:
+
+    python scripts/recompress_room_state.py --codec zlib --level 6 --vacuum
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text  # noqa: E402
+
+from server import storage_blobs, storage_db  # noqa: E402
+
+
+def _mb(nbytes: int) -> str:
+    return f"{nbytes / (1024 * 1024):.2f} MB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--codec", choices=storage_blobs.CODECS, default=None, help="default: ROOM_STATE_COMPRESSION")
+    parser.add_argument("--level", type=int, default=None, help="compression level")
+    parser.add_argument("--batch-size", type=int, default=100, help="rows per transaction")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards so the file actually shrinks")
+    args = parser.parse_args()
+
+    storage_db.init_db()
+    target = storage_db.state_engine or storage_db.engine
+    codec = storage_blobs.effective_codec(args.codec)
+    print(f"Recompressing room state in {target.url} with {codec}")
+    report = storage_blobs.recompress_state_rows(target, codec, args.level, max(1, args.batch_size))
+    before = after = 0
+    for table, totals in report.items():
+        before += totals["bytes_before"]
+        after += totals["bytes_after"]
+        print(
+            f"  {table}: {totals['rows']} rows, {totals['rewritten']} rewritten, "
+            f"{_mb(totals['bytes_before'])} -> {_mb(totals['bytes_after'])}"
+        )
+    saved = before - after
+    pct = (saved / before * 100.0) if before else 0.0
+    print(f"Saved {_mb(saved)} ({pct:.1f}%)")
+    if args.vacuum:
+        with target.connect() as conn:
+            conn.execute(text("VACUUM"))
+        print(f"Vacuumed {target.url}")
+
+
+if __name__ == "__main__":
+    main()
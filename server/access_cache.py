@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+
+# A cached grant is trusted for this long; past it the next event re-checks the DB.
+ROOM_ACCESS_TTL_SECONDS = 30.0
+# Heartbeats re-check grants older than this, so busy sockets never hit the TTL.
+ROOM_ACCESS_REFRESH_SECONDS = 15.0
+
+
+@dataclass
+class RoomAccessCache:
+    """Recent successful websocket access checks keyed by (sid, user_id, room_id).
+
+    Only grants are cached: a denied check closes the socket anyway, and new
+    access must take effect immediately.  The login session id is part of the
+    key, so a socket whose session was revoked cannot ride on a grant that
+    another of the user's sessions keeps refreshing.  Governance paths that
+    can revoke access call ``invalidate`` so the next event re-checks the
+    database.
+    """
+
+    ttl_seconds: float = ROOM_ACCESS_TTL_SECONDS
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    _checked_at: Dict[Tuple[str, int, str], float] = field(default_factory=dict)
+
+    def allowed(
+        self, sid: str, user_id: int, room_id: str, max_age: Optional[float] = None, now: Optional[float] = None
+    ) -> bool:
+        """True if access was granted within ``max_age`` (default: the TTL)."""
+        checked_at = self._checked_at.get((sid, user_id, room_id))
+        now = time.monotonic() if now is None else now
+        if checked_at is not None and now - checked_at < (self.ttl_seconds if max_age is None else max_age):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def remember(self, sid: str, user_id: int, room_id: str, now: Optional[float] = None) -> None:
+        self._checked_at[(sid, user_id, room_id)] = time.monotonic() if now is None else now
+
+    def invalidate(self, user_id: Optional[int] = None, room_id: Optional[str] = None, sid: Optional[str] = None) -> None:
+        """Forget grants matching every given filter (user, room, login session), or everything."""
+        stale = [
+            key
+            for key in self._checked_at
+            if (sid is None or key[0] == sid) and (user_id is None or key[1] == user_id) and (room_id is None or key[2] == room_id)
+        ]
+        for key in stale:
+            del self._checked_at[key]
+        self.invalidations += 1
+
+    def forget(self, sid: str, user_id: int, room_id: str) -> None:
+        """Drop one entry without counting it as a revocation (socket closed)."""
+        self._checked_at.pop((sid, user_id, room_id), None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._checked_at),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -17,9 +17,10 @@ from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile, Web
 from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 
+from .access_cache import ROOM_ACCESS_REFRESH_SECONDS, RoomAccessCache
 from .auth_helpers import (
     LEGACY_SESSION_COOKIE,
-    PASSWORD_CONTEXT,
+    PasswordHasher,
     SESSION_COOKIE,
     auth_logout_response,
     auth_success_response,
@@ -29,8 +30,10 @@ from .auth_helpers import (
     require_user,
     ws_user,
 )
+from .env import env_int
 from .models import RoomState, WireEvent
 from .rooms import RoomManager
+from .send_queue import encode_frame
 from .session_helpers import (
     broadcast_session_event,
     broadcast_session_notice,
@@ -52,6 +55,7 @@ from .upload_helpers import (
     save_asset_upload,
     save_background_upload,
 )
+from .wire import PACKED_SUBPROTOCOL, decode_packed_event, decode_wire_event, encode_event
 from .storage import (
     count_private_pack_asset_rows,
     add_game_session_member,
@@ -146,6 +150,7 @@ from .storage import (
     delete_private_pack_row,
     delete_game_session_shared_pack_rows,
 )
+from .storage_writer import stats as storage_writer_stats
 
 app = FastAPI(title="WarHamster")
 logger = logging.getLogger("warhamster")
@@ -165,25 +170,14 @@ MAX_BACKGROUND_UPLOAD_BYTES = 10 * 1024 * 1024
 MAX_ASSET_UPLOAD_BYTES = 20 * 1024 * 1024
 
 
-def _env_int(name: str, default: int) -> int:
-    raw = os.getenv(name, "").strip()
-    if not raw:
-        return default
-    try:
-        val = int(raw)
-    except ValueError:
-        return default
-    return val if val > 0 else default
-
-
 # ZIP import limits are intentionally configurable for large GM asset packs.
-MAX_ZIP_UPLOAD_BYTES = _env_int("MAX_ZIP_UPLOAD_BYTES", 512 * 1024 * 1024)
-MAX_ZIP_ASSET_FILES = _env_int("MAX_ZIP_ASSET_FILES", 2000)
-MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES = _env_int("MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES", 1024 * 1024 * 1024)
-MAX_OFFICIAL_IMPORT_UPLOAD_BYTES = _env_int("MAX_OFFICIAL_IMPORT_UPLOAD_BYTES", 8 * 1024 * 1024 * 1024)
-OFFICIAL_IMPORT_CHUNK_BYTES = _env_int("OFFICIAL_IMPORT_CHUNK_BYTES", 8 * 1024 * 1024)
-MAX_OFFICIAL_IMPORT_ASSET_FILES = _env_int("MAX_OFFICIAL_IMPORT_ASSET_FILES", 25000)
-MAX_OFFICIAL_IMPORT_UNCOMPRESSED_BYTES = _env_int("MAX_OFFICIAL_IMPORT_UNCOMPRESSED_BYTES", 16 * 1024 * 1024 * 1024)
+MAX_ZIP_UPLOAD_BYTES = env_int("MAX_ZIP_UPLOAD_BYTES", 512 * 1024 * 1024)
+MAX_ZIP_ASSET_FILES = env_int("MAX_ZIP_ASSET_FILES", 2000)
+MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES = env_int("MAX_ZIP_TOTAL_UNCOMPRESSED_BYTES", 1024 * 1024 * 1024)
+MAX_OFFICIAL_IMPORT_UPLOAD_BYTES = env_int("MAX_OFFICIAL_IMPORT_UPLOAD_BYTES", 8 * 1024 * 1024 * 1024)
+OFFICIAL_IMPORT_CHUNK_BYTES = env_int("OFFICIAL_IMPORT_CHUNK_BYTES", 8 * 1024 * 1024)
+MAX_OFFICIAL_IMPORT_ASSET_FILES = env_int("MAX_OFFICIAL_IMPORT_ASSET_FILES", 25000)
+MAX_OFFICIAL_IMPORT_UNCOMPRESSED_BYTES = env_int("MAX_OFFICIAL_IMPORT_UNCOMPRESSED_BYTES", 16 * 1024 * 1024 * 1024)
 
 # Static assets (still routed through FastAPI so middleware can protect them)
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR), check_dir=False), name="static")
@@ -191,6 +185,8 @@ app.mount("/packs", StaticFiles(directory=str(PACKS_DIR), check_dir=False), name
 app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR), check_dir=False), name="uploads")
 
 rm = RoomManager()
+room_access_cache = RoomAccessCache()
+password_hasher = PasswordHasher()
 HEARTBEAT_TIMEOUT_SECONDS = 35.0
 LOG = logging.getLogger("warhamster.ws")
 HAS_MULTIPART = importlib.util.find_spec("multipart") is not None
@@ -542,7 +538,7 @@ async def _broadcast_session_notice(session_id: str, message: str) -> None:
 
 async def _send_ws_safe(ws: WebSocket, event: WireEvent) -> None:
     try:
-        await asyncio.wait_for(ws.send_text(event.model_dump_json()), timeout=5.0)
+        await asyncio.wait_for(ws.send_text(encode_event(event)), timeout=5.0)
     except Exception:
         pass
 
@@ -560,8 +556,9 @@ async def _broadcast_governance(user_ids: "set[int]", event: WireEvent) -> None:
 
 async def _broadcast_to_session_rooms(session_id: str, event: WireEvent) -> None:
     """Broadcast to ALL sockets in session rooms regardless of current membership."""
+    frame = encode_frame(event)
     tasks = [
-        rm.broadcast(rm._rooms[r["room_id"]], event)
+        rm.broadcast(rm._rooms[r["room_id"]], frame)
         for r in list_game_session_rooms(session_id)
         if r["room_id"] in rm._rooms
     ]
@@ -667,6 +664,20 @@ def _room_access_still_valid(user_id: int, room_id: str) -> bool:
     return is_member(user_id, room_id)
 
 
+def _ws_access_revalidate(sid: str, user_id: int, room_id: str) -> bool:
+    return bool(get_user_by_sid(sid)) and _room_access_still_valid(user_id, room_id)
+
+
+async def _ws_access_still_valid(sid: str, user_id: int, room_id: str, max_age: float | None = None) -> bool:
+    """Cached per-event websocket access check; only a stale or revoked grant touches the DB, off the loop."""
+    if room_access_cache.allowed(sid, user_id, room_id, max_age):
+        return True
+    if not await asyncio.to_thread(_ws_access_revalidate, sid, user_id, room_id):
+        return False
+    room_access_cache.remember(sid, user_id, room_id)
+    return True
+
+
 def _room_governance_payload(meta, actor) -> dict:
     room_id = meta.room_id
     actor_role = _get_room_actor_role(actor, room_id, meta)
@@ -951,14 +962,15 @@ async def _handle_session_control_event(event: WireEvent, user, client_id: str)
 @app.on_event("startup")
 async def _startup() -> None:
     init_db()
-    bootstrapped_owner = bootstrap_owner_if_missing()
+    bootstrapped_owner = await asyncio.to_thread(bootstrap_owner_if_missing)
     if bootstrapped_owner:
         logger.warning(
             "Bootstrapped missing owner account: user_id=%s username=%s",
             bootstrapped_owner.user_id,
             bootstrapped_owner.username,
         )
-        _audit(
+        await asyncio.to_thread(
+            _audit,
             actor_user_id=None,
             action="system.bootstrap_owner",
             target_type="user",
@@ -1082,13 +1094,13 @@ async def register(req: Request):
         raise HTTPException(status_code=400, detail="password must be >= 8 chars")
 
     try:
-        user = create_user(username=username, password_hash=PASSWORD_CONTEXT.hash(password))
+        user = await asyncio.to_thread(create_user, username=username, password_hash=await password_hasher.hash(password))
     except ValueError as e:
         raise HTTPException(status_code=409, detail=str(e)) from e
     if user.user_id is None:
         raise HTTPException(status_code=500, detail="Failed to create user")
 
-    sid = create_session(user.user_id)
+    sid = await asyncio.to_thread(create_session, user.user_id)
     return auth_success_response(req=req, sid=sid, username=user.username)
 
 
@@ -1101,7 +1113,7 @@ async def login(req: Request):
     if not u:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     try:
-        verified, replacement_hash = PASSWORD_CONTEXT.verify_and_update(password, u.password_hash)
+        verified, replacement_hash = await password_hasher.verify_and_update(password, u.password_hash)
     except (ValueError, TypeError):
         verified, replacement_hash = False, None
     if not verified:
@@ -1113,14 +1125,17 @@ async def login(req: Request):
     if _status_name(u) == "deleted":
         raise HTTPException(status_code=403, detail="Account deleted")
     if replacement_hash:
-        update_user_password_hash(u.user_id, replacement_hash)
-    sid = create_session(u.user_id)
+        await asyncio.to_thread(update_user_password_hash, u.user_id, replacement_hash)
+    sid = await asyncio.to_thread(create_session, u.user_id)
     return auth_success_response(req=req, sid=sid, username=u.username)
 
 
 @app.post("/api/auth/logout")
 def logout(req: Request):
     sid = req.cookies.get(SESSION_COOKIE, "") or req.cookies.get(LEGACY_SESSION_COOKIE, "")
+    user = get_user_by_sid(sid) if sid else None
+    if user and user.user_id is not None:
+        room_access_cache.invalidate(user_id=user.user_id)
     return auth_logout_response(sid=sid, delete_session_fn=delete_session)
 
 
@@ -1137,15 +1152,16 @@ async def account_change_password(req: Request):
     if len(new_password) < 8:
         raise HTTPException(status_code=400, detail="New password must be >= 8 chars")
     try:
-        verified, replacement_hash = PASSWORD_CONTEXT.verify_and_update(current_password, user.password_hash)
+        verified, replacement_hash = await password_hasher.verify_and_update(current_password, user.password_hash)
     except (ValueError, TypeError):
         verified, replacement_hash = False, None
     if not verified:
         raise HTTPException(status_code=401, detail="Current password is incorrect")
-    next_hash = PASSWORD_CONTEXT.hash(new_password)
-    update_user_password_hash(user.user_id, next_hash)
-    update_user_must_change_password(user.user_id, False)
-    _audit(
+    next_hash = await password_hasher.hash(new_password)
+    await asyncio.to_thread(update_user_password_hash, user.user_id, next_hash)
+    await asyncio.to_thread(update_user_must_change_password, user.user_id, False)
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=user.user_id,
         action="account.change_password",
         target_type="user",
@@ -1183,6 +1199,7 @@ def account_revoke_other_sessions(req: Request):
         raise HTTPException(status_code=500, detail="Invalid user record")
     current_sid = _current_sid(req)
     removed = delete_all_sessions_for_user(user.user_id, except_sid=current_sid or None)
+    room_access_cache.invalidate(user_id=user.user_id)
     _audit(
         actor_user_id=user.user_id,
         action="account.revoke_other_sessions",
@@ -1205,6 +1222,7 @@ def account_revoke_session(sid: str, req: Request):
     removed = delete_session_for_user(user.user_id, target_sid)
     if not removed:
         raise HTTPException(status_code=404, detail="Session not found")
+    room_access_cache.invalidate(sid=target_sid)
     current_sid = _current_sid(req)
     _audit(
         actor_user_id=user.user_id,
@@ -1260,10 +1278,12 @@ async def admin_disable_user(req: Request, user_id: int):
     body = await req.json()
     reason = str(body.get("reason") or "").strip()
     before = _user_public_payload(target)
-    update_user_status(user_id, "disabled", reason or None)
-    delete_all_sessions_for_user(user_id)
+    await asyncio.to_thread(update_user_status, user_id, "disabled", reason or None)
+    await asyncio.to_thread(delete_all_sessions_for_user, user_id)
+    room_access_cache.invalidate(user_id=user_id)
     after = _user_public_payload(get_user_by_id(user_id))
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=admin_user.user_id,
         action="admin.disable_user",
         target_type="user",
@@ -1307,6 +1327,7 @@ def admin_force_password_reset(req: Request, user_id: int):
     before = _user_public_payload(target)
     update_user_must_change_password(user_id, True)
     delete_all_sessions_for_user(user_id)
+    room_access_cache.invalidate(user_id=user_id)
     after = _user_public_payload(get_user_by_id(user_id))
     _audit(
         actor_user_id=admin_user.user_id,
@@ -1330,10 +1351,12 @@ async def admin_soft_delete_user(req: Request, user_id: int):
     body = await req.json() if req.headers.get("content-type", "").startswith("application/json") else {}
     reason = str((body or {}).get("reason") or "").strip()
     before = _user_public_payload(target)
-    update_user_status(user_id, "deleted", reason or "Soft-deleted by admin")
-    delete_all_sessions_for_user(user_id)
+    await asyncio.to_thread(update_user_status, user_id, "deleted", reason or "Soft-deleted by admin")
+    await asyncio.to_thread(delete_all_sessions_for_user, user_id)
+    room_access_cache.invalidate(user_id=user_id)
     after = _user_public_payload(get_user_by_id(user_id))
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=admin_user.user_id,
         action="admin.soft_delete_user",
         target_type="user",
@@ -1363,10 +1386,11 @@ async def admin_change_user_role(req: Request, user_id: int):
     if current_role == "owner" and next_role != "owner":
         _ensure_not_last_owner(target, "change_role")
     before = _user_public_payload(target)
-    update_user_role(user_id, next_role)
+    await asyncio.to_thread(update_user_role, user_id, next_role)
     after_target = get_user_by_id(user_id)
     after = _user_public_payload(after_target)
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="admin.change_user_role",
         target_type="user",
@@ -1395,8 +1419,9 @@ async def admin_grant_pack(req: Request, pack_id: int):
         raise HTTPException(status_code=404, detail="User not found")
     if not pack:
         raise HTTPException(status_code=404, detail="Pack not found")
-    grant_private_pack_access(pack_id, user_id)
-    _audit(
+    await asyncio.to_thread(grant_private_pack_access, pack_id, user_id)
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=admin_user.user_id,
         action="admin.grant_pack_access",
         target_type="entitlement",
@@ -1418,8 +1443,9 @@ async def admin_revoke_pack(req: Request, pack_id: int):
         raise HTTPException(status_code=404, detail="User not found")
     if not pack:
         raise HTTPException(status_code=404, detail="Pack not found")
-    revoke_private_pack_access(pack_id, user_id)
-    _audit(
+    await asyncio.to_thread(revoke_private_pack_access, pack_id, user_id)
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=admin_user.user_id,
         action="admin.revoke_pack_access",
         target_type="entitlement",
@@ -1451,6 +1477,24 @@ def admin_list_audit(
     }
 
 
+@app.get("/api/admin/auth/password-hashing")
+def admin_password_hashing_stats(req: Request):
+    _require_site_admin(req)
+    return password_hasher.snapshot()
+
+
+@app.get("/api/admin/rooms/autosave")
+def admin_room_autosave_stats(req: Request):
+    _require_site_admin(req)
+    return {
+        "rooms": rm.autosave_stats(),
+        "writer": rm.writer_stats(),
+        "db_writer": storage_writer_stats.snapshot(),
+        "warm": rm.warm_stats(),
+        "access_cache": room_access_cache.snapshot(),
+    }
+
+
 # ----------------------------- Content Admin API ------------------------------
 
 @app.get("/api/admin/official-packs")
@@ -1477,7 +1521,8 @@ async def admin_create_official_pack_api(req: Request):
     content_type = str(body.get("content_type") or "asset_pack").strip().lower()
     if content_type not in {"asset_pack", "token_pack"}:
         raise HTTPException(status_code=400, detail="Invalid content type")
-    pack = create_private_pack(
+    pack = await asyncio.to_thread(
+        create_private_pack,
         owner_user_id=int(actor.user_id),
         slug=slug,
         name=name[:120],
@@ -1488,7 +1533,8 @@ async def admin_create_official_pack_api(req: Request):
         root_rel="",
         thumb_rel="",
     )
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="admin.create_official_pack",
         target_type="pack",
@@ -1516,7 +1562,8 @@ async def admin_update_official_pack_api(pack_id: int, req: Request):
         raise HTTPException(status_code=404, detail="Official pack not found")
     body = await req.json()
     before = _pack_public_payload(pack)
-    updated = update_private_pack(
+    updated = await asyncio.to_thread(
+        update_private_pack,
         pack_id,
         name=str(body.get("name") or "").strip()[:120] if "name" in body else None,
         description=str(body.get("description") or "").strip()[:500] if "description" in body else None,
@@ -1525,7 +1572,8 @@ async def admin_update_official_pack_api(pack_id: int, req: Request):
     )
     if not updated:
         raise HTTPException(status_code=404, detail="Official pack not found")
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="admin.update_official_pack",
         target_type="pack",
@@ -1544,10 +1592,11 @@ async def admin_archive_official_pack_api(pack_id: int, req: Request):
     if not pack or str(getattr(pack, "pack_scope", "") or "") != "official":
         raise HTTPException(status_code=404, detail="Official pack not found")
     before = _pack_public_payload(pack)
-    updated = update_private_pack(pack_id, archived=True, globally_visible=False)
+    updated = await asyncio.to_thread(update_private_pack, pack_id, archived=True, globally_visible=False)
     if not updated:
         raise HTTPException(status_code=404, detail="Official pack not found")
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="admin.archive_official_pack",
         target_type="pack",
@@ -1853,7 +1902,8 @@ async def create_token_pack_api(req: Request):
     requested_global = bool(body.get("globally_visible", False))
     pack_scope = "official" if requested_scope == "official" and _is_site_admin(actor) else "personal"
     globally_visible = requested_global if pack_scope == "official" and _is_site_admin(actor) else False
-    pack = create_private_pack(
+    pack = await asyncio.to_thread(
+        create_private_pack,
         owner_user_id=int(actor.user_id),
         slug=slug,
         name=name[:120],
@@ -1864,7 +1914,8 @@ async def create_token_pack_api(req: Request):
         root_rel="",
         thumb_rel="",
     )
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="pack.create_token_pack" if pack_scope == "personal" else "admin.create_official_token_pack",
         target_type="pack",
@@ -2344,7 +2395,8 @@ if HAS_MULTIPART:
         )
         raw_name = name.strip() if name.strip() else Path(str(file.filename or "asset")).stem
         tags_list = [t.strip() for t in tags.split(",") if t.strip()]
-        create_asset_record(
+        await asyncio.to_thread(
+            create_asset_record,
             asset_id=aid,
             uploader_user_id=user.user_id,
             name=raw_name[:120] or "Asset",
@@ -2435,7 +2487,8 @@ if HAS_MULTIPART:
         )
         display_name = name.strip() if name.strip() else Path(str(file.filename or "asset")).stem
         tags_list = [t.strip() for t in tags.split(",") if t.strip()]
-        add_private_pack_asset_record(
+        await asyncio.to_thread(
+            add_private_pack_asset_record,
             pack_id=pack_id,
             asset_id=asset_id,
             name=display_name[:120] or "Asset",
@@ -2465,7 +2518,8 @@ if HAS_MULTIPART:
         shared_tags = [t.strip() for t in tags.split(",") if t.strip()][:20]
         tmp = await _stream_upload_zip(file, MAX_ZIP_UPLOAD_BYTES)
         try:
-            created, skipped = _import_zip_into_pack(
+            created, skipped = await asyncio.to_thread(
+                _import_zip_into_pack,
                 actor_user_id=actor.user_id,
                 pack_id=pack_id,
                 pack=pack,
@@ -2510,7 +2564,8 @@ if HAS_MULTIPART:
         )
         display_name = name.strip() if name.strip() else Path(str(file.filename or "token")).stem
         tags_list = [t.strip() for t in tags.split(",") if t.strip()]
-        add_private_pack_asset_record(
+        await asyncio.to_thread(
+            add_private_pack_asset_record,
             pack_id=pack_id,
             asset_id=asset_id,
             name=display_name[:120] or "Token",
@@ -2540,7 +2595,8 @@ if HAS_MULTIPART:
         shared_tags = [t.strip() for t in tags.split(",") if t.strip()][:20]
         tmp = await _stream_upload_zip(file, MAX_ZIP_UPLOAD_BYTES)
         try:
-            created, skipped = _import_zip_into_pack(
+            created, skipped = await asyncio.to_thread(
+                _import_zip_into_pack,
                 actor_user_id=actor.user_id,
                 pack_id=pack_id,
                 pack=pack,
@@ -2662,7 +2718,7 @@ async def create_session_api(req: Request):
         raise HTTPException(status_code=500, detail="Invalid user record")
     body = await req.json()
     name = str(body.get("name") or "").strip() or "Untitled Session"
-    session = create_game_session(name, user.user_id)
+    session = await asyncio.to_thread(create_game_session, name, user.user_id)
     room_id = str(body.get("room_id") or "").strip() or None
     if room_id:
         meta = get_room_meta(room_id)
@@ -2670,11 +2726,11 @@ async def create_session_api(req: Request):
             raise HTTPException(status_code=404, detail="Room not found")
         if meta.owner_user_id != user.user_id:
             raise HTTPException(status_code=403, detail="Only the room owner can attach it to a session")
-        if not assign_room_to_game_session(room_id, session.session_id, display_name=meta.name):
+        if not await asyncio.to_thread(assign_room_to_game_session, room_id, session.session_id, display_name=meta.name):
             raise HTTPException(status_code=400, detail="Failed to attach room to session")
         for member_user_id in list_room_member_user_ids(room_id):
             role = "gm" if member_user_id == user.user_id else "player"
-            add_game_session_member(session.session_id, member_user_id, role)
+            await asyncio.to_thread(add_game_session_member, session.session_id, member_user_id, role)
     return _build_session_summary(session.session_id, user.user_id, room_id)
 
 
@@ -2690,12 +2746,12 @@ async def attach_room_to_session_api(room_id: str, req: Request):
         raise HTTPException(status_code=403, detail="Only the room owner can attach it to a session")
     body = await req.json()
     name = str(body.get("name") or "").strip() or f"{meta.name} Session"
-    session = create_game_session(name, user.user_id)
-    if not assign_room_to_game_session(room_id, session.session_id, display_name=meta.name):
+    session = await asyncio.to_thread(create_game_session, name, user.user_id)
+    if not await asyncio.to_thread(assign_room_to_game_session, room_id, session.session_id, display_name=meta.name):
         raise HTTPException(status_code=400, detail="Failed to attach room to session")
     for member_user_id in list_room_member_user_ids(room_id):
         role = "gm" if member_user_id == user.user_id else "player"
-        add_game_session_member(session.session_id, member_user_id, role)
+        await asyncio.to_thread(add_game_session_member, session.session_id, member_user_id, role)
     return _build_session_summary(session.session_id, user.user_id, room_id)
 
 
@@ -2756,7 +2812,8 @@ async def create_session_room_api(session_id: str, req: Request):
         candidate = ensure_unique_join_code()
         try:
             initial = RoomState(room_id=room_id, gm_id=None, gm_user_id=user.user_id)
-            create_room_in_game_session(
+            await asyncio.to_thread(
+                create_room_in_game_session,
                 session_id=session_id,
                 created_by_user_id=user.user_id,
                 room_id=room_id,
@@ -2771,7 +2828,7 @@ async def create_session_room_api(session_id: str, req: Request):
             continue
     if not join_code:
         raise HTTPException(status_code=500, detail="Failed to create room")
-    update_user_last_room(user.user_id, room_id)
+    await asyncio.to_thread(update_user_last_room, user.user_id, room_id)
     return {"room_id": room_id, "name": name, "join_code": join_code, "session_id": session_id, "parent_room_id": parent_room_id}
 
 
@@ -2849,10 +2906,11 @@ async def share_session_pack_api(session_id: str, pack_id: int, req: Request):
     if not user_has_pack_access(actor.user_id, pack_id):
         raise HTTPException(status_code=403, detail="You do not have access to that pack")
     before_packs = list_game_session_shared_packs(session_id)
-    if not set_game_session_shared_pack(session_id, pack_id, True, shared_by_user_id=actor.user_id):
+    if not await asyncio.to_thread(set_game_session_shared_pack, session_id, pack_id, True, shared_by_user_id=actor.user_id):
         raise HTTPException(status_code=404, detail="Session or pack not found")
     after_packs = list_game_session_shared_packs(session_id)
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="session.share_pack",
         target_type="session",
@@ -2882,10 +2940,11 @@ async def unshare_session_pack_api(session_id: str, pack_id: int, req: Request):
     if not _can_manage_session_packs(actor, session_id):
         raise HTTPException(status_code=403, detail="GM or admin required")
     before_packs = list_game_session_shared_packs(session_id)
-    if not set_game_session_shared_pack(session_id, pack_id, False, shared_by_user_id=actor.user_id):
+    if not await asyncio.to_thread(set_game_session_shared_pack, session_id, pack_id, False, shared_by_user_id=actor.user_id):
         raise HTTPException(status_code=404, detail="Session or pack not found")
     after_packs = list_game_session_shared_packs(session_id)
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="session.unshare_pack",
         target_type="session",
@@ -2934,10 +2993,12 @@ async def set_session_member_role_api(session_id: str, user_id: int, req: Reques
         if count_session_gms(session_id) <= 1:
             raise HTTPException(status_code=400, detail="Cannot demote the only GM; use transfer-gm")
     before_members = list_game_session_members(session_id)
-    if not set_game_session_member_role(session_id, user_id, new_role):
+    if not await asyncio.to_thread(set_game_session_member_role, session_id, user_id, new_role):
         raise HTTPException(status_code=404, detail="Member not found")
+    room_access_cache.invalidate(user_id=user_id)
     after_members = list_game_session_members(session_id)
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="session.change_member_role",
         target_type="session_member",
@@ -2978,10 +3039,12 @@ async def remove_session_member_api(session_id: str, user_id: int, req: Request)
         raise HTTPException(status_code=400, detail="Cannot remove the only GM; use transfer-gm first")
     remaining_member_ids = _session_member_user_ids(session_id) - {user_id}
     before_members = list_game_session_members(session_id)
-    if not remove_game_session_member(session_id, user_id):
+    if not await asyncio.to_thread(remove_game_session_member, session_id, user_id):
         raise HTTPException(status_code=404, detail="Member not found")
+    room_access_cache.invalidate(user_id=user_id)
     after_members = list_game_session_members(session_id)
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="session.remove_member",
         target_type="session_member",
@@ -3029,13 +3092,16 @@ async def transfer_session_gm_api(session_id: str, req: Request):
     if current_role == "gm":
         raise HTTPException(status_code=400, detail="Target is already a GM")
     before_members = list_game_session_members(session_id)
-    set_game_session_member_role(session_id, new_gm_user_id, "gm")
+    await asyncio.to_thread(set_game_session_member_role, session_id, new_gm_user_id, "gm")
+    room_access_cache.invalidate(user_id=new_gm_user_id)
     if actor_role == "gm":
         actor_current_role = get_game_session_role(session_id, actor.user_id)
         if actor_current_role == "gm":
-            set_game_session_member_role(session_id, actor.user_id, "co_gm")
+            await asyncio.to_thread(set_game_session_member_role, session_id, actor.user_id, "co_gm")
+            room_access_cache.invalidate(user_id=actor.user_id)
     after_members = list_game_session_members(session_id)
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="session.transfer_gm",
         target_type="session",
@@ -3077,7 +3143,8 @@ async def create_room(req: Request):
             if session_id:
                 if not can_manage_game_session(session_id, user.user_id):
                     raise HTTPException(status_code=403, detail="GM or co-GM required")
-                create_room_in_game_session(
+                await asyncio.to_thread(
+                    create_room_in_game_session,
                     session_id=session_id,
                     created_by_user_id=user.user_id,
                     room_id=room_id,
@@ -3086,8 +3153,8 @@ async def create_room(req: Request):
                     join_code=candidate,
                 )
             else:
-                create_room_record(room_id=room_id, name=name, state_json=initial.model_dump_json(), owner_user_id=user.user_id, join_code=candidate)
-                add_membership(user.user_id, room_id, role="owner")
+                await asyncio.to_thread(create_room_record, room_id=room_id, name=name, state_json=initial.model_dump_json(), owner_user_id=user.user_id, join_code=candidate)
+                await asyncio.to_thread(add_membership, user.user_id, room_id, role="owner")
             join_code = candidate
             break
         except HTTPException:
@@ -3097,7 +3164,7 @@ async def create_room(req: Request):
     if not join_code:
         raise HTTPException(status_code=500, detail="Failed to create room")
 
-    update_user_last_room(user.user_id, room_id)
+    await asyncio.to_thread(update_user_last_room, user.user_id, room_id)
     return {"room_id": room_id, "name": name, "join_code": join_code, "session_id": session_id}
 
 
@@ -3120,12 +3187,12 @@ async def join_room(req: Request):
     room_id = room_id_from_join_code(code)
     if not room_id:
         raise HTTPException(status_code=404, detail="Invalid join code")
-    add_membership(user.user_id, room_id, role="player")
+    await asyncio.to_thread(add_membership, user.user_id, room_id, role="player")
     meta = get_room_meta(room_id)
     if meta and meta.session_id:
-        add_game_session_member(meta.session_id, user.user_id, role="player")
-    touch_membership(user.user_id, room_id)
-    update_user_last_room(user.user_id, room_id)
+        await asyncio.to_thread(add_game_session_member, meta.session_id, user.user_id, role="player")
+    await asyncio.to_thread(touch_membership, user.user_id, room_id)
+    await asyncio.to_thread(update_user_last_room, user.user_id, room_id)
     return {"room_id": room_id, "session_id": meta.session_id if meta else None}
 
 
@@ -3160,10 +3227,12 @@ async def remove_room_member_api(room_id: str, user_id: int, req: Request):
         raise HTTPException(status_code=404, detail="User not found")
     remaining_member_ids = _room_member_user_ids(room_id) - {user_id}
     before_members = list_room_members(room_id)
-    if not remove_room_membership(user_id, room_id):
+    if not await asyncio.to_thread(remove_room_membership, user_id, room_id):
         raise HTTPException(status_code=404, detail="Member not found")
+    room_access_cache.invalidate(user_id=user_id, room_id=room_id)
     after_members = list_room_members(room_id)
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="room.remove_member",
         target_type="room_member",
@@ -3207,11 +3276,12 @@ async def transfer_room_ownership_api(room_id: str, req: Request):
         raise HTTPException(status_code=400, detail="Target user must already be a room member")
     before_room = _room_governance_payload(meta, actor)
     before_members = list_room_members(room_id)
-    if not transfer_room_ownership(room_id, new_owner_user_id):
+    if not await asyncio.to_thread(transfer_room_ownership, room_id, new_owner_user_id):
         raise HTTPException(status_code=400, detail="Failed to transfer room ownership")
     updated_meta = get_room_meta(room_id)
     after_members = list_room_members(room_id)
-    _audit(
+    await asyncio.to_thread(
+        _audit,
         actor_user_id=actor.user_id,
         action="room.transfer_ownership",
         target_type="room",
@@ -3257,7 +3327,7 @@ async def save_snapshot(room_id: str, req: Request, gm_key: str | None = None):
         raise HTTPException(status_code=403, detail="GM only")
     body = await req.json()
     label = str(body.get("label") or "Snapshot").strip() or "Snapshot"
-    snap_id = create_snapshot(room_id, label, raw)
+    snap_id = await asyncio.to_thread(create_snapshot, room_id, label, raw)
     return {"snapshot_id": snap_id}
 
 
@@ -3297,11 +3367,11 @@ async def rename_room(room_id: str, req: Request, gm_key: str | None = None):
         name = str(body.get("name", "")).strip()
         if not name:
             raise HTTPException(status_code=400, detail="name is required")
-        ok = update_room_name(room_id, name)
+        ok = await asyncio.to_thread(update_room_name, room_id, name)
         if not ok:
             raise HTTPException(status_code=404, detail="Room not found")
         if meta.session_id and "display_name" not in body:
-            update_room_display_name(room_id, name)
+            await asyncio.to_thread(update_room_display_name, room_id, name)
     # display_name / parent_room_id / room_order — session GM/co-GM only
     hierarchy_keys = {"display_name", "parent_room_id", "room_order"}
     if hierarchy_keys & body.keys():
@@ -3311,17 +3381,17 @@ async def rename_room(room_id: str, req: Request, gm_key: str | None = None):
         if "display_name" in body:
             display_name = str(body["display_name"] or "").strip()
             if display_name:
-                update_room_display_name(room_id, display_name)
+                await asyncio.to_thread(update_room_display_name, room_id, display_name)
         if "parent_room_id" in body:
             new_parent = body["parent_room_id"]
             if new_parent is not None:
                 new_parent = str(new_parent).strip() or None
-            if not set_room_parent(room_id, new_parent):
+            if not await asyncio.to_thread(set_room_parent, room_id, new_parent):
                 raise HTTPException(status_code=400, detail="Invalid parent_room_id (cycle, wrong session, or not found)")
         if "room_order" in body:
             order = body["room_order"]
             if order is not None:
-                update_room_order(room_id, int(order))
+                await asyncio.to_thread(update_room_order, room_id, int(order))
     return {"ok": True}
 
 
@@ -3335,7 +3405,8 @@ async def delete_room(room_id: str, req: Request, gm_key: str | None = None):
     if not _gm_authorized(state, user.user_id, gm_key):
         raise HTTPException(status_code=403, detail="GM only")
     await rm.kick_all_and_drop(room_id)
-    delete_room_record(room_id)
+    await asyncio.to_thread(delete_room_record, room_id)
+    room_access_cache.invalidate(room_id=room_id)
     return {"ok": True}
 
 
@@ -3408,6 +3479,45 @@ async def ws_app(ws: WebSocket):
             del _gov_clients[uid]
 
 
+def _parse_since_version(raw) -> Optional[int]:
+    try:
+        since = int(raw)
+    except (TypeError, ValueError):
+        return None
+    return since if since >= 0 else None
+
+
+async def _receive_wire_event(ws: WebSocket) -> WireEvent:
+    """Next client frame: JSON text, or a packed binary frame (any socket may send either)."""
+    message = await ws.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    data = message.get("bytes")
+    if data is not None:
+        return decode_packed_event(data)
+    return decode_wire_event(message.get("text") or "")
+
+
+async def _send_state_resync(ws: WebSocket, room, since: Optional[int], epoch: Optional[str]) -> None:
+    """Bring one socket up to date: the missed events plus STATE_RESYNC, or a full STATE_SYNC."""
+    # Pending drags are older than what follows; send them first so versions never go backwards.
+    await rm.flush_drags(room)
+    missed = rm.resync_events(room, since, epoch) if since is not None else None
+    if missed is None:
+        await rm.send(room, ws, rm.state_sync_frame(room))
+        return
+    for event in missed:
+        await rm.send(room, ws, event)
+    await rm.send(
+        room,
+        ws,
+        WireEvent(
+            type="STATE_RESYNC",
+            payload={"from_version": since, "version": room.state.version, "events": len(missed)},
+        ),
+    )
+
+
 @app.websocket("/ws/{room_id}")
 async def ws_room(ws: WebSocket, room_id: str):
     user = _ws_user(ws)
@@ -3422,67 +3532,79 @@ async def ws_room(ws: WebSocket, room_id: str):
         return
 
     # membership guard
-    if not _room_access_still_valid(user.user_id, room_id):
+    if not await asyncio.to_thread(_room_access_still_valid, user.user_id, room_id):
         await ws.close(code=1008)
         return
+    session_sid = ws.cookies.get(SESSION_COOKIE, "") or ws.cookies.get(LEGACY_SESSION_COOKIE, "")
+    room_access_cache.remember(session_sid, user.user_id, room_id)
 
     gm_key = ws.query_params.get("gm_key")
-    await ws.accept()
+    # Clients that offer the packed subprotocol get binary frames for point lists.
+    packed = PACKED_SUBPROTOCOL in (ws.scope.get("subprotocols") or [])
+    await ws.accept(subprotocol=PACKED_SUBPROTOCOL if packed else None)
 
     client_id = user.username  # authoritative identity
-    touch_membership(user.user_id, room_id)
-    update_user_last_room(user.user_id, room_id)
-
-    room = await rm.connect(room_id, ws)
-    rm.attach_client(room, ws, client_id, user.user_id)
-
-    # Owner automatically becomes GM for this room, otherwise fall back to GM key model.
-    gm_claimed = False
-    if _is_owner(user.user_id, room_id):
-        if room.state.gm_user_id != user.user_id or room.state.gm_id != client_id:
-            room.state.gm_id = client_id
-            room.state.gm_user_id = user.user_id
-            gm_claimed = True
-    else:
-        if room.state.gm_key_hash is None and gm_key:
-            room.state.gm_key_hash = _hash_key(gm_key)
-            room.state.gm_id = client_id
-            room.state.gm_user_id = user.user_id
-            gm_claimed = True
-        elif room.state.gm_key_hash and gm_key and _hash_key(gm_key) == room.state.gm_key_hash:
-            room.state.gm_id = client_id
-            room.state.gm_user_id = user.user_id
-            gm_claimed = True
-
-    if gm_claimed:
-        rm._mark_dirty(room_id, room)
-
-    # Bootstrap the connecting socket directly: STATE_SYNC, HELLO, PRESENCE.
-    # Then broadcast join-related updates to *other* sockets only so the new
-    # client never receives a duplicate echo of its own connect messages.
-    await ws.send_text(WireEvent(type="STATE_SYNC", payload=room.state.model_dump(exclude={"gm_key_hash"})).model_dump_json())
-    await ws.send_text(
-        WireEvent(
-            type="HELLO",
-            payload={
-                "client_id": client_id,
-                "room_id": room_id,
-                "room_name": _room_display_name(room_id),
-                "is_gm": room.state.gm_user_id == user.user_id or room.state.gm_id == client_id,
-                "is_co_gm": client_id in room.state.co_gm_ids,
-                "gm_key_set": bool(room.state.gm_key_hash),
-                "username": user.username,
-                "session": _room_session_payload(room_id, user.user_id),
-            },
-        ).model_dump_json()
-    )
-    await ws.send_text(rm.presence_event(room).model_dump_json())
+    await asyncio.to_thread(touch_membership, user.user_id, room_id)
+    await asyncio.to_thread(update_user_last_room, user.user_id, room_id)
+
+    # Joins run one at a time per room: a socket attaching meanwhile never
+    # misses (or gets twice) this socket's GM claim and join broadcasts.
+    async with rm.joining(room_id, ws) as room:
+        rm.attach_client(room, ws, client_id, user.user_id, binary=packed)
+
+        # Owner automatically becomes GM for this room, otherwise fall back to GM key model.
+        gm_claimed = False
+        if _is_owner(user.user_id, room_id):
+            if room.state.gm_user_id != user.user_id or room.state.gm_id != client_id:
+                room.state.gm_id = client_id
+                room.state.gm_user_id = user.user_id
+                gm_claimed = True
+        else:
+            if room.state.gm_key_hash is None and gm_key:
+                room.state.gm_key_hash = _hash_key(gm_key)
+                room.state.gm_id = client_id
+                room.state.gm_user_id = user.user_id
+                gm_claimed = True
+            elif room.state.gm_key_hash and gm_key and _hash_key(gm_key) == room.state.gm_key_hash:
+                room.state.gm_id = client_id
+                room.state.gm_user_id = user.user_id
+                gm_claimed = True
+
+        if gm_claimed:
+            rm._mark_dirty(room_id, room)
+
+        # Bootstrap the connecting socket directly: STATE_SYNC, HELLO, PRESENCE.
+        # Then broadcast join-related updates to *other* sockets only so the new
+        # client never receives a duplicate echo of its own connect messages.
+        await _send_state_resync(
+            ws, room, _parse_since_version(ws.query_params.get("since")), ws.query_params.get("epoch")
+        )
+        await rm.send(
+            room,
+            ws,
+            WireEvent(
+                type="HELLO",
+                payload={
+                    "client_id": client_id,
+                    "room_id": room_id,
+                    "room_name": _room_display_name(room_id),
+                    "is_gm": room.state.gm_user_id == user.user_id or room.state.gm_id == client_id,
+                    "is_co_gm": client_id in room.state.co_gm_ids,
+                    "gm_key_set": bool(room.state.gm_key_hash),
+                    "username": user.username,
+                    "session": _room_session_payload(room_id, user.user_id),
+                    "epoch": room.epoch,
+                },
+            ),
+        )
+        await rm.send(room, ws, rm.presence_event(room))
 
-    if gm_claimed:
-        await rm.broadcast_others(room, ws, WireEvent(type="STATE_SYNC", payload=room.state.model_dump(exclude={"gm_key_hash"})))
+        if gm_claimed:
+            await rm.flush_drags(room)
+            await rm.broadcast_others(room, ws, rm.state_sync_frame(room))
 
-    await rm.broadcast_others(room, ws, WireEvent(type="HELLO", payload={"client_id": client_id, "room_id": room_id, "room_name": _room_display_name(room_id)}))
-    await rm.broadcast_others(room, ws, rm.presence_event(room))
+        await rm.broadcast_others(room, ws, WireEvent(type="HELLO", payload={"client_id": client_id, "room_id": room_id, "room_name": _room_display_name(room_id)}))
+        await rm.broadcast_others(room, ws, rm.presence_event(room))
 
     move_times: deque[float] = deque()
     erase_times: deque[float] = deque()
@@ -3514,14 +3636,9 @@ async def ws_room(ws: WebSocket, room_id: str):
         q.append(now)
         return True
 
-    session_sid = ws.cookies.get(SESSION_COOKIE, "") or ws.cookies.get(LEGACY_SESSION_COOKIE, "")
-    last_session_check = time.time()
-    SESSION_RECHECK_SECONDS = 300.0
-
     try:
         while True:
-            raw = await asyncio.wait_for(ws.receive_text(), timeout=HEARTBEAT_TIMEOUT_SECONDS)
-            event = WireEvent.model_validate_json(raw)
+            event = await asyncio.wait_for(_receive_wire_event(ws), timeout=HEARTBEAT_TIMEOUT_SECONDS)
             log_msg = "ws_in room=%s client=%s type=%s gm=%s conns=%d"
             log_args = (room_id, client_id, event.type, room.state.gm_id or "", len(room.sockets))
             if event.type == "HEARTBEAT":
@@ -3532,51 +3649,58 @@ async def ws_room(ws: WebSocket, room_id: str):
                 LOG.info(log_msg, *log_args)
 
             if event.type == "HEARTBEAT":
-                now = time.time()
-                if now - last_session_check >= SESSION_RECHECK_SECONDS:
-                    last_session_check = now
-                    if not get_user_by_sid(session_sid):
-                        await ws.close(code=1008)
-                        return
-                    if not _room_access_still_valid(user.user_id, room_id):
-                        await ws.close(code=1008)
-                        return
-                await ws.send_text(WireEvent(type="HEARTBEAT", payload={"ts": time.time()}).model_dump_json())
+                # Heartbeats refresh the grant early so regular events never wait on the DB.
+                if not await _ws_access_still_valid(session_sid, user.user_id, room_id, ROOM_ACCESS_REFRESH_SECONDS):
+                    await ws.close(code=1008)
+                    return
+                await rm.send(room, ws, WireEvent(type="HEARTBEAT", payload={"ts": time.time()}))
                 continue
 
-            if not _room_access_still_valid(user.user_id, room_id):
+            if not await _ws_access_still_valid(session_sid, user.user_id, room_id):
                 await ws.close(code=1008)
                 return
 
             if event.type in {"SESSION_ROOM_MOVE_REQUEST", "SESSION_ROOM_MOVE_FORCE", "SESSION_ROOM_MOVE_ACCEPT"}:
                 session_out = await _handle_session_control_event(event, user, client_id)
                 if session_out and session_out.type == "ERROR":
-                    await ws.send_text(session_out.model_dump_json())
+                    await rm.send(room, ws, session_out)
                 continue
 
-            if event.type == "REQ_STATE_SYNC" and not _allow_rate("sync"):
-                await ws.send_text(WireEvent(type="ERROR", payload={"message": "rate limited"}).model_dump_json())
+            if event.type == "REQ_STATE_SYNC":
+                if not _allow_rate("sync"):
+                    await rm.send(room, ws, WireEvent(type="ERROR", payload={"message": "rate limited"}))
+                    continue
+                since = _parse_since_version(event.payload.get("since_version"))
+                epoch = event.payload.get("epoch")
+                if since is not None and rm.resync_events(room, since, epoch) is not None:
+                    await _send_state_resync(ws, room, since, epoch)
+                else:
+                    await rm.flush_drags(room)
+                    await rm.broadcast(room, rm.state_sync_frame(room))
                 continue
 
             if event.type in ("TOKEN_MOVE", "SHAPE_UPDATE", "ASSET_INSTANCE_UPDATE", "INTERIOR_UPDATE", "ERASE_AT") and not _allow_rate("erase" if event.type == "ERASE_AT" else "move"):
-                await ws.send_text(WireEvent(type="ERROR", payload={"message": "rate limited"}).model_dump_json())
+                await rm.send(room, ws, WireEvent(type="ERROR", payload={"message": "rate limited"}))
                 continue
 
             if event.type in ("TOKEN_CREATE", "STROKE_ADD", "SHAPE_ADD", "ASSET_INSTANCE_CREATE", "INTERIOR_ADD", "FOG_STROKE_ADD") and not _allow_rate("create"):
-                await ws.send_text(WireEvent(type="ERROR", payload={"message": "rate limited"}).model_dump_json())
+                await rm.send(room, ws, WireEvent(type="ERROR", payload={"message": "rate limited"}))
                 continue
 
             out = await rm.apply_event(room_id, room, event, client_id, user.user_id)
             if out.type == "ERROR":
-                await ws.send_text(out.model_dump_json())
+                await rm.send(room, ws, out)
             else:
-                await rm.broadcast(room, out)
+                await rm.publish(room, out)
 
     except (WebSocketDisconnect, asyncio.TimeoutError):
         pass
     finally:
         try:
             room_after = await rm.disconnect(room_id, ws)
+            if room_after is None or user.user_id not in room_after.socket_to_user_id.values():
+                # The user's last socket in this room; a reconnect re-checks anyway.
+                room_access_cache.forget(session_sid, user.user_id, room_id)
             if room_after:
                 await rm.broadcast(room_after, rm.presence_event(room_after))
         except Exception:
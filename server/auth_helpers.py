@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 import hashlib
 import hmac
 import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from fastapi import HTTPException, Request, WebSocket
 from fastapi.responses import JSONResponse
@@ -51,14 +56,114 @@ PASSWORD_CONTEXT = (
     else PBKDF2Context()
 )
 
+# Hashes computed at once; the rest wait their turn off the event loop.
+PASSWORD_HASH_WORKERS = 2
+# Logins/registrations allowed to wait for a worker before new ones get a 503.
+PASSWORD_HASH_MAX_PENDING = 64
+
+
+@dataclass
+class PasswordHashStats:
+    calls: int = 0
+    rejected: int = 0
+    last_ms: float = 0.0
+    max_ms: float = 0.0
+    total_ms: float = 0.0
+    max_wait_ms: float = 0.0
+    total_wait_ms: float = 0.0
+
+    def record(self, wait: float, elapsed: float) -> None:
+        elapsed_ms = elapsed * 1000.0
+        wait_ms = wait * 1000.0
+        self.calls += 1
+        self.last_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.total_ms += elapsed_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.total_wait_ms += wait_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "last_ms": round(self.last_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "avg_wait_ms": round(self.total_wait_ms / self.calls, 3) if self.calls else 0.0,
+        }
+
+
+class PasswordHasher:
+    """Runs ``PASSWORD_CONTEXT`` hashing and verification on a small thread pool.
+
+    Hashing is deliberately slow, so doing it on the event loop would stall
+    every live room during a burst of logins.  At most ``max_workers`` hashes
+    run at once; past ``max_pending`` waiting calls, new ones are refused with
+    a 503 instead of queueing without bound.
+    """
+
+    def __init__(
+        self,
+        context: Any = None,
+        max_workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+    ) -> None:
+        self.context = PASSWORD_CONTEXT if context is None else context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.stats = PasswordHashStats()
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, stored_hash: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(self.context.verify_and_update, password, stored_hash)
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            self.stats.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, try again")
+        queued = time.perf_counter()
+
+        def timed() -> Tuple[Any, float, float]:
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started, time.perf_counter()
+
+        self._pending += 1
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self._pending -= 1
+        self.stats.record(started - queued, finished - started)
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats.snapshot(),
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "workers": self.max_workers,
+        }
+
 
 def hash_key(raw: str) -> str:
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
 def get_user_from_request(req: Request, get_user_by_sid_fn):
+    # Memoized on the request scope (shared by middleware and route), so the
+    # auth gate and the route resolve the session only once.
+    resolved = getattr(req.state, "auth_user", None)
+    if resolved is not None:
+        return resolved[0]
     sid = req.cookies.get(SESSION_COOKIE, "") or req.cookies.get(LEGACY_SESSION_COOKIE, "")
-    return get_user_by_sid_fn(sid)
+    user = get_user_by_sid_fn(sid)
+    req.state.auth_user = (user,)
+    return user
 
 
 def require_user(req: Request, get_user_by_sid_fn):
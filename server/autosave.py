@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+# Quiet period after the last edit before a room is written.
+AUTOSAVE_DEBOUNCE_SECONDS = 2.0
+# Upper bound on the debounce once it has been stretched for busy or large rooms.
+AUTOSAVE_MAX_DEBOUNCE_SECONDS = 6.0
+# A dirty room is always written within this long of its first unsaved edit,
+# no matter how continuously it is being edited.
+AUTOSAVE_MAX_INTERVAL_SECONDS = 15.0
+# Hard ceiling on the max interval after size scaling.
+AUTOSAVE_MAX_INTERVAL_CEILING_SECONDS = 60.0
+# Above this smoothed edit rate the room is treated as busy (drags, painting)
+# and the debounce is doubled so bursts coalesce into one write.
+AUTOSAVE_BUSY_EVENTS_PER_SECOND = 5.0
+# Each step of serialized state size adds one base debounce / max interval.
+AUTOSAVE_SIZE_STEP_BYTES = 2 * 1024 * 1024
+# Smoothing factor for the per-room edit-rate estimate.
+AUTOSAVE_RATE_ALPHA = 0.2
+# The edit rate decays by a factor of e for every this many quiet seconds,
+# so a room that stopped being edited stops counting as busy.
+AUTOSAVE_RATE_DECAY_SECONDS = 2.0
+
+
+@dataclass
+class AutosaveStats:
+    """Per-room autosave scheduling state and counters."""
+
+    dirty_since: Optional[float] = None
+    last_event_ts: Optional[float] = None
+    event_rate: float = 0.0
+    flush_count: int = 0
+    forced_flush_count: int = 0
+    checkpoint_count: int = 0
+    bytes_written: int = 0
+    last_bytes: int = 0
+    # Size of the last full checkpoint; drives the size-based stretching.
+    state_bytes: int = 0
+    last_flush_ms: float = 0.0
+    max_flush_ms: float = 0.0
+    total_flush_ms: float = 0.0
+    last_flush_ts: Optional[float] = None
+
+    def note_change(self, now: float) -> None:
+        if self.dirty_since is None:
+            self.dirty_since = now
+        if self.last_event_ts is not None:
+            gap = max(now - self.last_event_ts, 1e-3)
+            self.event_rate += AUTOSAVE_RATE_ALPHA * (1.0 / gap - self.event_rate)
+        self.last_event_ts = now
+
+    def rate_at(self, now: Optional[float] = None) -> float:
+        """Smoothed edit rate, decayed for the quiet time up to ``now`` (as of the last edit if None)."""
+        if now is None or self.last_event_ts is None:
+            return self.event_rate
+        idle = max(now - self.last_event_ts, 0.0)
+        return self.event_rate * math.exp(-idle / AUTOSAVE_RATE_DECAY_SECONDS)
+
+    def _size_steps(self) -> float:
+        return self.state_bytes / AUTOSAVE_SIZE_STEP_BYTES
+
+    def debounce_seconds(self, now: Optional[float] = None) -> float:
+        delay = AUTOSAVE_DEBOUNCE_SECONDS * (1.0 + self._size_steps())
+        if self.rate_at(now) >= AUTOSAVE_BUSY_EVENTS_PER_SECOND:
+            delay *= 2.0
+        return min(delay, max(AUTOSAVE_MAX_DEBOUNCE_SECONDS, AUTOSAVE_DEBOUNCE_SECONDS))
+
+    def max_interval_seconds(self) -> float:
+        interval = AUTOSAVE_MAX_INTERVAL_SECONDS * (1.0 + self._size_steps())
+        return min(interval, max(AUTOSAVE_MAX_INTERVAL_CEILING_SECONDS, AUTOSAVE_MAX_INTERVAL_SECONDS))
+
+    def next_flush_at(self, last_change_ts: float, now: Optional[float] = None) -> float:
+        """When the pending save is due: after the debounce, but never past the max interval."""
+        quiet_at = last_change_ts + self.debounce_seconds(now)
+        if self.dirty_since is None:
+            return quiet_at
+        return min(quiet_at, self.dirty_since + self.max_interval_seconds())
+
+    def begin_flush(self) -> Optional[float]:
+        """Start a new unsaved-changes window; edits from here on belong to the next flush."""
+        dirty_since, self.dirty_since = self.dirty_since, None
+        return dirty_since
+
+    def abort_flush(self, dirty_since: Optional[float]) -> None:
+        """Put back the window of a failed flush so its deadline still applies."""
+        if dirty_since is not None and (self.dirty_since is None or dirty_since < self.dirty_since):
+            self.dirty_since = dirty_since
+
+    def record_flush(self, now: float, nbytes: int, elapsed: float, forced: bool, checkpoint: bool = True) -> None:
+        elapsed_ms = elapsed * 1000.0
+        self.flush_count += 1
+        if forced:
+            self.forced_flush_count += 1
+        if checkpoint:
+            self.checkpoint_count += 1
+            self.state_bytes = nbytes or self.state_bytes
+        self.bytes_written += nbytes
+        self.last_bytes = nbytes
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+        self.last_flush_ts = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "flush_count": self.flush_count,
+            "forced_flush_count": self.forced_flush_count,
+            "checkpoint_count": self.checkpoint_count,
+            "journal_count": self.flush_count - self.checkpoint_count,
+            "bytes_written": self.bytes_written,
+            "last_bytes": self.last_bytes,
+            "state_bytes": self.state_bytes,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self.total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0,
+            "last_flush_ts": self.last_flush_ts,
+            "dirty_since": self.dirty_since,
+            "event_rate": round(self.rate_at(now), 3),
+            "debounce_seconds": round(self.debounce_seconds(now), 3),
+            "max_interval_seconds": round(self.max_interval_seconds(), 3),
+        }
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from .env import env_float
+from .models import WireEvent
+from .wire import encode_event
+
+
+# Broadcast ticks per second for in-progress drags; 0 sends every update as it is applied.
+ROOM_BROADCAST_TICK_HZ = env_float("ROOM_BROADCAST_TICK_HZ", 25.0, allow_zero=True)
+# Drag-rate results that only ever move an entity; a newer one supersedes an older one.
+COALESCED_EVENT_TYPES = frozenset({"TOKEN_MOVE", "TOKENS_MOVE", "SHAPE_UPDATE", "ASSET_INSTANCE_UPDATE", "INTERIOR_UPDATE"})
+
+
+def coalesce_key(event: WireEvent) -> Optional[Tuple[Hashable, ...]]:
+    """Key under which a transient drag result replaces earlier ones, or None to send it as is.
+
+    Commits and rejections are never coalesced: they settle the final position
+    and answer the dragging client, so every one of them is delivered.
+    """
+    if event.type not in COALESCED_EVENT_TYPES:
+        return None
+    payload = event.payload
+    if payload.get("commit") or payload.get("rejected"):
+        return None
+    if event.type == "TOKENS_MOVE":
+        moves = payload.get("moves")
+        if not isinstance(moves, list) or not moves:
+            return None
+        return (event.type, tuple(sorted(str(move.get("id")) for move in moves)))
+    entity_id = payload.get("id")
+    if not isinstance(entity_id, str):
+        return None
+    return (event.type, entity_id)
+
+
+def batch_json(events: List[WireEvent]) -> str:
+    """One EVENT_BATCH frame carrying ``events`` in order."""
+    inner = ",".join(encode_event(event) for event in events)
+    return f'{{"type":"EVENT_BATCH","payload":{{"events":[{inner}]}},"client_id":null,"ts":null,"version":null}}'
+
+
+@dataclass
+class CoalesceStats:
+    received: int = 0
+    superseded: int = 0
+    frames: int = 0
+    events_sent: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "superseded": self.superseded,
+            "frames": self.frames,
+            "events_sent": self.events_sent,
+        }
+
+
+@dataclass
+class DragCoalescer:
+    """Latest transient drag result per entity, waiting for the room's next broadcast tick.
+
+    Pending results are kept in version order: a superseded key moves to the
+    end, so replaying the batch front to back always leaves the newest
+    position.  The tick task only runs while drags keep arriving.
+    """
+
+    pending: Dict[Tuple[Hashable, ...], WireEvent] = field(default_factory=dict)
+    task: Optional[asyncio.Task] = None
+    stats: CoalesceStats = field(default_factory=CoalesceStats)
+
+    def add(self, key: Tuple[Hashable, ...], event: WireEvent) -> None:
+        self.stats.received += 1
+        if self.pending.pop(key, None) is not None:
+            self.stats.superseded += 1
+        self.pending[key] = event
+
+    def ticking(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def drain(self) -> List[WireEvent]:
+        events = list(self.pending.values())
+        self.pending.clear()
+        if events:
+            self.stats.frames += 1
+            self.stats.events_sent += len(events)
+        return events
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Callable
+
+
+def _env_number(name: str, default: Any, parse: Callable[[str], Any], allow_zero: bool) -> Any:
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    try:
+        val = parse(raw)
+    except ValueError:
+        return default
+    if val > 0 or (allow_zero and val == 0):
+        return val
+    return default
+
+
+def env_int(name: str, default: int, allow_zero: bool = False) -> int:
+    """Positive integer from the environment; unset, malformed or out-of-range values give ``default``.
+
+    ``allow_zero`` also accepts 0, for settings where it means "off" or "no limit".
+    """
+    return _env_number(name, default, int, allow_zero)
+
+
+def env_float(name: str, default: float, allow_zero: bool = False) -> float:
+    """Positive number from the environment, read like :func:`env_int`."""
+    return _env_number(name, default, float, allow_zero)
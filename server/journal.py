@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import copy
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from .models import FogPaintState, RoomState, TerrainPaintState
+
+
+# Compact into a fresh checkpoint after this many journal entries...
+JOURNAL_COMPACT_EVERY_ENTRIES = 500
+# ...or once the journal outweighs the checkpoint (but never below this many bytes).
+JOURNAL_COMPACT_MIN_BYTES = 256 * 1024
+
+Path = Tuple[str, ...]
+
+# Entity dicts diffed id-by-id.
+JOURNAL_COLLECTIONS: Tuple[Path, ...] = (
+    ("tokens",),
+    ("strokes",),
+    ("shapes",),
+    ("assets",),
+    ("interiors",),
+    ("interior_edges",),
+    ("interior_wall_cuts",),
+    ("geometry",),
+    ("geometry_seams",),
+    ("terrain_paint", "strokes"),
+    ("fog_paint", "strokes"),
+)
+# Id lists that mostly grow at the end; stored as (kept prefix length, new tail).
+JOURNAL_LISTS: Tuple[Path, ...] = (
+    ("co_gm_ids",),
+    ("co_gm_user_ids",),
+    ("terrain_paint", "undo_stack"),
+    ("fog_paint", "undo_stack"),
+)
+_NESTED = {"terrain_paint": TerrainPaintState, "fog_paint": FogPaintState}
+_STRUCTURED = {path[0] for path in JOURNAL_COLLECTIONS + JOURNAL_LISTS} | {"draw_order", "version"}
+# Everything else is a plain value compared and stored whole.
+JOURNAL_FIELDS: Tuple[Path, ...] = tuple(
+    [(name,) for name in RoomState.model_fields if name not in _STRUCTURED]
+    + [
+        (parent, name)
+        for parent, model in _NESTED.items()
+        for name in model.model_fields
+        if (parent, name) not in JOURNAL_COLLECTIONS + JOURNAL_LISTS
+    ]
+)
+
+
+def _dotted(path: Path) -> str:
+    return ".".join(path)
+
+
+def _get(state: Any, path: Path) -> Any:
+    for name in path:
+        state = getattr(state, name)
+    return state
+
+
+@dataclass
+class RoomJournal:
+    """What the room looked like at its last checkpoint or journal entry.
+
+    Entities are shallow model copies: handlers replace container fields rather
+    than mutating them, so a copy freezes the entity and comparing it against
+    the live one is cheap (unchanged fields compare by identity).
+    """
+
+    collections: Dict[Path, Dict[str, BaseModel]] = field(default_factory=dict)
+    lists: Dict[Path, List[Any]] = field(default_factory=dict)
+    fields: Dict[Path, Any] = field(default_factory=dict)
+    entries: int = 0
+    journal_bytes: int = 0
+    checkpoint_bytes: int = 0
+
+    @classmethod
+    def capture(cls, state: RoomState) -> "RoomJournal":
+        journal = cls()
+        for path in JOURNAL_COLLECTIONS:
+            journal.collections[path] = {item_id: item.model_copy() for item_id, item in _get(state, path).items()}
+        for path in _list_paths(state):
+            journal.lists[path] = list(_get_list(state, path))
+        for path in JOURNAL_FIELDS:
+            journal.fields[path] = copy.deepcopy(_get(state, path))
+        return journal
+
+    def needs_compaction(self) -> bool:
+        if self.entries >= JOURNAL_COMPACT_EVERY_ENTRIES:
+            return True
+        return self.journal_bytes >= max(JOURNAL_COMPACT_MIN_BYTES, self.checkpoint_bytes)
+
+    def diff(self, state: RoomState) -> Dict[str, Any]:
+        """Patch from the recorded state to ``state``; the journal then records ``state``."""
+        upserts: Dict[str, Dict[str, BaseModel]] = {}
+        deletes: Dict[str, List[str]] = {}
+        for path in JOURNAL_COLLECTIONS:
+            live = _get(state, path)
+            base = self.collections[path]
+            changed = {item_id: item for item_id, item in live.items() if base.get(item_id) != item}
+            gone = [item_id for item_id in base if item_id not in live]
+            if changed:
+                frozen = {item_id: item.model_copy() for item_id, item in changed.items()}
+                base.update(frozen)
+                upserts[_dotted(path)] = frozen
+            if gone:
+                for item_id in gone:
+                    del base[item_id]
+                deletes[_dotted(path)] = gone
+
+        lists: Dict[str, List[Any]] = {}
+        for path in _list_paths(state):
+            live_list = list(_get_list(state, path))
+            base_list = self.lists.get(path, [])
+            if live_list == base_list:
+                continue
+            keep = 0
+            for old, new in zip(base_list, live_list):
+                if old != new:
+                    break
+                keep += 1
+            lists[_dotted(path)] = [keep, live_list[keep:]]
+            self.lists[path] = live_list
+
+        fields: Dict[str, Any] = {}
+        for path in JOURNAL_FIELDS:
+            value = _get(state, path)
+            if self.fields.get(path) != value:
+                self.fields[path] = copy.deepcopy(value)
+                fields[_dotted(path)] = self.fields[path]
+
+        patch: Dict[str, Any] = {"version": state.version}
+        if upserts:
+            patch["upserts"] = upserts
+        if deletes:
+            patch["deletes"] = deletes
+        if lists:
+            patch["lists"] = lists
+        if fields:
+            patch["fields"] = fields
+        return patch
+
+
+def _list_paths(state: RoomState) -> Iterable[Path]:
+    yield from JOURNAL_LISTS
+    for kind in state.draw_order:
+        yield ("draw_order", kind)
+
+
+def _get_list(state: RoomState, path: Path) -> Iterable[Any]:
+    if path[0] == "draw_order":
+        return state.draw_order.get(path[1], ())
+    return _get(state, path)
+
+
+def _parent(data: Dict[str, Any], dotted: str) -> Tuple[Dict[str, Any], str]:
+    *parents, leaf = dotted.split(".")
+    for name in parents:
+        child = data.get(name)
+        if not isinstance(child, dict):
+            child = data[name] = {}
+        data = child
+    return data, leaf
+
+
+def apply_journal_patch(data: Dict[str, Any], patch: Dict[str, Any]) -> None:
+    """Apply one journal patch to a decoded RoomState JSON object in place."""
+    for dotted, items in (patch.get("upserts") or {}).items():
+        parent, leaf = _parent(data, dotted)
+        collection = parent.get(leaf)
+        if not isinstance(collection, dict):
+            collection = parent[leaf] = {}
+        collection.update(items)
+    for dotted, ids in (patch.get("deletes") or {}).items():
+        parent, leaf = _parent(data, dotted)
+        collection = parent.get(leaf)
+        if isinstance(collection, dict):
+            for item_id in ids:
+                collection.pop(item_id, None)
+    for dotted, (keep, tail) in (patch.get("lists") or {}).items():
+        parent, leaf = _parent(data, dotted)
+        current = parent.get(leaf)
+        parent[leaf] = (current if isinstance(current, list) else [])[:keep] + list(tail)
+    for dotted, value in (patch.get("fields") or {}).items():
+        parent, leaf = _parent(data, dotted)
+        parent[leaf] = value
+    if "version" in patch:
+        data["version"] = patch["version"]
+
+
+def replay_journal(state_json: Optional[str], patches: Sequence[str]) -> Optional[str]:
+    """Fold journal patches (oldest first) onto a checkpoint blob."""
+    if not patches:
+        return state_json
+    try:
+        data = json.loads(state_json) if state_json else None
+    except (json.JSONDecodeError, ValueError):
+        return state_json
+    if not isinstance(data, dict):
+        return state_json
+    for raw in patches:
+        try:
+            patch = json.loads(raw)
+        except (json.JSONDecodeError, ValueError):
+            continue
+        if isinstance(patch, dict):
+            apply_journal_patch(data, patch)
+    # Compact like dump_json, so a replayed state and a checkpoint share snapshot chunks.
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
@@ -1,7 +1,12 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Literal, Optional
-from pydantic import BaseModel, Field
+import math
+import secrets
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Tuple
+from pydantic import BaseModel, Field, GetCoreSchemaHandler, GetJsonSchemaHandler, PrivateAttr, SerializationInfo
+from pydantic.json_schema import JsonSchemaValue
+from pydantic_core import core_schema, to_json
 
 
 EventType = Literal[
@@ -10,6 +15,9 @@ EventType = Literal[
     "HELLO",
     "PRESENCE",
     "STATE_SYNC",
+    "STATE_PATCH",
+    "STATE_RESYNC",
+    "EVENT_BATCH",
     "ROOM_SETTINGS",
     "UNDO",
     "REDO",
@@ -93,9 +101,172 @@ class Point(BaseModel):
     y: float
 
 
+_POINT_DICT_SCHEMA = core_schema.typed_dict_schema(
+    {
+        "x": core_schema.typed_dict_field(core_schema.float_schema()),
+        "y": core_schema.typed_dict_field(core_schema.float_schema()),
+    }
+)
+
+
+# Serialization context keys (see ``PointArray._serialize``).  Under
+# POINTS_JSON_CONTEXT each point list is written by ``PointArray.to_json`` and
+# spliced in by ``dump_json``; under POINTS_PACK_CONTEXT it becomes a
+# {POINTS_REF: [start, count]} reference into a shared float64 buffer.
+POINTS_JSON_CONTEXT = "points_json"
+POINTS_PACK_CONTEXT = "points_pack"
+POINTS_REF = "@pts"
+# Placeholder dump_json swaps for a point list's JSON; random, so no stored string can match it.
+_POINTS_MARK = f"@pts-{secrets.token_hex(8)}"
+_POINTS_MARK_JSON = f'"{_POINTS_MARK}"'
+
+
+class PointArray:
+    """Polyline points stored as one flat ``array('d')`` of x, y pairs.
+
+    A long stroke is a single buffer rather than one object per point.
+    Serializes to (and validates from) the plain list of ``{"x", "y"}``
+    objects, so the wire and storage shape is unchanged.  Indexing and
+    iteration yield ``Point``; hot loops should use ``pairs()`` instead.
+    Like the lists it replaces, handlers assign a new one rather than
+    mutating it in place, which is what lets ``to_json`` cache its text.
+    """
+
+    __slots__ = ("_xy", "_json")
+
+    def __init__(self, points: Iterable[Any] = ()) -> None:
+        xy = array("d")
+        for pt in points:
+            if isinstance(pt, Point):
+                xy.append(pt.x)
+                xy.append(pt.y)
+            else:
+                xy.append(float(pt["x"]))
+                xy.append(float(pt["y"]))
+        self._xy = xy
+        self._json: Optional[str] = None
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[float, float]]) -> "PointArray":
+        out = cls()
+        xy = out._xy
+        for x, y in pairs:
+            xy.append(x)
+            xy.append(y)
+        return out
+
+    @classmethod
+    def _validate(cls, value: Any) -> "PointArray":
+        if isinstance(value, cls):
+            return value
+        if not isinstance(value, (list, tuple)):
+            raise ValueError("points must be a list")
+        try:
+            return cls(value)
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ValueError("each point needs numeric x and y") from exc
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        return core_schema.json_or_python_schema(
+            json_schema=core_schema.no_info_after_validator_function(cls, core_schema.list_schema(_POINT_DICT_SCHEMA)),
+            python_schema=core_schema.no_info_plain_validator_function(cls._validate),
+            serialization=core_schema.plain_serializer_function_ser_schema(cls._serialize, info_arg=True),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema: core_schema.CoreSchema, handler: GetJsonSchemaHandler) -> JsonSchemaValue:
+        return handler(core_schema.list_schema(_POINT_DICT_SCHEMA))
+
+    def _serialize(self, info: SerializationInfo) -> Any:
+        context = info.context
+        if context is not None and self._xy and info.mode_is_json():
+            fragments = context.get(POINTS_JSON_CONTEXT)
+            if fragments is not None:
+                fragments.append(self.to_json())
+                return _POINTS_MARK
+            coords = context.get(POINTS_PACK_CONTEXT)
+            if coords is not None:
+                start = len(coords) // 2
+                coords.extend(self._xy)
+                return {POINTS_REF: [start, len(self)]}
+        return self.to_list()
+
+    def __len__(self) -> int:
+        return len(self._xy) // 2
+
+    def __iter__(self) -> Iterator[Point]:
+        for x, y in self.pairs():
+            yield Point.model_construct(x=x, y=y)
+
+    def __getitem__(self, index: int) -> Point:
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("point index out of range")
+        return Point.model_construct(x=self._xy[2 * index], y=self._xy[2 * index + 1])
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PointArray):
+            return self._xy == other._xy
+        if isinstance(other, (list, tuple)):
+            try:
+                return self._xy == PointArray(other)._xy
+            except (KeyError, TypeError, ValueError):
+                return False
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PointArray({self.to_list()!r})"
+
+    def pairs(self) -> Iterator[Tuple[float, float]]:
+        """(x, y) tuples without building a ``Point`` per step."""
+        xy = self._xy
+        return zip(xy[0::2], xy[1::2])
+
+    def to_list(self) -> List[Dict[str, float]]:
+        return [{"x": x, "y": y} for x, y in self.pairs()]
+
+    def to_json(self) -> str:
+        """JSON of ``to_list()``, written from the buffer without a dict per point.
+
+        The coordinates are serialized as one flat list with a marker string
+        after each of them, and the markers are then replaced by the keys.
+        The text is kept, so an unchanged stroke is only encoded once.
+        """
+        text = self._json
+        if text is None:
+            count = len(self)
+            if not count:
+                return "[]"
+            items: List[Any] = [None] * (4 * count)
+            items[0::2] = self._xy.tolist()
+            items[1::4] = ["y"] * count
+            items[3::4] = ["x"] * count
+            text = to_json(items, inf_nan_mode="null").decode()
+            text = text.replace(',"y",', ',"y":').replace(',"x",', '},{"x":')
+            text = self._json = '[{"x":' + text[1:-5] + "}]"
+        return text
+
+
+def dump_json(model: BaseModel, **kwargs: Any) -> str:
+    """``model.model_dump_json(**kwargs)`` with point lists written by ``PointArray.to_json``."""
+    fragments: List[str] = []
+    text = model.model_dump_json(context={POINTS_JSON_CONTEXT: fragments}, **kwargs)
+    if not fragments:
+        return text
+    parts = text.split(_POINTS_MARK_JSON)
+    out = [parts[0]]
+    for fragment, part in zip(fragments, parts[1:]):
+        out.append(fragment)
+        out.append(part)
+    return "".join(out)
+
+
 class Stroke(BaseModel):
     id: str
-    points: List[Point] = Field(default_factory=list)
+    points: PointArray = Field(default_factory=PointArray)
     color: str = "#ffffff"
     width: float = 3.0
     creator_id: Optional[str] = None
@@ -197,7 +368,7 @@ class GeometryEdge(BaseModel):
 class GeometryObject(BaseModel):
     id: str
     kind: Literal["room", "cave", "wall_path"] = "cave"
-    outer: List[Point] = Field(default_factory=list)
+    outer: PointArray = Field(default_factory=PointArray)
     closed: bool = True
     openings: List[GeometryOpening] = Field(default_factory=list)
     edges: List[GeometryEdge] = Field(default_factory=list)
@@ -223,7 +394,7 @@ class TerrainStroke(BaseModel):
     id: str
     material_id: str
     op: Literal["paint", "erase"] = "paint"
-    points: List[dict] = Field(default_factory=list)
+    points: PointArray = Field(default_factory=PointArray)
     radius: float = 60.0
     opacity: float = 0.6
     hardness: float = 0.4
@@ -241,7 +412,7 @@ class TerrainPaintState(BaseModel):
 class FogStroke(BaseModel):
     id: str
     op: Literal["cover", "reveal"] = "reveal"
-    points: List[dict] = Field(default_factory=list)
+    points: PointArray = Field(default_factory=PointArray)
     radius: float = 60.0
     opacity: float = 1.0
     hardness: float = 0.6
@@ -256,6 +427,92 @@ class FogPaintState(BaseModel):
     undo_stack: List[str] = Field(default_factory=list)
 
 
+class DrawOrder:
+    """Insertion-ordered set of ids for one draw_order layer.
+
+    Backed by a dict so membership, append, remove and move-to-top are O(1).
+    Serializes to (and validates from) a plain list of ids, so the wire shape is
+    unchanged.
+    """
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids: Iterable[str] = ()) -> None:
+        self._ids: Dict[str, None] = dict.fromkeys(ids)
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        from_list = core_schema.no_info_after_validator_function(cls, core_schema.list_schema(core_schema.str_schema()))
+        return core_schema.json_or_python_schema(
+            json_schema=from_list,
+            python_schema=core_schema.union_schema([core_schema.is_instance_schema(cls), from_list]),
+            serialization=core_schema.plain_serializer_function_ser_schema(list),
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._ids
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, DrawOrder):
+            return list(self._ids) == list(other._ids)
+        if isinstance(other, (list, tuple)):
+            return list(self._ids) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"DrawOrder({list(self._ids)!r})"
+
+    def append(self, item_id: str) -> None:
+        """Add ``item_id`` at the top if it is not already present."""
+        self._ids.setdefault(item_id, None)
+
+    def move_to_end(self, item_id: str) -> None:
+        """Add ``item_id`` at the top, moving it there if already present."""
+        self._ids.pop(item_id, None)
+        self._ids[item_id] = None
+
+    def discard(self, item_id: str) -> None:
+        self._ids.pop(item_id, None)
+
+    def insert_many(self, placements: Iterable[Tuple[Optional[int], str]]) -> None:
+        """Place each id at its target index (None means the top) in a single O(n) rebuild. Used by undo."""
+        ordered = sorted(placements, key=lambda placement: math.inf if placement[0] is None else placement[0])
+        placed = {item_id for _, item_id in ordered}
+        remaining = [item_id for item_id in self._ids if item_id not in placed]
+        ids: List[str] = []
+        cursor = 0
+        for index, item_id in ordered:
+            take = len(remaining) - cursor if index is None else max(0, index - len(ids))
+            ids.extend(remaining[cursor:cursor + take])
+            cursor += take
+            ids.append(item_id)
+        ids.extend(remaining[cursor:])
+        self._ids = dict.fromkeys(ids)
+
+    def positions(self, item_ids: Iterable[str]) -> Dict[str, int]:
+        """Current index of each present id, found in a single pass."""
+        wanted = {item_id for item_id in item_ids if item_id in self._ids}
+        found: Dict[str, int] = {}
+        if not wanted:
+            return found
+        for index, item_id in enumerate(self._ids):
+            if item_id in wanted:
+                found[item_id] = index
+                if len(found) == len(wanted):
+                    break
+        return found
+
+    def retain(self, keep: Any) -> None:
+        """Drop ids that are not in ``keep``."""
+        self._ids = {item_id: None for item_id in self._ids if item_id in keep}
+
+
 class RoomState(BaseModel):
     room_id: str
     version: int = 0
@@ -289,8 +546,8 @@ class RoomState(BaseModel):
     interiors: Dict[str, InteriorRoom] = Field(default_factory=dict)
     interior_edges: Dict[str, InteriorEdgeOverride] = Field(default_factory=dict)
     interior_wall_cuts: Dict[str, InteriorWallCut] = Field(default_factory=dict)
-    draw_order: Dict[str, List[str]] = Field(
-        default_factory=lambda: {"strokes": [], "shapes": [], "assets": [], "interiors": []}
+    draw_order: Dict[str, DrawOrder] = Field(
+        default_factory=lambda: {"strokes": DrawOrder(), "shapes": DrawOrder(), "assets": DrawOrder(), "interiors": DrawOrder()}
     )
     terrain_paint: TerrainPaintState = Field(default_factory=TerrainPaintState)
     fog_paint: FogPaintState = Field(default_factory=FogPaintState)
@@ -310,3 +567,11 @@ class WireEvent(BaseModel):
     # Optional metadata (helpful for debugging / future auth)
     client_id: Optional[str] = None
     ts: Optional[float] = None
+    # Room state version after a board mutation; stamped by the server so clients can resume.
+    version: Optional[int] = None
+    # Encoded JSON, filled in by wire.encode_event once the event is sent.
+    _encoded: Optional[str] = PrivateAttr(default=None)
+    # Payload JSON taken straight from a model (wire.model_event).
+    _payload_json: Optional[str] = PrivateAttr(default=None)
+    # The same payload for the packed subprotocol: header JSON and point coordinates (empty if it has none).
+    _packed_payload: Optional[Tuple[str, "array[float]"]] = PrivateAttr(default=None)
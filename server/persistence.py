@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from pydantic_core import to_json
+
+from .env import env_float
+from .models import DrawOrder, RoomState, dump_json
+from .storage import commit_room_writes
+from .storage_blobs import encode_state_blob
+from .storage_writer import WRITER_EXECUTOR
+
+
+# Minimum time between batch commits; rooms flushed meanwhile share the next transaction.
+STATE_WRITER_TICK_SECONDS = env_float("ROOM_WRITER_TICK_SECONDS", 0.25)
+# Most distinct rooms allowed to wait for the next batch before flushes block.
+STATE_WRITER_MAX_PENDING = 64
+# Serializes and compresses room snapshots off the event loop and the SQLite writer thread,
+# so multi-MB rooms hold up neither the loop nor other modules' writes.
+STATE_ENCODE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="room-encoder")
+
+
+def snapshot_room_state(state: RoomState) -> RoomState:
+    """Cheap copy of ``state`` that later event handlers cannot change.
+
+    Collections are copied one level deep.  Entities are shared: handlers either
+    replace an entity or assign scalar fields on it, so serializing a shared
+    entity can only ever pick up a newer value, never a torn container.
+    """
+    terrain = state.terrain_paint
+    fog = state.fog_paint
+    return state.model_copy(
+        update={
+            "co_gm_ids": list(state.co_gm_ids),
+            "co_gm_user_ids": list(state.co_gm_user_ids),
+            "layer_visibility": dict(state.layer_visibility),
+            "tokens": dict(state.tokens),
+            "strokes": dict(state.strokes),
+            "shapes": dict(state.shapes),
+            "assets": dict(state.assets),
+            "interiors": dict(state.interiors),
+            "interior_edges": dict(state.interior_edges),
+            "interior_wall_cuts": dict(state.interior_wall_cuts),
+            "draw_order": {kind: DrawOrder(order) for kind, order in state.draw_order.items()},
+            "terrain_paint": terrain.model_copy(
+                update={
+                    "materials": dict(terrain.materials),
+                    "strokes": dict(terrain.strokes),
+                    "undo_stack": list(terrain.undo_stack),
+                }
+            ),
+            "fog_paint": fog.model_copy(update={"strokes": dict(fog.strokes), "undo_stack": list(fog.undo_stack)}),
+            "geometry": dict(state.geometry),
+            "geometry_seams": dict(state.geometry_seams),
+        }
+    )
+
+
+@dataclass
+class WriterStats:
+    """Batch counters for the room state writer."""
+
+    batch_count: int = 0
+    failed_batch_count: int = 0
+    rooms_written: int = 0
+    bytes_written: int = 0
+    last_batch_size: int = 0
+    max_batch_size: int = 0
+    last_commit_ms: float = 0.0
+    max_commit_ms: float = 0.0
+    total_commit_ms: float = 0.0
+
+    def record_batch(self, size: int, nbytes: int, elapsed: float) -> None:
+        elapsed_ms = elapsed * 1000.0
+        self.batch_count += 1
+        self.rooms_written += size
+        self.bytes_written += nbytes
+        self.last_batch_size = size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.last_commit_ms = elapsed_ms
+        self.max_commit_ms = max(self.max_commit_ms, elapsed_ms)
+        self.total_commit_ms += elapsed_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "batch_count": self.batch_count,
+            "failed_batch_count": self.failed_batch_count,
+            "rooms_written": self.rooms_written,
+            "bytes_written": self.bytes_written,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "avg_batch_size": round(self.rooms_written / self.batch_count, 3) if self.batch_count else 0.0,
+            "last_commit_ms": round(self.last_commit_ms, 3),
+            "max_commit_ms": round(self.max_commit_ms, 3),
+            "avg_commit_ms": round(self.total_commit_ms / self.batch_count, 3) if self.batch_count else 0.0,
+        }
+
+
+@dataclass
+class _PendingOp:
+    checkpoint: bool
+    version: int
+    payload: Any
+    waiter: asyncio.Future
+
+
+def _encode_batch(
+    batch: Dict[str, List[Tuple[bool, int, Any]]],
+) -> Tuple[Dict[str, Union[str, bytes]], List[Tuple[str, int, str]], Dict[str, List[int]], float]:
+    started = time.perf_counter()
+    checkpoints: Dict[str, Union[str, bytes]] = {}
+    journal: List[Tuple[str, int, str]] = []
+    sizes: Dict[str, List[int]] = {}
+    for room_id, ops in batch.items():
+        room_sizes = sizes[room_id] = []
+        for checkpoint, version, payload in ops:
+            if checkpoint:
+                encoded = dump_json(payload)
+                checkpoints[room_id] = encode_state_blob(encoded)
+            else:
+                encoded = to_json(payload).decode()
+                journal.append((room_id, version, encoded))
+            room_sizes.append(len(encoded))
+    return checkpoints, journal, sizes, time.perf_counter() - started
+
+
+def _commit(checkpoints: Dict[str, Union[str, bytes]], journal: List[Tuple[str, int, str]]) -> float:
+    started = time.perf_counter()
+    commit_room_writes(checkpoints, journal)
+    return time.perf_counter() - started
+
+
+class StateWriter:
+    """Collects room writes and commits them in one transaction per tick.
+
+    A room either sends a full checkpoint snapshot (``write``) or a journal
+    patch on top of its last checkpoint (``append``).  Batches are encoded and
+    compressed on ``STATE_ENCODE_EXECUTOR`` and then committed, in order, on the
+    shared SQLite writer thread, which only runs the SQL.  A checkpoint makes
+    anything still queued for that room redundant, so it replaces it.
+    After a failed batch the room must checkpoint again before appending, so the
+    journal never has a gap.  Flushes wait when ``STATE_WRITER_MAX_PENDING``
+    rooms are already queued, so a slow disk slows autosave down instead of
+    piling snapshots up in memory.
+    """
+
+    def __init__(self, tick_seconds: Optional[float] = None, max_pending: int = STATE_WRITER_MAX_PENDING) -> None:
+        self.tick_seconds = STATE_WRITER_TICK_SECONDS if tick_seconds is None else tick_seconds
+        self.stats = WriterStats()
+        self._max_pending = max_pending
+        self._pending: Dict[str, List[_PendingOp]] = {}
+        self._writing: Dict[str, List[_PendingOp]] = {}
+        self._needs_checkpoint: Set[str] = set()
+        self._space: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def in_flight(self, room_id: str) -> bool:
+        return room_id in self._pending or room_id in self._writing
+
+    async def drain(self, room_id: str) -> None:
+        """Wait until nothing for ``room_id`` is queued or being committed; failed writes are not raised."""
+        while True:
+            waiters = [op.waiter for op in self._writing.get(room_id, []) + self._pending.get(room_id, [])]
+            if not waiters:
+                return
+            await asyncio.wait(waiters)
+
+    async def write(self, room_id: str, snapshot: RoomState) -> Tuple[int, float]:
+        """Checkpoint ``snapshot``; returns (bytes written, seconds the batch took to encode and commit)."""
+        return await self._enqueue(room_id, True, snapshot.version, snapshot)
+
+    async def append(self, room_id: str, version: int, patch: Dict[str, Any]) -> Tuple[int, float]:
+        """Journal ``patch`` after the room's last checkpoint; same return value as ``write``."""
+        if room_id in self._needs_checkpoint:
+            raise RuntimeError(f"Room {room_id} must checkpoint before journaling")
+        return await self._enqueue(room_id, False, version, patch)
+
+    async def _enqueue(self, room_id: str, checkpoint: bool, version: int, payload: Any) -> Tuple[int, float]:
+        while room_id not in self._pending and len(self._pending) >= self._max_pending:
+            if self._space is None:
+                self._space = asyncio.Event()
+            self._space.clear()
+            await self._space.wait()
+        op = _PendingOp(checkpoint, version, payload, asyncio.get_running_loop().create_future())
+        ops = self._pending.setdefault(room_id, [])
+        if checkpoint:
+            self._needs_checkpoint.discard(room_id)
+            for superseded in ops:
+                if not superseded.waiter.done():
+                    superseded.waiter.set_result((0, 0.0))
+            ops.clear()
+        ops.append(op)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        # Shielded: a cancelled autosave task must not pull its write out of a batch.
+        return await asyncio.shield(op.waiter)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            self._writing = batch
+            if self._space is not None:
+                self._space.set()
+            plain = {room_id: [(op.checkpoint, op.version, op.payload) for op in ops] for room_id, ops in batch.items()}
+            try:
+                checkpoints, journal, sizes, encode_seconds = await loop.run_in_executor(STATE_ENCODE_EXECUTOR, _encode_batch, plain)
+                elapsed = encode_seconds + await loop.run_in_executor(WRITER_EXECUTOR, _commit, checkpoints, journal)
+            except Exception as exc:
+                self.stats.failed_batch_count += 1
+                self._fail(batch, exc)
+            else:
+                self.stats.record_batch(len(batch), sum(sum(room_sizes) for room_sizes in sizes.values()), elapsed)
+                for room_id, ops in batch.items():
+                    for op, nbytes in zip(ops, sizes[room_id]):
+                        if not op.waiter.done():
+                            op.waiter.set_result((nbytes, elapsed))
+            finally:
+                self._writing = {}
+            await asyncio.sleep(self.tick_seconds)
+
+    def _fail(self, batch: Dict[str, List[_PendingOp]], exc: Exception) -> None:
+        for room_id, ops in batch.items():
+            self._needs_checkpoint.add(room_id)
+            # Journal patches queued behind the failed batch would leave a gap.
+            queued = self._pending.get(room_id)
+            if queued and not queued[0].checkpoint:
+                ops = ops + self._pending.pop(room_id)
+            for op in ops:
+                if not op.waiter.done():
+                    op.waiter.set_exception(exc)
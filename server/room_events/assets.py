@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
 from ..models import AssetInstance, WireEvent
+from ..wire import model_event
 
 if TYPE_CHECKING:
     from ..rooms import Room, RoomManager
@@ -63,11 +64,11 @@ def apply_asset_event(
             creator_id=client_id,
             locked=bool(payload.get("locked", False)),
         )
-        manager._push_history(room)
+        manager._push_history(room, assets=[asset.id])
         room.state.assets[asset.id] = asset
         manager._append_order(room.state, "assets", asset.id)
         manager._mark_dirty(room_id, room)
-        return WireEvent(type="ASSET_INSTANCE_CREATE", payload=asset.model_dump())
+        return model_event("ASSET_INSTANCE_CREATE", asset)
 
     if event_type == "ASSET_INSTANCE_UPDATE":
         def _clamp_asset_scale(value: float) -> float:
@@ -87,7 +88,7 @@ def apply_asset_event(
         if not manager.can_edit_asset(room, user_id, client_id, asset):
             return WireEvent(type="ERROR", payload={"message": "Not allowed to edit asset", "id": asset_id})
         if bool(payload.get("commit", False)):
-            manager._push_history(room)
+            manager._push_history(room, assets=[asset_id])
         changed = False
         for key in ("x", "y", "rotation"):
             if key in payload:
@@ -113,14 +114,14 @@ def apply_asset_event(
         if changed:
             room.state.assets[asset.id] = asset
             manager._mark_dirty(room_id, room)
-        response_payload = asset.model_dump()
+        extra: Dict[str, Any] = {}
         if "commit" in payload:
-            response_payload["commit"] = bool(payload.get("commit", False))
+            extra["commit"] = bool(payload.get("commit", False))
         if "move_seq" in payload:
-            response_payload["move_seq"] = payload.get("move_seq")
+            extra["move_seq"] = payload.get("move_seq")
         if "move_client" in payload:
-            response_payload["move_client"] = payload.get("move_client")
-        return WireEvent(type="ASSET_INSTANCE_UPDATE", payload=response_payload)
+            extra["move_client"] = payload.get("move_client")
+        return model_event("ASSET_INSTANCE_UPDATE", asset, **extra)
 
     if event_type == "ASSET_INSTANCE_DELETE":
         asset_id = payload.get("id")
@@ -129,7 +130,7 @@ def apply_asset_event(
             return WireEvent(type="ASSET_INSTANCE_DELETE", payload={"id": asset_id})
         if not manager.can_delete_asset(room, user_id, client_id, asset):
             return WireEvent(type="ERROR", payload={"message": "Not allowed to delete asset", "id": asset_id})
-        manager._push_history(room)
+        manager._push_history(room, assets=[asset_id])
         room.state.assets.pop(asset_id, None)
         manager._remove_order(room.state, "assets", asset_id)
         manager._mark_dirty(room_id, room)
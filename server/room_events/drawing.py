@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
-from ..models import Point, Shape, Stroke, WireEvent
+from ..models import PointArray, Shape, Stroke, WireEvent
+from ..wire import model_event
 
 if TYPE_CHECKING:
     from ..rooms import Room, RoomManager
@@ -42,7 +43,7 @@ def apply_stroke_event(
 
         stroke = Stroke(
             id=sid,
-            points=[Point(x=float(pp["x"]), y=float(pp["y"])) for pp in pts if "x" in pp and "y" in pp],
+            points=PointArray(pp for pp in pts if "x" in pp and "y" in pp),
             color=color,
             width=width,
             creator_id=client_id,
@@ -54,15 +55,16 @@ def apply_stroke_event(
         if len(stroke.points) < 2:
             return WireEvent(type="ERROR", payload={"message": "Stroke too short"})
 
-        manager._push_history(room)
+        manager._push_history(room, strokes=[sid])
         room.state.strokes[sid] = stroke
         manager._append_order(room.state, "strokes", sid)
+        manager._sync_spatial(room, "strokes", [sid])
         manager._mark_dirty(room_id, room)
         return WireEvent(
             type="STROKE_ADD",
             payload={
                 "id": sid,
-                "points": [{"x": pt.x, "y": pt.y} for pt in stroke.points],
+                "points": stroke.points.to_list(),
                 "color": stroke.color,
                 "width": stroke.width,
                 "locked": stroke.locked,
@@ -85,10 +87,11 @@ def apply_stroke_event(
                 existing.append(sid)
         if not existing:
             return WireEvent(type="STROKE_DELETE", payload={"ids": []})
-        manager._push_history(room)
+        manager._push_history(room, strokes=existing)
         for sid in existing:
             room.state.strokes.pop(sid, None)
             manager._remove_order(room.state, "strokes", sid)
+        manager._sync_spatial(room, "strokes", existing)
         manager._mark_dirty(room_id, room)
         return WireEvent(type="STROKE_DELETE", payload={"ids": existing})
 
@@ -99,7 +102,7 @@ def apply_stroke_event(
         stroke = room.state.strokes.get(sid)
         if not stroke:
             return WireEvent(type="ERROR", payload={"message": "Unknown stroke", "id": sid})
-        manager._push_history(room)
+        manager._push_history(room, strokes=[sid])
         stroke.locked = bool(payload.get("locked", False))
         room.state.strokes[sid] = stroke
         manager._mark_dirty(room_id, room)
@@ -116,7 +119,8 @@ def apply_stroke_event(
         erase_tokens = bool(payload.get("erase_tokens", True))
 
         stroke_ids = []
-        for sid, stroke in list(room.state.strokes.items()):
+        for sid in manager._spatial_candidates(room, "strokes", cx, cy, radius):
+            stroke = room.state.strokes[sid]
             if not manager.can_delete_stroke(room, user_id, client_id, stroke):
                 continue
             if manager._stroke_hits_circle(stroke, cx, cy, radius):
@@ -124,7 +128,8 @@ def apply_stroke_event(
 
         shape_ids = []
         if erase_shapes:
-            for sid, shape in list(room.state.shapes.items()):
+            for sid in manager._spatial_candidates(room, "shapes", cx, cy, radius):
+                shape = room.state.shapes[sid]
                 if not manager.can_delete_shape(room, user_id, client_id, shape):
                     continue
                 if manager._shape_hits_circle(shape, cx, cy, radius):
@@ -132,7 +137,8 @@ def apply_stroke_event(
 
         token_ids = []
         if erase_tokens:
-            for token_id, token in list(room.state.tokens.items()):
+            for token_id in manager._spatial_candidates(room, "tokens", cx, cy, radius):
+                token = room.state.tokens[token_id]
                 if not manager.can_delete_token(room, user_id, client_id, token):
                     continue
                 if manager._token_hits_circle(token, cx, cy, radius):
@@ -141,7 +147,7 @@ def apply_stroke_event(
         if not stroke_ids and not shape_ids and not token_ids:
             return WireEvent(type="ERASE_AT", payload={"stroke_ids": [], "shape_ids": [], "token_ids": []})
 
-        manager._push_history(room)
+        manager._push_history(room, strokes=stroke_ids, shapes=shape_ids, tokens=token_ids)
         for sid in stroke_ids:
             room.state.strokes.pop(sid, None)
             manager._remove_order(room.state, "strokes", sid)
@@ -150,6 +156,9 @@ def apply_stroke_event(
             manager._remove_order(room.state, "shapes", sid)
         for token_id in token_ids:
             room.state.tokens.pop(token_id, None)
+        manager._sync_spatial(room, "strokes", stroke_ids)
+        manager._sync_spatial(room, "shapes", shape_ids)
+        manager._sync_spatial(room, "tokens", token_ids)
 
         manager._mark_dirty(room_id, room)
         return WireEvent(type="ERASE_AT", payload={"stroke_ids": stroke_ids, "shape_ids": shape_ids, "token_ids": token_ids})
@@ -205,11 +214,12 @@ def apply_shape_event(
             layer=layer,
             layer_band=layer_band,
         )
-        manager._push_history(room)
+        manager._push_history(room, shapes=[sid])
         room.state.shapes[sid] = shape
         manager._append_order(room.state, "shapes", sid)
+        manager._sync_spatial(room, "shapes", [sid])
         manager._mark_dirty(room_id, room)
-        return WireEvent(type="SHAPE_ADD", payload=shape.model_dump())
+        return model_event("SHAPE_ADD", shape)
 
     if event_type == "SHAPE_UPDATE":
         sid = payload.get("id")
@@ -220,7 +230,7 @@ def apply_shape_event(
             return WireEvent(type="ERROR", payload={"message": "Not allowed to edit shape", "id": sid})
 
         if bool(payload.get("commit", False)):
-            manager._push_history(room)
+            manager._push_history(room, shapes=[sid])
 
         changed = False
         for key in ("x1", "y1", "x2", "y2"):
@@ -250,15 +260,16 @@ def apply_shape_event(
 
         if changed:
             room.state.shapes[sid] = shape
+            manager._sync_spatial(room, "shapes", [sid])
             manager._mark_dirty(room_id, room)
-        response_payload = shape.model_dump()
+        extra: Dict[str, Any] = {}
         if "commit" in payload:
-            response_payload["commit"] = bool(payload.get("commit", False))
+            extra["commit"] = bool(payload.get("commit", False))
         if "move_seq" in payload:
-            response_payload["move_seq"] = payload.get("move_seq")
+            extra["move_seq"] = payload.get("move_seq")
         if "move_client" in payload:
-            response_payload["move_client"] = payload.get("move_client")
-        return WireEvent(type="SHAPE_UPDATE", payload=response_payload)
+            extra["move_client"] = payload.get("move_client")
+        return model_event("SHAPE_UPDATE", shape, **extra)
 
     if event_type == "SHAPE_SET_LOCK":
         if not manager._is_gm(room, user_id, client_id):
@@ -267,7 +278,7 @@ def apply_shape_event(
         shape = room.state.shapes.get(sid)
         if not shape:
             return WireEvent(type="ERROR", payload={"message": "Unknown shape", "id": sid})
-        manager._push_history(room)
+        manager._push_history(room, shapes=[sid])
         shape.locked = bool(payload.get("locked", False))
         room.state.shapes[sid] = shape
         manager._mark_dirty(room_id, room)
@@ -277,9 +288,10 @@ def apply_shape_event(
         sid = payload.get("id")
         shape = room.state.shapes.get(sid)
         if shape and manager.can_delete_shape(room, user_id, client_id, shape):
-            manager._push_history(room)
+            manager._push_history(room, shapes=[sid])
             room.state.shapes.pop(sid, None)
             manager._remove_order(room.state, "shapes", sid)
+            manager._sync_spatial(room, "shapes", [sid])
             manager._mark_dirty(room_id, room)
         return WireEvent(type="SHAPE_DELETE", payload={"id": sid})
 
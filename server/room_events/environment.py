@@ -3,7 +3,8 @@ from __future__ import annotations
 import time
 from typing import TYPE_CHECKING, List, Optional
 
-from ..models import FogStroke, TerrainStroke, WireEvent
+from ..models import FogStroke, PointArray, TerrainStroke, WireEvent
+from ..wire import model_event
 
 if TYPE_CHECKING:
     from ..rooms import Room, RoomManager
@@ -58,7 +59,7 @@ def apply_terrain_event(
             id=sid,
             material_id=material_id,
             op=op,
-            points=[{"x": float(pt["x"]), "y": float(pt["y"])} for pt in pts if "x" in pt and "y" in pt],
+            points=PointArray(pt for pt in pts if "x" in pt and "y" in pt),
             radius=radius,
             opacity=opacity,
             hardness=hardness,
@@ -71,20 +72,7 @@ def apply_terrain_event(
         room.state.terrain_paint.strokes[sid] = stroke
         room.state.terrain_paint.undo_stack.append(sid)
         manager._mark_dirty(room_id, room)
-        return WireEvent(
-            type="TERRAIN_STROKE_ADD",
-            payload={
-                "id": stroke.id,
-                "material_id": stroke.material_id,
-                "op": stroke.op,
-                "points": stroke.points,
-                "radius": stroke.radius,
-                "opacity": stroke.opacity,
-                "hardness": stroke.hardness,
-                "created_by": stroke.created_by,
-                "created_at": stroke.created_at,
-            },
-        )
+        return model_event("TERRAIN_STROKE_ADD", stroke)
 
     if event_type == "TERRAIN_STROKE_UNDO":
         if not manager.can_paint_terrain(room, user_id, client_id):
@@ -170,7 +158,7 @@ def apply_fog_event(
         stroke = FogStroke(
             id=sid,
             op=op,
-            points=[{"x": float(pt["x"]), "y": float(pt["y"])} for pt in pts if "x" in pt and "y" in pt],
+            points=PointArray(pt for pt in pts if "x" in pt and "y" in pt),
             radius=radius,
             opacity=opacity,
             hardness=hardness,
@@ -184,6 +172,6 @@ def apply_fog_event(
         room.state.fog_paint.strokes[sid] = stroke
         room.state.fog_paint.undo_stack.append(sid)
         manager._mark_dirty(room_id, room)
-        return WireEvent(type="FOG_STROKE_ADD", payload=stroke.model_dump())
+        return model_event("FOG_STROKE_ADD", stroke)
 
     return WireEvent(type="ERROR", payload={"message": f"Unhandled fog event: {event_type}"})
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Optional
 
-from ..models import GeometryEdge, GeometryObject, GeometryOpening, GeometrySeamOverride, Point, WireEvent
+from ..models import GeometryEdge, GeometryObject, GeometryOpening, GeometrySeamOverride, PointArray, WireEvent
 
 if TYPE_CHECKING:
     from ..rooms import Room, RoomManager
@@ -14,17 +14,18 @@ _VALID_RENDER_MODES = {"clean_stroke", "rough_stroke", "rock_wall", "hidden"}
 _VALID_SEAM_MODES = {"open", "closed", "wall"}
 
 
-def _parse_points(raw: object) -> list[Point]:
+def _parse_points(raw: object) -> PointArray:
+    pts = PointArray()
     if not isinstance(raw, list):
-        return []
-    pts = []
+        return pts
+    pairs = []
     for p in raw:
         if isinstance(p, dict):
             try:
-                pts.append(Point(x=float(p.get("x", 0)), y=float(p.get("y", 0))))
+                pairs.append((float(p.get("x", 0)), float(p.get("y", 0))))
             except (TypeError, ValueError):
                 pass
-    return pts
+    return PointArray.from_pairs(pairs)
 
 
 def _parse_openings(raw: object, edge_count: int) -> list[GeometryOpening]:
@@ -128,7 +129,7 @@ def apply_geometry_event(
         if len(outer) < min_pts:
             return WireEvent(type="ERROR", payload={"message": f"Geometry '{kind}' requires at least {min_pts} outer points"})
         edge_count = len(outer) if closed else max(0, len(outer) - 1)
-        manager._push_history(room)
+        manager._push_history(room, geometry=[geo_id])
         obj = GeometryObject(
             id=geo_id,
             kind=kind,
@@ -153,7 +154,7 @@ def apply_geometry_event(
         obj = room.state.geometry.get(geo_id)
         if not obj:
             return WireEvent(type="ERROR", payload={"message": "Geometry not found"})
-        manager._push_history(room)
+        manager._push_history(room, geometry=[geo_id])
         if "kind" in payload:
             k = str(payload["kind"]).strip()
             if k in _VALID_KINDS:
@@ -189,7 +190,7 @@ def apply_geometry_event(
         geo_id = str(payload.get("id") or "").strip()
         if geo_id not in room.state.geometry:
             return WireEvent(type="GEOMETRY_DELETE", payload={"id": geo_id})
-        manager._push_history(room)
+        manager._push_history(room, geometry=[geo_id])
         room.state.geometry.pop(geo_id, None)
         manager._mark_dirty(room_id, room)
         return WireEvent(type="GEOMETRY_DELETE", payload={"id": geo_id})
@@ -205,7 +206,7 @@ def apply_geometry_event(
             return WireEvent(type="ERROR", payload={"message": f"Invalid seam mode: {mode}"})
         if mode == "wall" and schema_version < 2:
             mode = "closed"
-        manager._push_history(room)
+        manager._push_history(room, geometry_seams=[seam_key])
         seam = GeometrySeamOverride(
             id=override_id or seam_key,
             seam_key=seam_key,
@@ -225,7 +226,7 @@ def _dump(obj: GeometryObject) -> dict:
     return {
         "id": obj.id,
         "kind": obj.kind,
-        "outer": [{"x": p.x, "y": p.y} for p in obj.outer],
+        "outer": obj.outer.to_list(),
         "closed": obj.closed,
         "openings": [
             {
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Optional
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
 
 from ..models import RoomState, WireEvent
 
@@ -8,6 +11,133 @@ if TYPE_CHECKING:
     from ..rooms import Room, RoomManager
 
 
+HISTORY_LIMIT = 50
+# RoomState dict collections that undo/redo can restore entity-by-entity.
+HISTORY_COLLECTIONS = (
+    "tokens",
+    "strokes",
+    "shapes",
+    "assets",
+    "interiors",
+    "interior_edges",
+    "interior_wall_cuts",
+    "geometry",
+    "geometry_seams",
+)
+# Collections whose ids also live in RoomState.draw_order.
+ORDERED_COLLECTIONS = ("strokes", "shapes", "assets", "interiors")
+# Collections covered by the eraser spatial index.
+SPATIAL_COLLECTIONS = ("strokes", "shapes", "tokens")
+SETTINGS_FIELDS = (
+    "allow_players_move",
+    "allow_all_move",
+    "lockdown",
+    "background_mode",
+    "background_url",
+    "terrain_seed",
+    "terrain_style",
+    "world_tone",
+    "layer_visibility",
+)
+
+
+@dataclass
+class HistoryEntry:
+    """Prior values of everything one mutating event touched.
+
+    ``entities`` maps (collection, id) to the entity as it was before the event,
+    or None if it did not exist yet.  ``order`` holds the prior draw_order
+    position for ordered collections.  ``settings`` is only set for events that
+    change room-level settings.
+    """
+
+    entities: Dict[Tuple[str, str], Optional[BaseModel]] = field(default_factory=dict)
+    order: Dict[Tuple[str, str], Optional[int]] = field(default_factory=dict)
+    settings: Optional[Dict[str, Any]] = None
+
+
+def capture_history_entry(state: RoomState, settings: bool = False, **targets: Iterable[str]) -> HistoryEntry:
+    """Record the current value of the given entities so they can be restored later.
+
+    Handlers replace container fields (points, badges, openings, ...) rather than
+    mutating them in place, so a shallow model copy is enough to freeze an entity.
+    """
+    entry = HistoryEntry()
+    for kind, ids in targets.items():
+        if kind not in HISTORY_COLLECTIONS:
+            raise ValueError(f"Unknown history collection: {kind}")
+        collection = getattr(state, kind)
+        ids = list(ids)
+        for item_id in ids:
+            key = (kind, item_id)
+            if key in entry.entities:
+                continue
+            current = collection.get(item_id)
+            entry.entities[key] = current.model_copy() if current is not None else None
+        if kind in ORDERED_COLLECTIONS:
+            order = state.draw_order.get(kind)
+            positions = order.positions(ids) if order is not None else {}
+            for item_id in ids:
+                entry.order[(kind, item_id)] = positions.get(item_id)
+    if settings:
+        entry.settings = {name: getattr(state, name) for name in SETTINGS_FIELDS}
+        entry.settings["layer_visibility"] = dict(state.layer_visibility)
+    return entry
+
+
+def _targets_of(entry: HistoryEntry) -> Dict[str, List[str]]:
+    targets: Dict[str, List[str]] = {}
+    for kind, item_id in entry.entities:
+        targets.setdefault(kind, []).append(item_id)
+    return targets
+
+
+def restore_history_entry(manager: "RoomManager", room: "Room", entry: HistoryEntry) -> Tuple[HistoryEntry, Dict[str, Any]]:
+    """Apply ``entry`` to ``room.state``.
+
+    Returns the inverse entry (for the opposite stack) and a STATE_PATCH payload
+    describing exactly what changed.
+    """
+    state = room.state
+    targets = _targets_of(entry)
+    inverse = capture_history_entry(state, settings=entry.settings is not None, **targets)
+    upserts: Dict[str, Dict[str, Any]] = {}
+    deletes: Dict[str, List[str]] = {}
+    touched_order: set[str] = set()
+
+    for (kind, item_id), value in entry.entities.items():
+        collection = getattr(state, kind)
+        if kind in ORDERED_COLLECTIONS:
+            manager._remove_order(state, kind, item_id)
+            touched_order.add(kind)
+        if value is None:
+            collection.pop(item_id, None)
+            deletes.setdefault(kind, []).append(item_id)
+        else:
+            collection[item_id] = value
+            upserts.setdefault(kind, {})[item_id] = value.model_dump()
+
+    placements: Dict[str, List[Tuple[Optional[int], str]]] = {}
+    for (kind, item_id), pos in entry.order.items():
+        if entry.entities.get((kind, item_id)) is not None:
+            placements.setdefault(kind, []).append((pos, item_id))
+    for kind, items in placements.items():
+        manager._restore_order(state, kind, items)
+
+    for kind in SPATIAL_COLLECTIONS:
+        if kind in targets:
+            manager._sync_spatial(room, kind, targets[kind])
+
+    patch: Dict[str, Any] = {"upserts": upserts, "deletes": deletes}
+    if touched_order:
+        patch["draw_order"] = {kind: list(state.draw_order.get(kind, [])) for kind in sorted(touched_order)}
+    if entry.settings is not None:
+        for name, value in entry.settings.items():
+            setattr(state, name, value)
+        patch["settings"] = {name: getattr(state, name) for name in SETTINGS_FIELDS}
+    return inverse, patch
+
+
 def apply_history_event(
     manager: "RoomManager",
     room_id: str,
@@ -21,23 +151,19 @@ def apply_history_event(
             return WireEvent(type="ERROR", payload={"message": "Only GM can undo"})
         if not room.history:
             return WireEvent(type="ERROR", payload={"message": "Nothing to undo"})
-        room.future.append(manager._snapshot_json(room))
-        prev = room.history.pop()
-        room.state = RoomState.model_validate_json(prev)
-        manager._normalize_order(room.state)
+        inverse, patch = restore_history_entry(manager, room, room.history.pop())
+        room.future.append(inverse)
         manager._mark_dirty(room_id, room)
-        return WireEvent(type="STATE_SYNC", payload=room.state.model_dump(exclude={"gm_key_hash"}))
+        return WireEvent(type="STATE_PATCH", payload={"version": room.state.version, **patch})
 
     if event_type == "REDO":
         if not manager._is_gm(room, user_id, client_id):
             return WireEvent(type="ERROR", payload={"message": "Only GM can redo"})
         if not room.future:
             return WireEvent(type="ERROR", payload={"message": "Nothing to redo"})
-        room.history.append(manager._snapshot_json(room))
-        nxt = room.future.pop()
-        room.state = RoomState.model_validate_json(nxt)
-        manager._normalize_order(room.state)
+        inverse, patch = restore_history_entry(manager, room, room.future.pop())
+        room.history.append(inverse)
         manager._mark_dirty(room_id, room)
-        return WireEvent(type="STATE_SYNC", payload=room.state.model_dump(exclude={"gm_key_hash"}))
+        return WireEvent(type="STATE_PATCH", payload={"version": room.state.version, **patch})
 
     return WireEvent(type="ERROR", payload={"message": "Unhandled history event"})
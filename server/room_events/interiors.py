@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import math
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
 from ..models import InteriorEdgeOverride, InteriorRoom, InteriorWallCut, WireEvent
+from ..wire import model_event
 
 if TYPE_CHECKING:
     from ..rooms import Room, RoomManager
@@ -62,7 +63,7 @@ def apply_interior_event(
         interior_id = str(payload.get("id") or "").strip()
         if not interior_id:
             return WireEvent(type="ERROR", payload={"message": "Missing interior id"})
-        manager._push_history(room)
+        manager._push_history(room, interiors=[interior_id])
         item = InteriorRoom(
             id=interior_id,
             x=float(payload.get("x", 0)),
@@ -77,7 +78,7 @@ def apply_interior_event(
         room.state.interiors[item.id] = item
         manager._append_order(room.state, "interiors", item.id)
         manager._mark_dirty(room_id, room)
-        return WireEvent(type="INTERIOR_ADD", payload=item.model_dump())
+        return model_event("INTERIOR_ADD", item)
 
     if event_type == "INTERIOR_UPDATE":
         interior_id = str(payload.get("id") or "").strip()
@@ -85,7 +86,7 @@ def apply_interior_event(
         if not item:
             return WireEvent(type="ERROR", payload={"message": "Interior not found"})
         if bool(payload.get("commit", False)):
-            manager._push_history(room)
+            manager._push_history(room, interiors=[interior_id])
         changed = False
         for key in ("x", "y"):
             if key in payload:
@@ -110,34 +111,34 @@ def apply_interior_event(
             room.state.interiors[item.id] = item
             manager._append_order(room.state, "interiors", item.id)
             manager._mark_dirty(room_id, room)
-        response_payload = item.model_dump()
+        extra: Dict[str, Any] = {}
         if "commit" in payload:
-            response_payload["commit"] = bool(payload.get("commit", False))
+            extra["commit"] = bool(payload.get("commit", False))
         if "move_seq" in payload:
-            response_payload["move_seq"] = payload.get("move_seq")
+            extra["move_seq"] = payload.get("move_seq")
         if "move_client" in payload:
-            response_payload["move_client"] = payload.get("move_client")
-        return WireEvent(type="INTERIOR_UPDATE", payload=response_payload)
+            extra["move_client"] = payload.get("move_client")
+        return model_event("INTERIOR_UPDATE", item, **extra)
 
     if event_type == "INTERIOR_DELETE":
         interior_id = str(payload.get("id") or "").strip()
         if interior_id not in room.state.interiors:
             return WireEvent(type="INTERIOR_DELETE", payload={"id": interior_id})
-        manager._push_history(room)
-        room.state.interiors.pop(interior_id, None)
-        manager._remove_order(room.state, "interiors", interior_id)
         dead_edges = [
             edge_id
             for edge_id, edge in room.state.interior_edges.items()
             if edge.room_a_id == interior_id or edge.room_b_id == interior_id
         ]
-        for edge_id in dead_edges:
-            room.state.interior_edges.pop(edge_id, None)
         dead_cuts = [
             cut_id
             for cut_id, cut in room.state.interior_wall_cuts.items()
             if cut.room_id == interior_id
         ]
+        manager._push_history(room, interiors=[interior_id], interior_edges=dead_edges, interior_wall_cuts=dead_cuts)
+        room.state.interiors.pop(interior_id, None)
+        manager._remove_order(room.state, "interiors", interior_id)
+        for edge_id in dead_edges:
+            room.state.interior_edges.pop(edge_id, None)
         for cut_id in dead_cuts:
             room.state.interior_wall_cuts.pop(cut_id, None)
         manager._mark_dirty(room_id, room)
@@ -148,7 +149,7 @@ def apply_interior_event(
         item = room.state.interiors.get(interior_id)
         if not item:
             return WireEvent(type="ERROR", payload={"message": "Interior not found"})
-        manager._push_history(room)
+        manager._push_history(room, interiors=[interior_id])
         item.locked = bool(payload.get("locked", False))
         room.state.interiors[item.id] = item
         manager._mark_dirty(room_id, room)
@@ -174,12 +175,12 @@ def apply_interior_event(
                 not _edge_key_matches_rooms(edge_key, room_a_id, room_b_id)
             ):
                 return WireEvent(type="ERROR", payload={"message": "Door overrides require a valid shared interior edge"})
-        manager._push_history(room)
         existing_ids = [
             existing_id
             for existing_id, existing in room.state.interior_edges.items()
             if existing.edge_key == edge_key
         ]
+        manager._push_history(room, interior_edges=[*existing_ids, edge_id])
 
         if mode == "auto":
             for existing_id in existing_ids:
@@ -211,7 +212,7 @@ def apply_interior_event(
         )
         room.state.interior_edges[keep_id] = edge
         manager._mark_dirty(room_id, room)
-        return WireEvent(type="INTERIOR_EDGE_SET", payload=edge.model_dump())
+        return model_event("INTERIOR_EDGE_SET", edge)
 
     if event_type == "INTERIOR_WALL_CUT_ADD":
         cut_id = str(payload.get("id") or "").strip()
@@ -223,7 +224,7 @@ def apply_interior_event(
             return WireEvent(type="ERROR", payload={"message": "Invalid wall cut"})
         if room_ref not in room.state.interiors:
             return WireEvent(type="ERROR", payload={"message": "Interior not found"})
-        manager._push_history(room)
+        manager._push_history(room, interior_wall_cuts=[cut_id])
         cut = InteriorWallCut(
             id=cut_id,
             room_id=room_ref,
@@ -235,7 +236,7 @@ def apply_interior_event(
         )
         room.state.interior_wall_cuts[cut.id] = cut
         manager._mark_dirty(room_id, room)
-        return WireEvent(type="INTERIOR_WALL_CUT_ADD", payload=cut.model_dump())
+        return model_event("INTERIOR_WALL_CUT_ADD", cut)
 
     if event_type == "INTERIOR_WALL_CUT_REMOVE":
         cut_id = str(payload.get("id") or "").strip()
@@ -243,7 +244,7 @@ def apply_interior_event(
             return WireEvent(type="ERROR", payload={"message": "Missing wall cut id"})
         if cut_id not in room.state.interior_wall_cuts:
             return WireEvent(type="INTERIOR_WALL_CUT_REMOVE", payload={"id": cut_id})
-        manager._push_history(room)
+        manager._push_history(room, interior_wall_cuts=[cut_id])
         room.state.interior_wall_cuts.pop(cut_id, None)
         manager._mark_dirty(room_id, room)
         return WireEvent(type="INTERIOR_WALL_CUT_REMOVE", payload={"id": cut_id})
@@ -20,7 +20,7 @@ def apply_settings_event(
     if not manager._is_gm(room, user_id, client_id):
         return WireEvent(type="ERROR", payload={"message": "Only GM can change room settings"})
 
-    manager._push_history(room)
+    manager._push_history(room, settings=True)
     mode_changed_to_terrain = False
     had_explicit_terrain_seed = "terrain_seed" in payload
     if "allow_players_move" in payload:
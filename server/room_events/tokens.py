@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Dict, List, Optional, Set
 
 from ..models import Token, WireEvent
+from ..wire import model_event
 
 if TYPE_CHECKING:
     from ..rooms import Room, RoomManager
@@ -21,7 +22,7 @@ def apply_token_event(
     user_id: Optional[int],
 ) -> WireEvent:
     if event_type == "TOKEN_CREATE":
-        manager._push_history(room)
+        manager._push_history(room, tokens=[payload.get("id")])
         badges = payload.get("badges", [])
         if isinstance(badges, list):
             badges = sorted({str(b).strip() for b in badges if str(b).strip() in VALID_TOKEN_BADGES})
@@ -54,8 +55,9 @@ def apply_token_event(
         )
         token.size_scale = max(0.25, min(4.0, token.size_scale))
         room.state.tokens[token.id] = token
+        manager._sync_spatial(room, "tokens", [token.id])
         manager._mark_dirty(room_id, room)
-        return WireEvent(type="TOKEN_CREATE", payload=token.model_dump())
+        return model_event("TOKEN_CREATE", token)
 
     if event_type == "TOKEN_MOVE":
         token_id = payload.get("id")
@@ -80,10 +82,11 @@ def apply_token_event(
             return WireEvent(type="TOKEN_MOVE", payload=response)
 
         if bool(payload.get("commit", False)):
-            manager._push_history(room)
+            manager._push_history(room, tokens=[token_id])
         token.x = float(payload.get("x", token.x))
         token.y = float(payload.get("y", token.y))
         room.state.tokens[token.id] = token
+        manager._sync_spatial(room, "tokens", [token.id])
         manager._mark_dirty(room_id, room)
         return WireEvent(type=event_type, payload=payload)
 
@@ -117,7 +120,7 @@ def apply_token_event(
                 rejected_ids.append(token_id)
 
         if bool(payload.get("commit", False)) and allowed_ids:
-            manager._push_history(room)
+            manager._push_history(room, tokens=allowed_ids)
 
         moved_any = False
         for token_id in allowed_ids:
@@ -132,6 +135,7 @@ def apply_token_event(
                 moved_any = True
 
         if moved_any:
+            manager._sync_spatial(room, "tokens", allowed_ids)
             manager._mark_dirty(room_id, room)
 
         applied: List[Dict[str, float | str]] = []
@@ -167,8 +171,9 @@ def apply_token_event(
         if not manager.can_delete_token(room, user_id, client_id, token):
             return WireEvent(type="ERROR", payload={"message": "Not allowed to delete token", "id": token_id})
 
-        manager._push_history(room)
+        manager._push_history(room, tokens=[token_id])
         room.state.tokens.pop(token_id, None)
+        manager._sync_spatial(room, "tokens", [token_id])
         manager._mark_dirty(room_id, room)
         return WireEvent(type=event_type, payload=payload)
 
@@ -181,7 +186,7 @@ def apply_token_event(
         if not manager._is_gm(room, user_id, client_id):
             return WireEvent(type="ERROR", payload={"message": "Only GM can assign tokens", "id": token_id})
 
-        manager._push_history(room)
+        manager._push_history(room, tokens=[token_id])
         token.owner_id = owner_id
         room.state.tokens[token.id] = token
         manager._mark_dirty(room_id, room)
@@ -195,7 +200,7 @@ def apply_token_event(
         if not manager.can_edit_token(room, user_id, client_id, token):
             return WireEvent(type="ERROR", payload={"message": "Not allowed to rename token", "id": token_id})
         name = str(payload.get("name", "")).strip() or "Token"
-        manager._push_history(room)
+        manager._push_history(room, tokens=[token_id])
         token.name = name
         room.state.tokens[token_id] = token
         manager._mark_dirty(room_id, room)
@@ -213,9 +218,10 @@ def apply_token_event(
         except (TypeError, ValueError):
             return WireEvent(type="ERROR", payload={"message": "Invalid token size", "id": token_id})
         size_scale = max(0.25, min(4.0, size_scale))
-        manager._push_history(room)
+        manager._push_history(room, tokens=[token_id])
         token.size_scale = size_scale
         room.state.tokens[token_id] = token
+        manager._sync_spatial(room, "tokens", [token_id])
         manager._mark_dirty(room_id, room)
         return WireEvent(type="TOKEN_SET_SIZE", payload={"id": token_id, "size_scale": size_scale})
 
@@ -226,7 +232,7 @@ def apply_token_event(
         token = room.state.tokens.get(token_id)
         if not token:
             return WireEvent(type="ERROR", payload={"message": "Unknown token", "id": token_id})
-        manager._push_history(room)
+        manager._push_history(room, tokens=[token_id])
         token.locked = bool(payload.get("locked", False))
         room.state.tokens[token_id] = token
         manager._mark_dirty(room_id, room)
@@ -245,7 +251,7 @@ def apply_token_event(
         existing = [token_id for token_id in ids if token_id in room.state.tokens]
         if not existing:
             return WireEvent(type="TOKEN_SET_GROUP", payload={"ids": [], "group_id": group_id})
-        manager._push_history(room)
+        manager._push_history(room, tokens=existing)
         for token_id in existing:
             token = room.state.tokens[token_id]
             token.group_id = group_id
@@ -276,7 +282,7 @@ def apply_token_event(
         else:
             badge_set.add(badge)
 
-        manager._push_history(room)
+        manager._push_history(room, tokens=[token_id])
         token.badges = sorted(badge_set)
         room.state.tokens[token_id] = token
         manager._mark_dirty(room_id, room)
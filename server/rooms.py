@@ -6,13 +6,16 @@ import logging
 import math
 import random
 import re
+import secrets
 import time
+from collections import deque
+from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Set
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from fastapi import WebSocket
 
-from .models import AssetInstance, FogPaintState, FogStroke, InteriorEdgeOverride, InteriorRoom, InteriorWallCut, Point, RoomState, Shape, Stroke, TerrainPaintState, TerrainStroke, Token, WireEvent
+from .models import AssetInstance, DrawOrder, FogPaintState, FogStroke, InteriorEdgeOverride, InteriorRoom, InteriorWallCut, Point, RoomState, Shape, Stroke, TerrainPaintState, TerrainStroke, Token, WireEvent, dump_json
 from .room_events import (
     apply_asset_event,
     apply_geometry_event,
@@ -26,14 +29,23 @@ from .room_events import (
     apply_terrain_event,
     apply_token_event,
 )
-from .storage import load_room_state_json, save_room_state_json
+from .autosave import AutosaveStats
+from .coalesce import ROOM_BROADCAST_TICK_HZ, DragCoalescer, batch_json, coalesce_key
+from .room_events.history import HISTORY_LIMIT, HistoryEntry, capture_history_entry
+from .journal import RoomJournal
+from .send_queue import SOCKET_SEND_TIMEOUT_SECONDS, EncodedFrame, SendQueueStats, SocketSender, encode_frame
+from .persistence import StateWriter, snapshot_room_state
+from .spatial_index import RoomSpatialIndex
+from .warm_rooms import WarmRoomCache
+from .wire import pack_model
+from .storage import load_room_state_json
 
 
-AUTOSAVE_DEBOUNCE_SECONDS = 2.0
 ERASER_HIT_RADIUS_DEFAULT = 18.0
 TOKEN_HIT_BASE_RADIUS = 25.0
 VALID_TOKEN_BADGES = {"downed", "poisoned", "stunned", "burning", "bleeding", "prone"}
-BROADCAST_SEND_TIMEOUT_SECONDS = 5.0
+# Recent board mutations kept per room so a reconnecting client can catch up without a full STATE_SYNC.
+RESYNC_BUFFER_EVENTS = 512
 MAX_STROKE_POINTS = 25_000
 MAX_CANVAS_COORD = 1_000_000.0
 MAX_STROKE_WIDTH = 100.0
@@ -45,6 +57,10 @@ logger = logging.getLogger("warhamster.ws")
 _LEGACY_PRIVATE_PACK_RE = re.compile(r"^/private-packs/[^/]+/originals/([A-Za-z0-9_-]+)\.[A-Za-z0-9]+$")
 
 
+def _state_sync_envelope(payload: str) -> str:
+    return f'{{"type":"STATE_SYNC","payload":{payload},"client_id":null,"ts":null,"version":null}}'
+
+
 @dataclass
 class Room:
     state: RoomState
@@ -57,38 +73,122 @@ class Room:
     dirty: bool = False
     last_change_ts: float = 0.0
     autosave_task: Optional[asyncio.Task] = None
-    history: List[str] = field(default_factory=list)
-    future: List[str] = field(default_factory=list)
+    autosave: AutosaveStats = field(default_factory=AutosaveStats)
+    # What the last checkpoint plus journal entries hold; None forces the next flush to checkpoint.
+    journal: Optional[RoomJournal] = None
+    # (state version, encoded STATE_SYNC message); cleared by _mark_dirty.
+    sync_cache: Optional[Tuple[int, EncodedFrame]] = None
+    sync_cache_hits: int = 0
+    sync_cache_misses: int = 0
+    # (version before, event) for recent mutations, contiguous in version.
+    recent: Deque[Tuple[int, WireEvent]] = field(default_factory=lambda: deque(maxlen=RESYNC_BUFFER_EVENTS))
+    # New for every load: versions are only comparable within one epoch, since a
+    # restart can lose unsaved versions and a recreated room starts over.
+    epoch: str = field(default_factory=lambda: secrets.token_hex(8))
+    history: List[HistoryEntry] = field(default_factory=list)
+    future: List[HistoryEntry] = field(default_factory=list)
+    spatial: RoomSpatialIndex = field(default_factory=RoomSpatialIndex)
+    # Serializes connect/disconnect/drop for this room only.
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Serializes flushes, so each one starts from the journal the previous one left.
+    save_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # In-progress drag results waiting for the next broadcast tick.
+    drags: DragCoalescer = field(default_factory=DragCoalescer)
+    # Outbound queue and writer task per socket.
+    senders: Dict[WebSocket, SocketSender] = field(default_factory=dict)
+    send_stats: SendQueueStats = field(default_factory=SendQueueStats)
+
+
+# RoomManager handler for each event family; _dispatch_event looks handlers up by event type.
+EVENT_HANDLERS: Dict[str, Tuple[str, ...]] = {
+    "_apply_sync_event": ("REQ_STATE_SYNC",),
+    "_apply_history_event": ("UNDO", "REDO"),
+    "_apply_token_event": (
+        "TOKEN_CREATE", "TOKEN_MOVE", "TOKENS_MOVE", "TOKEN_DELETE",
+        "TOKEN_ASSIGN", "TOKEN_RENAME", "TOKEN_SET_SIZE", "TOKEN_SET_LOCK",
+        "TOKEN_SET_GROUP", "TOKEN_BADGE_TOGGLE",
+    ),
+    "_apply_settings_event": ("ROOM_SETTINGS",),
+    "_apply_stroke_event": ("STROKE_ADD", "STROKE_DELETE", "STROKE_SET_LOCK", "ERASE_AT"),
+    "_apply_shape_event": ("SHAPE_ADD", "SHAPE_UPDATE", "SHAPE_SET_LOCK", "SHAPE_DELETE"),
+    "_apply_asset_event": ("ASSET_INSTANCE_CREATE", "ASSET_INSTANCE_UPDATE", "ASSET_INSTANCE_DELETE"),
+    "_apply_interior_event": (
+        "INTERIOR_ADD", "INTERIOR_UPDATE", "INTERIOR_DELETE", "INTERIOR_SET_LOCK",
+        "INTERIOR_EDGE_SET", "INTERIOR_WALL_CUT_ADD", "INTERIOR_WALL_CUT_REMOVE",
+    ),
+    "_apply_geometry_event": ("GEOMETRY_ADD", "GEOMETRY_UPDATE", "GEOMETRY_DELETE", "GEOMETRY_SEAM_SET"),
+    "_apply_terrain_event": ("TERRAIN_STROKE_ADD", "TERRAIN_STROKE_UNDO"),
+    "_apply_fog_event": ("FOG_STROKE_ADD", "FOG_RESET", "FOG_SET_ENABLED"),
+    "_apply_cogm_event": ("COGM_ADD", "COGM_REMOVE"),
+}
 
 
 class RoomManager:
     def __init__(self) -> None:
+        self._handlers = {t: getattr(self, name) for name, types in EVENT_HANDLERS.items() for t in types}
         self._rooms: Dict[str, Room] = {}
-        self._lock = asyncio.Lock()
+        # In-progress loads, so concurrent connects to a cold room share one DB read.
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._writer = StateWriter()
+        # Recently emptied rooms, reused on reconnect instead of reloading from the DB.
+        self._warm = WarmRoomCache()
+        self.drag_tick_hz = ROOM_BROADCAST_TICK_HZ
 
     async def get_or_create_room(self, room_id: str) -> Room:
-        async with self._lock:
-            if room_id in self._rooms:
-                return self._rooms[room_id]
-
-            # Try load from DB
-            raw = load_room_state_json(room_id)
-            if raw:
-                try:
-                    state = RoomState.model_validate_json(self._migrate_legacy_asset_refs(raw))
-                except (ValueError, TypeError):
-                    # fallback if json is corrupted or schema has drifted
-                    state = RoomState(room_id=room_id)
-            else:
-                state = RoomState(room_id=room_id)
-            # Migration compatibility: pre-mode rooms that have a URL should stay URL-backed.
-            if state.background_url and state.background_mode == "solid":
-                state.background_mode = "url"
-            self._normalize_order(state)
-
-            room = Room(state=state)
+        room = self._rooms.get(room_id)
+        if room is not None:
+            return room
+        room = self._warm.take(room_id)
+        if room is not None:
             self._rooms[room_id] = room
             return room
+        pending = self._loading.get(room_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = self._loading[room_id] = asyncio.get_running_loop().create_future()
+        try:
+            # A write from the room's previous load may still be queued; reading
+            # before it commits would bring back an older state.
+            await self._writer.drain(room_id)
+            # DB read, legacy migration and validation run off the event loop.
+            state, nbytes = await asyncio.to_thread(self._load_state, room_id)
+        except BaseException as exc:
+            if self._loading.get(room_id) is pending:
+                self._loading.pop(room_id)
+            pending.set_exception(exc)
+            # Waiters get the error; don't also warn that nobody retrieved it.
+            pending.exception()
+            raise
+        if self._loading.get(room_id) is pending:
+            self._loading.pop(room_id)
+            room = self._rooms.get(room_id)
+            if room is None:
+                room = self._rooms[room_id] = Room(state=state)
+                room.autosave.state_bytes = nbytes
+        else:
+            # drop_room ran while this was loading (e.g. the room was deleted), so the
+            # result is stale. It is handed back unregistered and connect() reloads.
+            room = Room(state=state)
+        pending.set_result(room)
+        return room
+
+    def _load_state(self, room_id: str) -> Tuple[RoomState, int]:
+        """Load, migrate and validate a room; also returns the stored size in bytes."""
+        raw = load_room_state_json(room_id)
+        if raw:
+            try:
+                state = RoomState.model_validate_json(self._migrate_legacy_asset_refs(raw))
+            except (ValueError, TypeError):
+                # fallback if json is corrupted or schema has drifted
+                state = RoomState(room_id=room_id)
+        else:
+            state = RoomState(room_id=room_id)
+        # Migration compatibility: pre-mode rooms that have a URL should stay URL-backed.
+        if state.background_url and state.background_mode == "solid":
+            state.background_mode = "url"
+        self._normalize_order(state)
+        return state, len(raw or "")
 
     def _migrate_legacy_asset_refs(self, raw: str) -> str:
         try:
@@ -142,29 +242,36 @@ class RoomManager:
             return raw
 
     async def is_room_active(self, room_id: str) -> bool:
-        async with self._lock:
-            room = self._rooms.get(room_id)
-            return bool(room and room.sockets)
+        room = self._rooms.get(room_id)
+        return bool(room and room.sockets)
 
     async def drop_room(self, room_id: str) -> None:
-        async with self._lock:
-            self._rooms.pop(room_id, None)
+        self._warm.discard(room_id)
+        # A load still in flight must not bring the room back once it finishes.
+        self._loading.pop(room_id, None)
+        room = self._rooms.get(room_id)
+        if room is None:
+            return
+        async with room.lock:
+            if self._rooms.get(room_id) is room:
+                self._rooms.pop(room_id, None)
 
     async def kick_all_and_drop(self, room_id: str) -> None:
         """Notify all connected clients the room is being deleted, close their sockets, then drop the room."""
-        async with self._lock:
-            room = self._rooms.get(room_id)
-            sockets = list(room.sockets) if room else []
-        if sockets:
-            msg = WireEvent(
+        room = self._rooms.get(room_id)
+        sockets = list(room.sockets) if room else []
+        if room and sockets:
+            notice = WireEvent(
                 type="SESSION_SYSTEM_NOTICE",
                 payload={"message": "This room has been deleted.", "redirect": "/static/app.html"},
-            ).model_dump_json()
+            )
+            await self.broadcast(room, notice)
             async def _kick(ws: WebSocket) -> None:
-                try:
-                    await ws.send_text(msg)
-                except Exception:
-                    pass
+                sender = room.senders.pop(ws, None)
+                if sender is not None:
+                    # Let the notice (and anything queued before it) go out first.
+                    await sender.flushed(timeout=SOCKET_SEND_TIMEOUT_SECONDS)
+                    sender.close()
                 try:
                     await ws.close(code=1001)
                 except Exception:
@@ -172,42 +279,61 @@ class RoomManager:
             await asyncio.gather(*(_kick(s) for s in sockets), return_exceptions=True)
         await self.drop_room(room_id)
 
+    @asynccontextmanager
+    async def joining(self, room_id: str, ws: WebSocket) -> AsyncIterator[Room]:
+        """Add ``ws`` to the room and hold the room's lock for the body.
+
+        Whatever the caller sends while joining (bootstrap, join broadcasts)
+        is complete before another socket can attach or the room is dropped.
+        """
+        while True:
+            room = await self.get_or_create_room(room_id)
+            async with room.lock:
+                # The room may have emptied and been dropped while we waited for its lock.
+                if self._rooms.get(room_id) is room:
+                    room.sockets.add(ws)
+                    yield room
+                    return
+
     async def connect(self, room_id: str, ws: WebSocket) -> Room:
-        room = await self.get_or_create_room(room_id)
-        room.sockets.add(ws)
-        self._normalize_order(room.state)
-        return room
+        async with self.joining(room_id, ws) as room:
+            return room
 
     async def disconnect(self, room_id: str, ws: WebSocket) -> Optional[Room]:
-        async with self._lock:
-            room = self._rooms.get(room_id)
-            if not room:
-                return None
-            room.sockets.discard(ws)
-            room.socket_to_user_id.pop(ws, None)
-            client_id = room.socket_to_client.pop(ws, None)
-            if client_id:
-                count = room.client_counts.get(client_id, 0) - 1
-                if count <= 0:
-                    room.client_counts.pop(client_id, None)
-                else:
-                    room.client_counts[client_id] = count
+        room = self._rooms.get(room_id)
+        if not room:
+            return None
+        # Only this room's lock is held while saving, so other rooms keep connecting.
+        async with room.lock:
+            self._forget_socket(room, ws)
 
             # If empty, save and optionally drop from memory
             if not room.sockets:
-                if room.autosave_task and not room.autosave_task.done():
-                    room.autosave_task.cancel()
-                    room.autosave_task = None
-                await self._flush_save(room_id, room)
-                # Keep it simple: drop to avoid memory creep
-                self._rooms.pop(room_id, None)
+                autosave, room.autosave_task = room.autosave_task, None
+                if autosave is not None and not autosave.done():
+                    autosave.cancel()
+                    # An interrupted flush leaves the room dirty, so the checkpoint below covers it.
+                    await asyncio.wait([autosave])
+                saved = await self._flush_save(room_id, room, checkpoint=True)
+                # Anything the autosave had queued must commit before a reconnect can reload the room.
+                await self._writer.drain(room_id)
+                if not saved:
+                    # Keep unsaved state in memory and let autosave retry.
+                    room.autosave_task = asyncio.create_task(self._debounced_save(room_id, room))
+                    return None
+                # Park the saved room so a quick reconnect skips the DB load.
+                if self._rooms.get(room_id) is room:
+                    self._rooms.pop(room_id, None)
+                    if self._warm.park(room_id, room, room.autosave.state_bytes):
+                        asyncio.get_running_loop().call_later(self._warm.idle_seconds, self._warm.trim)
                 return None
             return room
 
-    def attach_client(self, room: Room, ws: WebSocket, client_id: str, user_id: int) -> None:
+    def attach_client(self, room: Room, ws: WebSocket, client_id: str, user_id: int, binary: bool = False) -> None:
         room.socket_to_client[ws] = client_id
         room.socket_to_user_id[ws] = user_id
         room.client_counts[client_id] = room.client_counts.get(client_id, 0) + 1
+        self._sender(room, ws).binary = binary
 
     def presence_event(self, room: Room) -> WireEvent:
         clients = sorted(room.client_counts.keys())
@@ -216,68 +342,151 @@ class RoomManager:
             payload={"clients": clients, "gm_id": room.state.gm_id, "co_gm_ids": room.state.co_gm_ids, "room_id": room.state.room_id},
         )
 
-    async def broadcast(self, room: Room, event: WireEvent) -> None:
-        msg = event.model_dump_json()
-        sockets = list(room.sockets)
-        if not sockets:
-            return
-        results = await asyncio.gather(
-            *(asyncio.wait_for(s.send_text(msg), timeout=BROADCAST_SEND_TIMEOUT_SECONDS) for s in sockets),
-            return_exceptions=True,
-        )
-        dead = [s for s, result in zip(sockets, results) if isinstance(result, Exception)]
-        if dead:
-            timeout_count = 0
-            error_count = 0
-            error_types: Dict[str, int] = {}
-            for result in results:
-                if isinstance(result, Exception):
-                    if isinstance(result, TimeoutError):
-                        timeout_count += 1
-                    else:
-                        error_count += 1
-                        name = result.__class__.__name__
-                        error_types[name] = error_types.get(name, 0) + 1
-            logger.warning(
-                "WS BROADCAST DROP room=%s dropped=%s timeout=%s send_error=%s error_types=%s",
-                room.state.room_id,
-                len(dead),
-                timeout_count,
-                error_count,
-                error_types,
+    def _forget_socket(self, room: Room, ws: WebSocket) -> None:
+        room.sockets.discard(ws)
+        room.socket_to_user_id.pop(ws, None)
+        sender = room.senders.pop(ws, None)
+        if sender is not None:
+            sender.close()
+        client_id = room.socket_to_client.pop(ws, None)
+        if client_id:
+            count = room.client_counts.get(client_id, 0) - 1
+            if count <= 0:
+                room.client_counts.pop(client_id, None)
+            else:
+                room.client_counts[client_id] = count
+
+    def _sender(self, room: Room, ws: WebSocket) -> SocketSender:
+        sender = room.senders.get(ws)
+        if sender is None:
+            sender = room.senders[ws] = SocketSender(
+                ws,
+                resync=lambda: self.state_sync_frame(room),
+                on_dead=lambda exc: self._drop_dead_socket(room, ws, exc),
+                stats=room.send_stats,
             )
-        for s in dead:
-            room.sockets.discard(s)
-            room.socket_to_user_id.pop(s, None)
-            client_id = room.socket_to_client.pop(s, None)
-            if client_id:
-                count = room.client_counts.get(client_id, 0) - 1
-                if count <= 0:
-                    room.client_counts.pop(client_id, None)
-                else:
-                    room.client_counts[client_id] = count
+        return sender
+
+    def _drop_dead_socket(self, room: Room, ws: WebSocket, exc: BaseException) -> None:
+        logger.warning(
+            "WS SEND DROP room=%s client=%s error_type=%s",
+            room.state.room_id,
+            room.socket_to_client.get(ws),
+            exc.__class__.__name__,
+        )
+        self._forget_socket(room, ws)
 
-    async def broadcast_others(self, room: Room, exclude: WebSocket, event: WireEvent) -> None:
+    async def send(self, room: Room, ws: WebSocket, event: Union[WireEvent, EncodedFrame, str]) -> None:
+        """Queue ``event`` for one socket, in order with its broadcasts; a str is sent as already-encoded JSON."""
+        if ws not in room.sockets:
+            return
+        self._sender(room, ws).push(encode_frame(event))
+
+    async def broadcast(self, room: Room, event: Union[WireEvent, EncodedFrame, str]) -> None:
+        """Queue ``event`` for every socket in the room; a str is sent as already-encoded JSON.
+
+        The event is encoded once (and reused if it was already sent elsewhere);
+        each socket's writer sends at its own pace, so a slow client never
+        holds up the others.
+        """
+        if not room.sockets:
+            return
+        frame = encode_frame(event)
+        for s in list(room.sockets):
+            self._sender(room, s).push(frame)
+
+    async def broadcast_others(self, room: Room, exclude: WebSocket, event: Union[WireEvent, EncodedFrame, str]) -> None:
         """Broadcast to all sockets in room except the one being excluded (e.g. the sender)."""
         others = [s for s in room.sockets if s is not exclude]
         if not others:
             return
-        msg = event.model_dump_json()
-        results = await asyncio.gather(
-            *(asyncio.wait_for(s.send_text(msg), timeout=BROADCAST_SEND_TIMEOUT_SECONDS) for s in others),
-            return_exceptions=True,
-        )
-        dead = [s for s, r in zip(others, results) if isinstance(r, Exception)]
-        for s in dead:
-            room.sockets.discard(s)
-            room.socket_to_user_id.pop(s, None)
-            client_id = room.socket_to_client.pop(s, None)
-            if client_id:
-                count = room.client_counts.get(client_id, 0) - 1
-                if count <= 0:
-                    room.client_counts.pop(client_id, None)
-                else:
-                    room.client_counts[client_id] = count
+        frame = encode_frame(event)
+        for s in others:
+            self._sender(room, s).push(frame)
+
+    async def publish(self, room: Room, event: WireEvent) -> None:
+        """Broadcast the result of an applied event.
+
+        Transient drag results are coalesced per entity: the first one after a
+        quiet tick goes out at once, later ones wait for the room's next tick
+        and only the newest per entity is sent.  Anything else first flushes
+        the pending drags so clients still see events in version order.
+        """
+        key = coalesce_key(event) if self.drag_tick_hz > 0 else None
+        if key is None:
+            await self.flush_drags(room)
+            await self.broadcast(room, event)
+            return
+        room.drags.add(key, event)
+        if not room.drags.ticking():
+            room.drags.task = asyncio.create_task(self._drag_tick(room))
+            await self.flush_drags(room)
+
+    async def flush_drags(self, room: Room) -> None:
+        """Send pending drag results now, as one frame."""
+        events = room.drags.drain()
+        if not events:
+            return
+        await self.broadcast(room, events[0] if len(events) == 1 else batch_json(events))
+
+    async def _drag_tick(self, room: Room) -> None:
+        # Runs while drags keep arriving; one idle tick ends it.
+        interval = 1.0 / self.drag_tick_hz
+        while True:
+            await asyncio.sleep(interval)
+            if not room.drags.pending:
+                return
+            await self.flush_drags(room)
+
+    def state_sync_frame(self, room: Room) -> EncodedFrame:
+        """Encoded STATE_SYNC for the room's current version.
+
+        Encoding runs synchronously on the loop, so every requester between two
+        changes (reconnect bursts, GM claims, REQ_STATE_SYNC) shares a single
+        serialization, and no later broadcast can overtake the sync it follows.
+        While binary sockets are attached the frame also gets its packed form,
+        copied from the point buffers of the same state.
+        """
+        version = room.state.version
+        cached = room.sync_cache
+        if cached is not None and cached[0] == version:
+            room.sync_cache_hits += 1
+            frame = cached[1]
+        else:
+            room.sync_cache_misses += 1
+            payload = dump_json(room.state, exclude={"gm_key_hash"})
+            frame = encode_frame(_state_sync_envelope(payload))
+            room.sync_cache = (version, frame)
+        if any(sender.binary for sender in room.senders.values()):
+            frame.ensure_packed(lambda: pack_model(room.state, _state_sync_envelope, exclude={"gm_key_hash"}))
+        return frame
+
+    def state_sync_json(self, room: Room) -> str:
+        return self.state_sync_frame(room).text
+
+    def _record_recent(self, room: Room, before: int, event: WireEvent) -> None:
+        # A version change that did not come through apply_event (e.g. a GM claim)
+        # breaks the chain; older entries can no longer bring a client up to date.
+        if room.recent and room.recent[-1][1].version != before:
+            room.recent.clear()
+        room.recent.append((before, event))
+
+    def resync_events(self, room: Room, since: int, epoch: Optional[str]) -> Optional[List[WireEvent]]:
+        """Mutations a client at version ``since`` of ``epoch`` missed, or None if it needs a full STATE_SYNC."""
+        if epoch != room.epoch:
+            return None
+        current = room.state.version
+        if since == current:
+            return []
+        if since > current:
+            return None
+        missed: List[WireEvent] = []
+        for before, event in room.recent:
+            if missed or before == since:
+                missed.append(event)
+        if not missed or missed[-1].version != current:
+            return None
+        return missed
 
     def live_rooms(self):
         """Iterate over (room_id, live_room) pairs for all currently active rooms."""
@@ -287,80 +496,146 @@ class RoomManager:
         room.dirty = True
         room.last_change_ts = time.time()
         room.state.version += 1
+        room.sync_cache = None
+        room.autosave.note_change(room.last_change_ts)
 
         if room.autosave_task is None or room.autosave_task.done():
             room.autosave_task = asyncio.create_task(self._debounced_save(room_id, room))
 
     async def _debounced_save(self, room_id: str, room: Room) -> None:
-        # Wait until changes stop for debounce window
-        while True:
-            last = room.last_change_ts
-            await asyncio.sleep(AUTOSAVE_DEBOUNCE_SECONDS)
-            if room.last_change_ts == last:
-                break
-        await self._flush_save(room_id, room)
-
-    async def _flush_save(self, room_id: str, room: Room) -> None:
-        if not room.dirty:
-            return
-        room.dirty = False
-        save_room_state_json(room_id, room.state.model_dump_json())
-
-    def _snapshot_json(self, room: Room) -> str:
-        return room.state.model_dump_json()
+        # Wait for a quiet debounce window, but never longer than the max interval
+        # since the first unsaved change, so continuous edits still get persisted.
+        # Edits that land while a write is in flight are picked up by the next pass.
+        while room.dirty:
+            while True:
+                now = time.time()
+                remaining = room.autosave.next_flush_at(room.last_change_ts, now) - now
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(remaining)
+            now = time.time()
+            forced = now < room.last_change_ts + room.autosave.debounce_seconds(now)
+            if not await self._flush_save(room_id, room, forced=forced):
+                await asyncio.sleep(room.autosave.debounce_seconds(time.time()))
+
+    async def _flush_save(self, room_id: str, room: Room, forced: bool = False, checkpoint: bool = False) -> bool:
+        """Write the room if dirty. Returns False if the write failed and the room is still dirty.
+
+        Normally only a journal patch of what changed since the last write is
+        stored; a full checkpoint is written when asked for, when there is no
+        journal yet, or when the journal has grown enough to compact.  The room
+        stays dirty until the write has committed.
+        """
+        async with room.save_lock:
+            if not room.dirty:
+                return True
+            version = room.state.version
+            dirty_since = room.autosave.begin_flush()
+            started = time.perf_counter()
+            journal = room.journal
+            checkpoint = checkpoint or journal is None or journal.needs_compaction()
+            try:
+                if checkpoint:
+                    captured = RoomJournal.capture(room.state)
+                    nbytes, _ = await self._writer.write(room_id, snapshot_room_state(room.state))
+                    captured.checkpoint_bytes = nbytes
+                    room.journal = captured
+                else:
+                    patch = journal.diff(room.state)
+                    nbytes, _ = await self._writer.append(room_id, room.state.version, patch)
+                    journal.entries += 1
+                    journal.journal_bytes += nbytes
+            except asyncio.CancelledError:
+                # The write may still land, or fail, without us; checkpoint next time.
+                self._abort_flush(room, dirty_since)
+                raise
+            except Exception:
+                self._abort_flush(room, dirty_since)
+                logger.exception("Autosave failed room=%s", room_id)
+                return False
+            room.dirty = room.state.version != version
+            room.autosave.record_flush(time.time(), nbytes, time.perf_counter() - started, forced, checkpoint)
+            return True
 
-    def _push_history(self, room: Room, clear_future: bool = True) -> None:
-        room.history.append(self._snapshot_json(room))
-        if len(room.history) > 50:
-            room.history = room.history[-50:]
+    def _abort_flush(self, room: Room, dirty_since: Optional[float]) -> None:
+        # The journal may already hold the unsaved state, so the next flush must checkpoint.
+        room.journal = None
+        room.autosave.abort_flush(dirty_since)
+
+    def autosave_stats(self) -> Dict[str, dict]:
+        """Per-room autosave counters for monitoring, keyed by room id."""
+        return {
+            room_id: {
+                **room.autosave.snapshot(),
+                "dirty": room.dirty,
+                "clients": len(room.sockets),
+                "write_in_flight": self._writer.in_flight(room_id),
+                "sync_cache_hits": room.sync_cache_hits,
+                "sync_cache_misses": room.sync_cache_misses,
+                "drags": room.drags.stats.snapshot(),
+                "send": {
+                    **room.send_stats.snapshot(),
+                    "queue_depth": sum(sender.depth() for sender in room.senders.values()),
+                },
+            }
+            for room_id, room in self._rooms.items()
+        }
+
+    def warm_stats(self) -> dict:
+        """Warm room cache size, hit rate and eviction counters."""
+        return self._warm.snapshot()
+
+    def writer_stats(self) -> dict:
+        """Batch size and commit time counters for the shared room state writer."""
+        return {**self._writer.stats.snapshot(), "tick_seconds": self._writer.tick_seconds}
+
+    def _push_history(self, room: Room, clear_future: bool = True, *, settings: bool = False, **targets: Iterable[str]) -> None:
+        """Record the pre-mutation value of the entities an event is about to touch.
+
+        ``targets`` maps a RoomState collection name to the ids involved, e.g.
+        ``_push_history(room, strokes=[sid])``.
+        """
+        room.history.append(capture_history_entry(room.state, settings=settings, **targets))
+        if len(room.history) > HISTORY_LIMIT:
+            del room.history[:-HISTORY_LIMIT]
         if clear_future:
             room.future.clear()
 
     def _normalize_order(self, state: RoomState) -> None:
+        """Full draw_order repair: drop dangling ids and append missing ones. Run once at room load."""
         if "assets" not in state.layer_visibility:
             state.layer_visibility["assets"] = True
         if "interiors" not in state.layer_visibility:
             state.layer_visibility["interiors"] = True
-        strokes = state.draw_order.get("strokes", [])
-        shapes = state.draw_order.get("shapes", [])
-        assets = state.draw_order.get("assets", [])
-        interiors = state.draw_order.get("interiors", [])
-        strokes = [sid for sid in strokes if sid in state.strokes]
-        shapes = [sid for sid in shapes if sid in state.shapes]
-        assets = [sid for sid in assets if sid in state.assets]
-        interiors = [sid for sid in interiors if sid in state.interiors]
-        for sid in state.strokes.keys():
-            if sid not in strokes:
-                strokes.append(sid)
-        for sid in state.shapes.keys():
-            if sid not in shapes:
-                shapes.append(sid)
-        for sid in state.assets.keys():
-            if sid not in assets:
-                assets.append(sid)
-        for sid in state.interiors.keys():
-            if sid not in interiors:
-                interiors.append(sid)
-        state.draw_order["strokes"] = strokes
-        state.draw_order["shapes"] = shapes
-        state.draw_order["assets"] = assets
-        state.draw_order["interiors"] = interiors
+        for kind in ("strokes", "shapes", "assets", "interiors"):
+            items = getattr(state, kind)
+            order = self._order(state, kind)
+            order.retain(items)
+            for item_id in items.keys():
+                order.append(item_id)
+
+    def _order(self, state: RoomState, kind: str) -> DrawOrder:
+        order = state.draw_order.get(kind)
+        if order is None:
+            order = state.draw_order[kind] = DrawOrder()
+        return order
 
     def _append_order(self, state: RoomState, kind: str, item_id: str) -> None:
-        self._normalize_order(state)
-        state.draw_order[kind] = [x for x in state.draw_order[kind] if x != item_id]
-        state.draw_order[kind].append(item_id)
+        self._order(state, kind).move_to_end(item_id)
 
     def _remove_order(self, state: RoomState, kind: str, item_id: str) -> None:
-        state.draw_order[kind] = [x for x in state.draw_order.get(kind, []) if x != item_id]
+        self._order(state, kind).discard(item_id)
+
+    def _restore_order(self, state: RoomState, kind: str, placements: Iterable[Tuple[Optional[int], str]]) -> None:
+        self._order(state, kind).insert_many(placements)
 
     # --------- Event application & permissions ---------
 
     def _stroke_hits_circle(self, stroke: Stroke, cx: float, cy: float, r: float) -> bool:
         rr = r * r
-        for pt in stroke.points:
-            dx = pt.x - cx
-            dy = pt.y - cy
+        for x, y in stroke.points.pairs():
+            dx = x - cx
+            dy = y - cy
             if dx * dx + dy * dy <= rr:
                 return True
         return False
@@ -404,10 +679,56 @@ class RoomManager:
 
         return False
 
+    def _token_hit_radius(self, token: Token) -> float:
+        return TOKEN_HIT_BASE_RADIUS * max(0.25, min(4.0, float(token.size_scale or 1.0)))
+
     def _token_hits_circle(self, token: Token, cx: float, cy: float, r: float) -> bool:
-        token_r = TOKEN_HIT_BASE_RADIUS * max(0.25, min(4.0, float(token.size_scale or 1.0)))
         dist = math.hypot(cx - float(token.x), cy - float(token.y))
-        return dist <= token_r + r
+        return dist <= self._token_hit_radius(token) + r
+
+    def _shape_bounds(self, shape: Shape) -> Tuple[float, float, float, float]:
+        """Bounding box covering everything _shape_hits_circle can hit (before adding the eraser radius)."""
+        if shape.type == "circle":
+            radius = math.hypot(shape.x2 - shape.x1, shape.y2 - shape.y1)
+            return (shape.x1 - radius, shape.y1 - radius, shape.x1 + radius, shape.y1 + radius)
+        if shape.type == "text":
+            pad = max(8.0, float(shape.font_size) * 0.6)
+            return (shape.x1 - pad, shape.y1 - pad, shape.x1 + pad, shape.y1 + pad)
+        return (min(shape.x1, shape.x2), min(shape.y1, shape.y2), max(shape.x1, shape.x2), max(shape.y1, shape.y2))
+
+    # --------- Eraser spatial index ---------
+
+    def _sync_spatial(self, room: Room, kind: str, ids: Iterable[str]) -> None:
+        """Re-index (or drop) the given strokes/shapes/tokens after they changed."""
+        grid = getattr(room.spatial, kind)
+        collection = getattr(room.state, kind)
+        for item_id in ids:
+            item = collection.get(item_id)
+            if item is None:
+                grid.remove(item_id)
+            elif kind == "strokes":
+                grid.set_points(item_id, item.points.pairs())
+            elif kind == "shapes":
+                grid.set_box(item_id, *self._shape_bounds(item))
+            else:
+                token_r = self._token_hit_radius(item)
+                grid.set_box(item_id, item.x - token_r, item.y - token_r, item.x + token_r, item.y + token_r)
+
+    def _spatial_candidates(self, room: Room, kind: str, cx: float, cy: float, r: float) -> List[str]:
+        """Ids of strokes/shapes/tokens that may be within ``r`` of (cx, cy)."""
+        grid = getattr(room.spatial, kind)
+        collection = getattr(room.state, kind)
+        if len(grid) != len(collection):
+            # First query for this room, or entities changed outside the handlers.
+            grid.clear()
+            self._sync_spatial(room, kind, list(collection.keys()))
+        found = grid.query(cx, cy, r)
+        if found is None:
+            return list(collection.keys())
+        if len(found) <= 1:
+            return [item_id for item_id in found if item_id in collection]
+        # Keep the collection's own order, which is the order erased ids are reported in.
+        return [item_id for item_id in collection if item_id in found]
 
     def _is_primary_gm(self, room: Room, user_id: Optional[int], client_id: str) -> bool:
         if room.state.gm_user_id is not None and user_id is not None:
@@ -520,52 +841,30 @@ class RoomManager:
         return self._is_gm(room, user_id, client_id)
 
     async def apply_event(self, room_id: str, room: Room, event: WireEvent, client_id: str, user_id: Optional[int] = None) -> WireEvent:
-        t = event.type
-        p = event.payload
-
-        if t == "REQ_STATE_SYNC":
-            return WireEvent(type="STATE_SYNC", payload=room.state.model_dump(exclude={"gm_key_hash"}))
-
-        if t in ("UNDO", "REDO"):
-            return self._apply_history_event(room_id, room, t, client_id, user_id)
-
-        if t in {"TOKEN_CREATE", "TOKEN_MOVE", "TOKENS_MOVE", "TOKEN_DELETE",
-                 "TOKEN_ASSIGN", "TOKEN_RENAME", "TOKEN_SET_SIZE", "TOKEN_SET_LOCK",
-                 "TOKEN_SET_GROUP", "TOKEN_BADGE_TOGGLE"}:
-            return self._apply_token_event(room_id, room, t, p, client_id, user_id)
-
-        if t == "ROOM_SETTINGS":
-            return self._apply_settings_event(room_id, room, p, client_id, user_id)
-
-        if t in {"STROKE_ADD", "STROKE_DELETE", "STROKE_SET_LOCK", "ERASE_AT"}:
-            return self._apply_stroke_event(room_id, room, t, p, client_id, user_id)
-
-        if t in {"SHAPE_ADD", "SHAPE_UPDATE", "SHAPE_SET_LOCK", "SHAPE_DELETE"}:
-            return self._apply_shape_event(room_id, room, t, p, client_id, user_id)
-
-        if t in {"ASSET_INSTANCE_CREATE", "ASSET_INSTANCE_UPDATE", "ASSET_INSTANCE_DELETE"}:
-            return self._apply_asset_event(room_id, room, t, p, client_id, user_id)
-
-        if t in {"INTERIOR_ADD", "INTERIOR_UPDATE", "INTERIOR_DELETE", "INTERIOR_SET_LOCK", "INTERIOR_EDGE_SET", "INTERIOR_WALL_CUT_ADD", "INTERIOR_WALL_CUT_REMOVE"}:
-            return self._apply_interior_event(room_id, room, t, p, client_id, user_id)
-
-        if t in {"GEOMETRY_ADD", "GEOMETRY_UPDATE", "GEOMETRY_DELETE", "GEOMETRY_SEAM_SET"}:
-            return self._apply_geometry_event(room_id, room, t, p, client_id, user_id)
-
-        if t in {"TERRAIN_STROKE_ADD", "TERRAIN_STROKE_UNDO"}:
-            return self._apply_terrain_event(room_id, room, t, p, client_id, user_id)
-
-        if t in {"FOG_STROKE_ADD", "FOG_RESET", "FOG_SET_ENABLED"}:
-            return self._apply_fog_event(room_id, room, t, p, client_id, user_id)
-
-        if t in {"COGM_ADD", "COGM_REMOVE"}:
-            return self._apply_cogm_event(room_id, room, t, p, client_id, user_id)
-
-        # Unknown / not implemented
-        return WireEvent(type="ERROR", payload={"message": f"Unhandled event type: {t}"})
+        before = room.state.version
+        out = await self._dispatch_event(room_id, room, event, client_id, user_id)
+        if out.type != "ERROR" and room.state.version != before:
+            out.version = room.state.version
+            self._record_recent(room, before, out)
+        return out
+
+    async def _dispatch_event(self, room_id: str, room: Room, event: WireEvent, client_id: str, user_id: Optional[int]) -> WireEvent:
+        handler = self._handlers.get(event.type)
+        if handler is None:
+            # Unknown / not implemented
+            return WireEvent(type="ERROR", payload={"message": f"Unhandled event type: {event.type}"})
+        return handler(room_id, room, event.type, event.payload, client_id, user_id)
+
+    # --------------------------------------------------------------------- sync
+    def _apply_sync_event(self, room_id: str, room: Room, t: str, p: dict, client_id: str, user_id: Optional[int]) -> WireEvent:
+        # Built from the versioned frame, so a resend reuses that encoding instead of dumping the state again.
+        text = self.state_sync_json(room)
+        event = WireEvent.model_validate_json(text)
+        event._encoded = text
+        return event
 
     # ------------------------------------------------------------------ history
-    def _apply_history_event(self, room_id: str, room: Room, t: str, client_id: str, user_id: Optional[int]) -> WireEvent:
+    def _apply_history_event(self, room_id: str, room: Room, t: str, p: dict, client_id: str, user_id: Optional[int]) -> WireEvent:
         return apply_history_event(self, room_id, room, t, client_id, user_id)
 
     # ------------------------------------------------------------------ tokens
@@ -573,7 +872,7 @@ class RoomManager:
         return apply_token_event(self, room_id, room, t, p, client_id, user_id)
 
     # ------------------------------------------------------------------ settings
-    def _apply_settings_event(self, room_id: str, room: Room, p: dict, client_id: str, user_id: Optional[int]) -> WireEvent:
+    def _apply_settings_event(self, room_id: str, room: Room, t: str, p: dict, client_id: str, user_id: Optional[int]) -> WireEvent:
         return apply_settings_event(self, room_id, room, p, client_id, user_id)
 
     # ------------------------------------------------------------------ strokes
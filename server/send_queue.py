@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple, Union
+
+from fastapi import WebSocket
+
+from .coalesce import coalesce_key
+from .env import env_int
+from .models import WireEvent
+from .wire import encode_event, pack_event, pack_frame
+
+
+# Messages queued for one socket before it is resynced instead of caught up.
+SOCKET_SEND_QUEUE_MAX = env_int("SOCKET_SEND_QUEUE_MAX", 256)
+# A single send that takes longer than this drops the socket.
+SOCKET_SEND_TIMEOUT_SECONDS = 5.0
+
+# Queue slot standing in for a STATE_SYNC that is encoded when it is sent.
+_RESYNC = object()
+
+
+class EncodedFrame:
+    """One outgoing message, encoded once and queued as is for every socket it goes to.
+
+    ``key`` lets a newer transient drag replace this one in a socket's queue;
+    ``state`` marks board messages that a STATE_SYNC makes redundant.  The
+    packed binary form is built once for all binary sockets: up front from
+    the model's point buffers where the sender has them, otherwise from
+    ``text`` on first use.
+    """
+
+    __slots__ = ("text", "key", "state", "_packed")
+
+    def __init__(
+        self,
+        text: str,
+        key: Optional[Tuple[Hashable, ...]] = None,
+        state: bool = False,
+        packed: Union[bytes, None, bool] = False,
+    ) -> None:
+        self.text = text
+        self.key = key
+        self.state = state
+        self._packed = packed
+
+    def packed(self) -> Optional[bytes]:
+        """Binary frame for the packed subprotocol, or None when plain JSON is as good."""
+        if self._packed is False:
+            self._packed = pack_frame(self.text)
+        return self._packed
+
+    def ensure_packed(self, build: Callable[[], Optional[bytes]]) -> None:
+        """Use ``build`` for the packed form unless it has been built already."""
+        if self._packed is False:
+            self._packed = build()
+
+
+def encode_frame(event: Union[WireEvent, EncodedFrame, str]) -> EncodedFrame:
+    """Frame for ``event``; a str is an already-encoded board frame (STATE_SYNC or EVENT_BATCH)."""
+    if isinstance(event, EncodedFrame):
+        return event
+    if isinstance(event, str):
+        return EncodedFrame(event, state=True)
+    state = event.version is not None or event.type in ("STATE_SYNC", "STATE_RESYNC")
+    return EncodedFrame(encode_event(event), coalesce_key(event), state, pack_event(event))
+
+
+@dataclass
+class SendQueueStats:
+    """Outbound counters shared by the senders of one room."""
+
+    queued: int = 0
+    sent: int = 0
+    superseded: int = 0
+    resyncs: int = 0
+    skipped: int = 0
+    dropped_sockets: int = 0
+    max_depth: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queued,
+            "sent": self.sent,
+            "superseded": self.superseded,
+            "resyncs": self.resyncs,
+            "skipped": self.skipped,
+            "dropped_sockets": self.dropped_sockets,
+            "max_depth": self.max_depth,
+        }
+
+
+class SocketSender:
+    """Ordered outbound queue and writer task for one room socket.
+
+    Board messages (``state=True``) are the ones a STATE_SYNC covers.  A newer
+    transient drag for the same ``key`` replaces the queued one, and a socket
+    that falls ``max_depth`` messages behind has its queued board messages
+    replaced by a single STATE_SYNC, encoded from the live room when it is
+    finally sent.  Other messages (presence, notices, errors) are kept.
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        *,
+        resync: Callable[[], EncodedFrame],
+        on_dead: Callable[[BaseException], None],
+        stats: SendQueueStats,
+        max_depth: int = SOCKET_SEND_QUEUE_MAX,
+        timeout: float = SOCKET_SEND_TIMEOUT_SECONDS,
+        binary: bool = False,
+    ) -> None:
+        self.ws = ws
+        # Negotiated the packed subprotocol: frames with point lists go out as bytes.
+        self.binary = binary
+        self.max_depth = max_depth
+        self.timeout = timeout
+        self.stats = stats
+        self.closed = False
+        self._resync = resync
+        self._on_dead = on_dead
+        # [key, frame, state]; a superseded entry keeps its slot with frame None.
+        self._queue: Deque[List[Any]] = deque()
+        self._keyed: Dict[Hashable, List[Any]] = {}
+        self._depth = 0
+        self._resync_pending = False
+        self._task: Optional[asyncio.Task] = None
+
+    def depth(self) -> int:
+        return self._depth
+
+    def push(self, frame: EncodedFrame) -> None:
+        if self.closed:
+            return
+        key, state = frame.key, frame.state
+        if state and self._resync_pending:
+            # The pending STATE_SYNC is encoded later and will already include this.
+            self.stats.skipped += 1
+            return
+        if key is not None:
+            old = self._keyed.pop(key, None)
+            if old is not None:
+                old[1] = None
+                self._depth -= 1
+                self.stats.superseded += 1
+        if self._depth >= self.max_depth:
+            if self._resync_pending:
+                # Even the non-board backlog is full; the client is not reading.
+                self._die(OverflowError("send queue full"))
+                return
+            self._fall_behind()
+            if state:
+                self.stats.skipped += 1
+                self._start()
+                return
+        entry = [key, frame, state]
+        self._queue.append(entry)
+        if key is not None:
+            self._keyed[key] = entry
+        self._depth += 1
+        self.stats.queued += 1
+        self.stats.max_depth = max(self.stats.max_depth, self._depth)
+        self._start()
+
+    def _fall_behind(self) -> None:
+        kept = [entry for entry in self._queue if entry[1] is not None and not entry[2]]
+        self.stats.skipped += self._depth - len(kept)
+        self._queue = deque([[None, _RESYNC, True], *kept])
+        self._keyed.clear()
+        self._depth = len(self._queue)
+        self._resync_pending = True
+        self.stats.resyncs += 1
+
+    def _start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._queue and not self.closed:
+            key, frame, _ = entry = self._queue.popleft()
+            if frame is None:
+                continue
+            self._depth -= 1
+            if key is not None and self._keyed.get(key) is entry:
+                del self._keyed[key]
+            if frame is _RESYNC:
+                self._resync_pending = False
+                frame = self._resync()
+            data = frame.packed() if self.binary else None
+            try:
+                if data is not None:
+                    await asyncio.wait_for(self.ws.send_bytes(data), timeout=self.timeout)
+                else:
+                    await asyncio.wait_for(self.ws.send_text(frame.text), timeout=self.timeout)
+            except Exception as exc:
+                self._die(exc)
+                return
+            self.stats.sent += 1
+
+    async def flushed(self, timeout: Optional[float] = None) -> None:
+        """Wait until everything queued so far has been sent (or the socket died)."""
+        task = self._task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            await asyncio.wait({task}, timeout=timeout)
+
+    def _die(self, exc: BaseException) -> None:
+        if self.closed:
+            return
+        self.close()
+        self.stats.dropped_sockets += 1
+        self._on_dead(exc)
+
+    def close(self) -> None:
+        """Stop sending; anything still queued is discarded."""
+        self.closed = True
+        self._queue.clear()
+        self._keyed.clear()
+        self._depth = 0
+        task = self._task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
@@ -4,6 +4,7 @@ import asyncio
 import logging
 
 from .models import WireEvent
+from .send_queue import encode_frame
 
 logger = logging.getLogger("warhamster.session")
 
@@ -104,7 +105,6 @@ async def broadcast_session_event(
         if member.get("user_id") is not None
     }
     sockets = []
-    message = event.model_dump_json()
     for room_id, live_room in rm.live_rooms():
         if room_id not in session_rooms:
             continue
@@ -114,7 +114,7 @@ async def broadcast_session_event(
                 continue
             if roles is not None and role not in roles:
                 continue
-            sockets.append(ws)
+            sockets.append((live_room, ws))
     logger.debug(
         "session_event_fanout session=%s type=%s role_filter=%s candidates=%d delivering=%d",
         session_id,
@@ -125,7 +125,8 @@ async def broadcast_session_event(
     )
     if not sockets:
         return
-    await asyncio.gather(*(ws.send_text(message) for ws in sockets), return_exceptions=True)
+    frame = encode_frame(event)
+    await asyncio.gather(*(rm.send(live_room, ws, frame) for live_room, ws in sockets), return_exceptions=True)
 
 
 async def broadcast_session_notice(
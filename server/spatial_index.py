@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+
+GRID_CELL_SIZE = 256.0
+# Items or queries spanning more cells than this skip the grid: oversized items
+# are always returned as candidates and oversized queries fall back to a full scan.
+MAX_GRID_SPAN_CELLS = 4096
+
+Cell = Tuple[int, int]
+
+
+class SpatialGrid:
+    """Uniform grid mapping item ids to the cells their geometry touches.
+
+    The grid only narrows candidates; callers still run the exact hit test.
+    """
+
+    def __init__(self, cell_size: float = GRID_CELL_SIZE) -> None:
+        self.cell_size = float(cell_size)
+        self._cells: Dict[Cell, Set[str]] = {}
+        self._item_cells: Dict[str, Tuple[Cell, ...]] = {}
+        self._oversized: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._item_cells) + len(self._oversized)
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self._item_cells or item_id in self._oversized
+
+    def clear(self) -> None:
+        self._cells.clear()
+        self._item_cells.clear()
+        self._oversized.clear()
+
+    def _cell_of(self, x: float, y: float) -> Cell:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _span(self, minx: float, miny: float, maxx: float, maxy: float) -> Optional[Tuple[int, int, int, int]]:
+        if not all(math.isfinite(v) for v in (minx, miny, maxx, maxy)):
+            return None
+        x0, y0 = self._cell_of(minx, miny)
+        x1, y1 = self._cell_of(maxx, maxy)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_GRID_SPAN_CELLS:
+            return None
+        return x0, y0, x1, y1
+
+    def _store(self, item_id: str, cells: Iterable[Cell]) -> None:
+        stored = tuple(cells)
+        self._item_cells[item_id] = stored
+        for cell in stored:
+            self._cells.setdefault(cell, set()).add(item_id)
+
+    def remove(self, item_id: str) -> None:
+        self._oversized.discard(item_id)
+        for cell in self._item_cells.pop(item_id, ()):
+            bucket = self._cells.get(cell)
+            if bucket is None:
+                continue
+            bucket.discard(item_id)
+            if not bucket:
+                del self._cells[cell]
+
+    def set_box(self, item_id: str, minx: float, miny: float, maxx: float, maxy: float) -> None:
+        self.remove(item_id)
+        span = self._span(minx, miny, maxx, maxy)
+        if span is None:
+            self._oversized.add(item_id)
+            return
+        x0, y0, x1, y1 = span
+        self._store(item_id, ((cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)))
+
+    def set_points(self, item_id: str, points: Iterable[Tuple[float, float]]) -> None:
+        self.remove(item_id)
+        cells: Set[Cell] = set()
+        for x, y in points:
+            if not (math.isfinite(x) and math.isfinite(y)):
+                self._oversized.add(item_id)
+                return
+            cells.add(self._cell_of(x, y))
+        self._store(item_id, cells)
+
+    def query(self, cx: float, cy: float, r: float) -> Optional[Set[str]]:
+        """Ids that may lie within ``r`` of (cx, cy), or None if the caller should scan everything."""
+        span = self._span(cx - r, cy - r, cx + r, cy + r)
+        if span is None:
+            return None
+        x0, y0, x1, y1 = span
+        found: Set[str] = set(self._oversized)
+        for gx in range(x0, x1 + 1):
+            for gy in range(y0, y1 + 1):
+                bucket = self._cells.get((gx, gy))
+                if bucket:
+                    found.update(bucket)
+        return found
+
+
+@dataclass
+class RoomSpatialIndex:
+    """Per-room eraser index over strokes, shapes and tokens."""
+
+    strokes: SpatialGrid = field(default_factory=SpatialGrid)
+    shapes: SpatialGrid = field(default_factory=SpatialGrid)
+    tokens: SpatialGrid = field(default_factory=SpatialGrid)
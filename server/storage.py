@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 from . import storage_admin, storage_assets, storage_audit, storage_auth, storage_db, storage_rooms, storage_sessions
+from .journal import replay_journal
 from .storage_models import (
     AssetRow,
     AuditLogRow,
@@ -24,19 +25,22 @@ db_url = storage_db.db_url
 
 
 engine = storage_db.engine
+# Separate database for room state blobs (ROOM_STATE_DB_PATH); None keeps them in ``engine``.
+state_engine = storage_db.state_engine
 
 
 def init_db() -> None:
     storage_db.engine = engine
+    storage_db.state_engine = state_engine
     storage_db.init_db()
 
 
 def _sync_rooms_engine() -> None:
-    storage_rooms.set_engine(engine)
+    storage_rooms.set_engine(engine, state_engine)
 
 
 def _sync_sessions_engine() -> None:
-    storage_sessions.set_engine(engine)
+    storage_sessions.set_engine(engine, state_engine)
 
 
 def _sync_auth_engine() -> None:
@@ -56,8 +60,9 @@ def _sync_audit_engine() -> None:
 
 
 def load_room_state_json(room_id: str) -> Optional[str]:
+    """Current room state: the last checkpoint with any journal patches replayed on top."""
     _sync_rooms_engine()
-    return storage_rooms.load_room_state_json(room_id)
+    return replay_journal(*storage_rooms.load_room_checkpoint(room_id))
 
 
 def save_room_state_json(room_id: str, state_json: str) -> None:
@@ -65,6 +70,21 @@ def save_room_state_json(room_id: str, state_json: str) -> None:
     storage_rooms.save_room_state_json(room_id, state_json, utc_now_iso())
 
 
+def save_room_states_json(states: Dict[str, str]) -> None:
+    _sync_rooms_engine()
+    storage_rooms.save_room_states_json(states, utc_now_iso())
+
+
+def commit_room_writes(checkpoints: Dict[str, Union[str, bytes]], journal: List[Tuple[str, int, str]]) -> None:
+    _sync_rooms_engine()
+    storage_rooms.commit_room_writes(checkpoints, journal, utc_now_iso())
+
+
+def load_room_journal(room_id: str) -> List[str]:
+    _sync_rooms_engine()
+    return storage_rooms.load_room_journal(room_id)
+
+
 def create_room_record(
     room_id: str,
     name: str,
@@ -11,6 +11,7 @@ from sqlmodel import Session, select
 
 from . import storage_db
 from .storage_models import AssetRow, PrivatePackAssetRow, PrivatePackEntitlementRow, PrivatePackRow, UserRow
+from .storage_writer import writes
 
 _PACK_ACCESS_PRIORITY = {
     "official": -1,
@@ -58,6 +59,7 @@ def set_engine(value) -> None:
     engine = value
 
 
+@writes
 def create_asset_record(
     *,
     asset_id: str,
@@ -127,6 +129,7 @@ def list_assets_for_user(user_id: int, q: str = "", tag: str = "", folder: str =
     return out
 
 
+@writes
 def create_private_pack(
     owner_user_id: int,
     slug: str,
@@ -174,6 +177,7 @@ def get_private_pack_by_id(pack_id: int) -> Optional[PrivatePackRow]:
         return s.get(PrivatePackRow, pack_id)
 
 
+@writes
 def update_private_pack(
     pack_id: int,
     *,
@@ -200,6 +204,7 @@ def update_private_pack(
         return row
 
 
+@writes
 def add_private_pack_asset_record(
     *,
     pack_id: int,
@@ -234,6 +239,7 @@ def add_private_pack_asset_record(
         return row
 
 
+@writes
 def delete_private_pack_asset_record(pack_id: int, asset_id: str) -> bool:
     with Session(engine) as s:
         row = s.get(PrivatePackAssetRow, asset_id)
@@ -244,6 +250,7 @@ def delete_private_pack_asset_record(pack_id: int, asset_id: str) -> bool:
         return True
 
 
+@writes
 def delete_private_pack_asset_rows(pack_id: int) -> int:
     with Session(engine) as s:
         rows = s.exec(select(PrivatePackAssetRow).where(PrivatePackAssetRow.pack_id == pack_id)).all()
@@ -254,6 +261,7 @@ def delete_private_pack_asset_rows(pack_id: int) -> int:
         return count
 
 
+@writes
 def delete_private_pack_row(pack_id: int) -> bool:
     with Session(engine) as s:
         pack = s.get(PrivatePackRow, pack_id)
@@ -299,6 +307,7 @@ def user_has_pack_access(user_id: int, pack_id: int) -> bool:
         return entitlement is not None
 
 
+@writes
 def grant_private_pack_access(pack_id: int, user_id: int, now_iso: str) -> None:
     with Session(engine) as s:
         row = s.get(PrivatePackEntitlementRow, (pack_id, user_id))
@@ -310,6 +319,7 @@ def grant_private_pack_access(pack_id: int, user_id: int, now_iso: str) -> None:
         s.commit()
 
 
+@writes
 def revoke_private_pack_access(pack_id: int, user_id: int) -> None:
     with Session(engine) as s:
         row = s.get(PrivatePackEntitlementRow, (pack_id, user_id))
@@ -888,6 +898,7 @@ def get_asset_for_user(asset_id: str, user_id: int) -> Optional[AssetRow]:
         return row
 
 
+@writes
 def delete_asset_record(asset_id: str, user_id: int) -> bool:
     with Session(engine) as s:
         row = s.get(AssetRow, asset_id)
@@ -7,6 +7,7 @@ from sqlmodel import Session, desc, select
 
 from . import storage_db
 from .storage_models import AuditLogRow
+from .storage_writer import run_batched
 
 engine = storage_db.engine
 
@@ -37,12 +38,14 @@ def append_audit_log(
         after_json=json.dumps(after or {}, separators=(",", ":"), sort_keys=True),
         created_at=now_iso,
     )
-    with Session(engine) as s:
+
+    def op(s: Session) -> AuditLogRow:
         s.add(row)
-        s.commit()
-        s.refresh(row)
+        s.flush()
         return row
 
+    return run_batched(engine, op)
+
 
 def list_audit_logs(
     *,
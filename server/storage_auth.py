@@ -1,23 +1,71 @@
 from __future__ import annotations
 
 import secrets
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 from sqlmodel import Session, select
 
 from . import storage_db
 from .storage_models import SessionRow, UserRow
+from .storage_writer import submit_write, writes
 
 engine = storage_db.engine
 VALID_SITE_ROLES = {"user", "admin", "owner"}
 
+# Resolved sessions are reused for this long, so a page load's burst of
+# requests does not repeat the session and user lookups.
+USER_BY_SID_CACHE_TTL_SECONDS = 10.0
+# Expired entries are swept once the cache grows past this many sessions.
+USER_BY_SID_CACHE_MAX_ENTRIES = 4096
+
+# sid -> (monotonic deadline, user)
+_user_by_sid_cache: Dict[str, Tuple[float, UserRow]] = {}
+# Bumped by every invalidation.  A lookup that read the database before an
+# invalidation must not cache what it read, or a revoked user comes back.
+_user_by_sid_generation = 0
+
 
 def set_engine(value) -> None:
     global engine
+    if value is not engine:
+        invalidate_user_by_sid_cache()
     engine = value
 
 
+def invalidate_user_by_sid_cache(user_id: Optional[int] = None, sid: Optional[str] = None) -> None:
+    """Forget cached sessions for one sid, one user, or (with no arguments) everyone."""
+    global _user_by_sid_generation
+    _user_by_sid_generation += 1
+    if sid is not None:
+        _user_by_sid_cache.pop(sid, None)
+    if user_id is None:
+        if sid is None:
+            _user_by_sid_cache.clear()
+        return
+    for cached_sid, (_, user) in list(_user_by_sid_cache.items()):
+        if user.user_id == user_id:
+            _user_by_sid_cache.pop(cached_sid, None)
+
+
+def _remember_user_by_sid(sid: str, user: UserRow, expires_at: datetime, generation: int) -> None:
+    if generation != _user_by_sid_generation:
+        return
+    now = time.monotonic()
+    if len(_user_by_sid_cache) >= USER_BY_SID_CACHE_MAX_ENTRIES:
+        for cached_sid, (deadline, _) in list(_user_by_sid_cache.items()):
+            if deadline <= now:
+                _user_by_sid_cache.pop(cached_sid, None)
+        if len(_user_by_sid_cache) >= USER_BY_SID_CACHE_MAX_ENTRIES:
+            return
+    # Never trust a cached session past its own expiry.
+    ttl = min(USER_BY_SID_CACHE_TTL_SECONDS, (expires_at - datetime.now(timezone.utc)).total_seconds())
+    if ttl > 0:
+        _user_by_sid_cache[sid] = (now + ttl, user)
+
+
+@writes
 def create_user(username: str, password_hash: str, now_iso: str) -> UserRow:
     with Session(engine) as s:
         existing = s.exec(select(UserRow).where(UserRow.username == username)).first()
@@ -48,6 +96,7 @@ def get_user_by_id(user_id: int) -> Optional[UserRow]:
         return s.get(UserRow, user_id)
 
 
+@writes
 def update_user_password_hash(user_id: int, password_hash: str) -> bool:
     with Session(engine) as s:
         user = s.get(UserRow, user_id)
@@ -56,9 +105,11 @@ def update_user_password_hash(user_id: int, password_hash: str) -> bool:
         user.password_hash = password_hash
         s.add(user)
         s.commit()
-        return True
+    invalidate_user_by_sid_cache(user_id)
+    return True
 
 
+@writes
 def update_user_last_room(user_id: int, room_id: Optional[str]) -> bool:
     with Session(engine) as s:
         user = s.get(UserRow, user_id)
@@ -67,9 +118,11 @@ def update_user_last_room(user_id: int, room_id: Optional[str]) -> bool:
         user.last_room_id = room_id
         s.add(user)
         s.commit()
-        return True
+    invalidate_user_by_sid_cache(user_id)
+    return True
 
 
+@writes
 def update_user_status(user_id: int, status: str, now_iso: str, reason: Optional[str] = None) -> bool:
     next_status = str(status or "").strip() or "active"
     with Session(engine) as s:
@@ -91,9 +144,11 @@ def update_user_status(user_id: int, status: str, now_iso: str, reason: Optional
                 user.deleted_at = None
         s.add(user)
         s.commit()
-        return True
+    invalidate_user_by_sid_cache(user_id)
+    return True
 
 
+@writes
 def update_user_must_change_password(user_id: int, must_change_password: bool) -> bool:
     with Session(engine) as s:
         user = s.get(UserRow, user_id)
@@ -102,9 +157,11 @@ def update_user_must_change_password(user_id: int, must_change_password: bool) -
         user.must_change_password = bool(must_change_password)
         s.add(user)
         s.commit()
-        return True
+    invalidate_user_by_sid_cache(user_id)
+    return True
 
 
+@writes
 def update_user_role(user_id: int, role: str) -> bool:
     next_role = str(role or "").strip().lower()
     if next_role not in VALID_SITE_ROLES:
@@ -116,7 +173,8 @@ def update_user_role(user_id: int, role: str) -> bool:
         user.role = next_role
         s.add(user)
         s.commit()
-        return True
+    invalidate_user_by_sid_cache(user_id)
+    return True
 
 
 def count_users_with_role(role: str, status: Optional[str] = None) -> int:
@@ -131,6 +189,7 @@ def count_users_with_role(role: str, status: Optional[str] = None) -> int:
     return len(rows)
 
 
+@writes
 def bootstrap_owner_if_missing() -> Optional[UserRow]:
     with Session(engine) as s:
         existing_owner = s.exec(
@@ -152,9 +211,11 @@ def bootstrap_owner_if_missing() -> Optional[UserRow]:
         s.add(candidate)
         s.commit()
         s.refresh(candidate)
-        return candidate
+    invalidate_user_by_sid_cache(candidate.user_id)
+    return candidate
 
 
+@writes
 def create_session(user_id: int, ttl_days: int = 30) -> str:
     sid = secrets.token_urlsafe(32)
     now = datetime.now(timezone.utc)
@@ -170,22 +231,20 @@ def list_sessions_for_user(user_id: int) -> list[dict]:
     now = datetime.now(timezone.utc)
     with Session(engine) as s:
         rows = s.exec(select(SessionRow).where(SessionRow.user_id == user_id)).all()
-        active_rows = []
-        removed = False
-        for row in rows:
-            try:
-                expires = datetime.fromisoformat(row.expires_at)
-            except Exception:
-                s.delete(row)
-                removed = True
-                continue
-            if expires < now:
-                s.delete(row)
-                removed = True
-                continue
-            active_rows.append(row)
-        if removed:
-            s.commit()
+    active_rows = []
+    stale: list[str] = []
+    for row in rows:
+        try:
+            expires = datetime.fromisoformat(row.expires_at)
+        except Exception:
+            stale.append(row.sid)
+            continue
+        if expires < now:
+            stale.append(row.sid)
+            continue
+        active_rows.append(row)
+    if stale:
+        submit_write(_drop_sessions, stale)
     active_rows.sort(key=lambda row: str(row.created_at or ""), reverse=True)
     return [
         {
@@ -197,14 +256,29 @@ def list_sessions_for_user(user_id: int) -> list[dict]:
     ]
 
 
+def _drop_sessions(sids: list[str]) -> None:
+    """Delete expired or orphaned session rows found while reading.
+
+    Readers queue this with ``submit_write`` and do not wait: the sids are
+    already treated as invalid, and ``get_user_by_sid`` runs on the event loop.
+    """
+    with Session(engine) as s:
+        for row in s.exec(select(SessionRow).where(SessionRow.sid.in_(sids))).all():
+            s.delete(row)
+        s.commit()
+
+
+@writes
 def delete_session(sid: str) -> None:
     with Session(engine) as s:
         row = s.get(SessionRow, sid)
         if row:
             s.delete(row)
             s.commit()
+    invalidate_user_by_sid_cache(sid=sid)
 
 
+@writes
 def delete_session_for_user(user_id: int, sid: str) -> bool:
     with Session(engine) as s:
         row = s.get(SessionRow, sid)
@@ -212,9 +286,11 @@ def delete_session_for_user(user_id: int, sid: str) -> bool:
             return False
         s.delete(row)
         s.commit()
-        return True
+    invalidate_user_by_sid_cache(sid=sid)
+    return True
 
 
+@writes
 def delete_all_sessions_for_user(user_id: int, except_sid: Optional[str] = None) -> int:
     removed = 0
     with Session(engine) as s:
@@ -226,12 +302,20 @@ def delete_all_sessions_for_user(user_id: int, except_sid: Optional[str] = None)
             removed += 1
         if removed:
             s.commit()
+    if removed:
+        invalidate_user_by_sid_cache(user_id)
     return removed
 
 
 def get_user_by_sid(sid: str) -> Optional[UserRow]:
     if not sid:
         return None
+    cached = _user_by_sid_cache.get(sid)
+    if cached is not None:
+        if cached[0] > time.monotonic():
+            return cached[1]
+        _user_by_sid_cache.pop(sid, None)
+    generation = _user_by_sid_generation
     with Session(engine) as s:
         sess = s.get(SessionRow, sid)
         if not sess:
@@ -239,20 +323,10 @@ def get_user_by_sid(sid: str) -> Optional[UserRow]:
         try:
             exp = datetime.fromisoformat(sess.expires_at)
         except Exception:
-            s.delete(sess)
-            s.commit()
-            return None
-        if exp < datetime.now(timezone.utc):
-            s.delete(sess)
-            s.commit()
-            return None
-        user = s.get(UserRow, sess.user_id)
-        if not user:
-            s.delete(sess)
-            s.commit()
-            return None
-        if str(user.status or "active") != "active":
-            s.delete(sess)
-            s.commit()
-            return None
-        return user
+            exp = None
+        user = s.get(UserRow, sess.user_id) if exp is not None and exp >= datetime.now(timezone.utc) else None
+    if user is None or str(user.status or "active") != "active":
+        submit_write(_drop_sessions, [sid])
+        return None
+    _remember_user_by_sid(sid, user, exp, generation)
+    return user
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, delete, select, update
+
+from .env import env_int
+from .storage_models import RoomRow, SnapshotChunkRow, SnapshotRow
+
+try:
+    import zstandard  # type: ignore
+except Exception:  # pragma: no cover - optional, zlib is the fallback
+    zstandard = None
+
+
+# Header byte in front of a compressed room state or snapshot blob.  Stored
+# JSON text starts with "{", so rows written before compression still load.
+ZLIB_HEADER = b"\x01"
+ZSTD_HEADER = b"\x02"
+CODECS = ("none", "zlib", "zstd")
+_DEFAULT_LEVELS = {"zlib": 1, "zstd": 3}
+
+# Codec for newly written blobs; zstd falls back to zlib when the module is missing.
+ROOM_STATE_COMPRESSION = os.getenv("ROOM_STATE_COMPRESSION", "zlib").strip().lower() or "zlib"
+# 0 uses the codec's own default (zlib 1, zstd 3), fast enough to keep autosave batches short.
+ROOM_STATE_COMPRESSION_LEVEL = env_int("ROOM_STATE_COMPRESSION_LEVEL", 0, allow_zero=True)
+# Blobs smaller than this are stored as plain text; the header would not pay off.
+MIN_COMPRESS_BYTES = 512
+# Top-level snapshot field values shorter than this (as JSON) stay inline in the manifest.
+MIN_CHUNK_BYTES = 256
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def effective_codec(codec: Optional[str] = None) -> str:
+    name = (codec or ROOM_STATE_COMPRESSION).lower()
+    if name not in CODECS:
+        name = "zlib"
+    if name == "zstd" and zstandard is None:
+        name = "zlib"
+    return name
+
+
+def encode_state_blob(text: str, codec: Optional[str] = None, level: Optional[int] = None) -> Union[str, bytes]:
+    """Stored form of a state JSON string: header byte plus compressed UTF-8, or the text itself."""
+    name = effective_codec(codec)
+    if name == "none" or len(text) < MIN_COMPRESS_BYTES:
+        return text
+    raw = text.encode()
+    lvl = level or ROOM_STATE_COMPRESSION_LEVEL or _DEFAULT_LEVELS[name]
+    if name == "zstd":
+        return ZSTD_HEADER + zstandard.ZstdCompressor(level=lvl).compress(raw)
+    return ZLIB_HEADER + zlib.compress(raw, lvl)
+
+
+def decode_state_blob(value: Union[str, bytes, None]) -> Optional[str]:
+    """State JSON from a stored blob in any of the formats ``encode_state_blob`` writes."""
+    if value is None or isinstance(value, str):
+        return value
+    data = bytes(value)
+    header, body = data[:1], data[1:]
+    if header == ZLIB_HEADER:
+        return zlib.decompress(body).decode()
+    if header == ZSTD_HEADER:
+        if zstandard is None:
+            raise RuntimeError("Room state blob is zstd-compressed but the zstandard module is not installed")
+        return zstandard.ZstdDecompressor().decompress(body).decode()
+    return data.decode()
+
+
+def stored_size(value: Union[str, bytes, None]) -> int:
+    """Bytes a stored blob takes, as SQLite counts them."""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode())
+    return len(value)
+
+
+def recompress_state_rows(
+    engine: Engine, codec: Optional[str] = None, level: Optional[int] = None, batch_size: int = 100
+) -> Dict[str, Dict[str, int]]:
+    """Rewrite every room state, snapshot and snapshot chunk blob in ``engine`` with ``codec``.
+
+    Rows are read in primary key order and committed ``batch_size`` at a
+    time.  Returns, per table, the rows seen and rewritten and the stored
+    bytes before and after.
+    """
+    report: Dict[str, Dict[str, int]] = {}
+    for model, column in ((RoomRow, "state_json"), (SnapshotRow, "state_json"), (SnapshotChunkRow, "data")):
+        key = model.__table__.primary_key.columns.values()[0]
+        totals = report[model.__tablename__] = {"rows": 0, "rewritten": 0, "bytes_before": 0, "bytes_after": 0}
+        last: Any = None
+        while True:
+            with Session(engine) as s:
+                stmt = select(model).order_by(key).limit(batch_size)
+                if last is not None:
+                    stmt = stmt.where(key > last)
+                rows = s.exec(stmt).all()
+                if not rows:
+                    break
+                for row in rows:
+                    before = getattr(row, column)
+                    after = encode_state_blob(decode_state_blob(before) or "", codec, level)
+                    totals["rows"] += 1
+                    totals["bytes_before"] += stored_size(before)
+                    totals["bytes_after"] += stored_size(after)
+                    if after != before:
+                        setattr(row, column, after)
+                        s.add(row)
+                        totals["rewritten"] += 1
+                last = getattr(rows[-1], key.name)
+                s.commit()
+    return report
+
+
+_DECODER = json.JSONDecoder()
+_WS = re.compile(r"[ \t\n\r]*")
+
+
+def _value_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """(start, end) of each top-level field value in JSON object ``text``."""
+    idx = _WS.match(text, 0).end()
+    if text[idx:idx + 1] != "{":
+        raise ValueError("Snapshot state must be a JSON object")
+    idx = _WS.match(text, idx + 1).end()
+    if text[idx:idx + 1] == "}":
+        return
+    while True:
+        key, idx = _DECODER.raw_decode(text, idx)
+        idx = _WS.match(text, idx).end()
+        if not isinstance(key, str) or text[idx:idx + 1] != ":":
+            raise ValueError("Malformed snapshot state")
+        idx = _WS.match(text, idx + 1).end()
+        _, end = _DECODER.raw_decode(text, idx)
+        yield idx, end
+        idx = _WS.match(text, end).end()
+        if text[idx:idx + 1] == "}":
+            return
+        if text[idx:idx + 1] != ",":
+            raise ValueError("Malformed snapshot state")
+        idx = _WS.match(text, idx + 1).end()
+
+
+def store_snapshot_chunks(s: Session, text: str) -> Optional[str]:
+    """Store the large top-level field values of state JSON ``text`` as shared chunks.
+
+    Each chunk is keyed by the SHA-256 of its JSON, so a collection that did
+    not change since the last snapshot is stored once and only gains a
+    reference.  Returns the manifest to keep on the snapshot row: the text
+    between chunks as literal strings, each chunk as ``{"h": digest}``, so
+    ``load_snapshot_chunks`` gives back ``text`` exactly.  Returns None when
+    ``text`` is not a JSON object or has no field large enough to share.
+    """
+    parts: List[Any] = []
+    chunks: Dict[str, str] = {}
+    refs: Dict[str, int] = {}
+    last = 0
+    try:
+        spans = list(_value_spans(text))
+    except ValueError:
+        return None
+    for start, end in spans:
+        if end - start < MIN_CHUNK_BYTES:
+            continue
+        chunk = text[start:end]
+        digest = hashlib.sha256(chunk.encode()).hexdigest()
+        parts.append(text[last:start])
+        parts.append({"h": digest})
+        chunks[digest] = chunk
+        refs[digest] = refs.get(digest, 0) + 1
+        last = end
+    if not refs:
+        return None
+    parts.append(text[last:])
+    existing = {
+        row.digest: row
+        for row in s.exec(select(SnapshotChunkRow).where(SnapshotChunkRow.digest.in_(list(refs)))).all()
+    }
+    for digest, count in refs.items():
+        row = existing.get(digest)
+        if row is None:
+            row = SnapshotChunkRow(digest=digest, data=encode_state_blob(chunks[digest]), refcount=0)
+        row.refcount += count
+        s.add(row)
+    return _dumps(parts)
+
+
+def _manifest_digests(manifest: List[Any]) -> List[str]:
+    return [part["h"] for part in manifest if isinstance(part, dict)]
+
+
+def load_snapshot_chunks(s: Session, manifest_json: str) -> str:
+    """Reassemble the state JSON a snapshot manifest stands for."""
+    manifest = json.loads(manifest_json)
+    digests = _manifest_digests(manifest)
+    chunks = (
+        {
+            row.digest: decode_state_blob(row.data)
+            for row in s.exec(select(SnapshotChunkRow).where(SnapshotChunkRow.digest.in_(digests))).all()
+        }
+        if digests
+        else {}
+    )
+    out: List[str] = []
+    for part in manifest:
+        if isinstance(part, dict):
+            body = chunks.get(part["h"])
+            if body is None:
+                raise RuntimeError(f"Snapshot chunk {part['h']} is missing")
+            out.append(body)
+        else:
+            out.append(part)
+    return "".join(out)
+
+
+def release_snapshot_chunks(s: Session, manifests: Iterable[Optional[str]]) -> None:
+    """Drop one reference per use in ``manifests`` and delete chunks nothing refers to any more."""
+    counts: Dict[str, int] = {}
+    for manifest_json in manifests:
+        if not manifest_json:
+            continue
+        for digest in _manifest_digests(json.loads(manifest_json)):
+            counts[digest] = counts.get(digest, 0) + 1
+    if not counts:
+        return
+    by_count: Dict[int, List[str]] = {}
+    for digest, count in counts.items():
+        by_count.setdefault(count, []).append(digest)
+    for count, digests in by_count.items():
+        s.exec(
+            update(SnapshotChunkRow)
+            .where(SnapshotChunkRow.digest.in_(digests))
+            .values(refcount=SnapshotChunkRow.refcount - count)
+        )
+    s.exec(delete(SnapshotChunkRow).where(SnapshotChunkRow.digest.in_(list(counts)), SnapshotChunkRow.refcount <= 0))
@@ -2,8 +2,45 @@ from __future__ import annotations
 
 import os
 import sqlite3
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlmodel import SQLModel, create_engine
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, SQLModel, create_engine, delete, select
+
+from .env import env_int
+from .storage_models import RoomJournalRow, RoomRow, SnapshotChunkRow, SnapshotRow
+
+
+# PRAGMAs run on every new pooled connection, picked with SQLITE_PROFILE.
+SQLITE_PROFILES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    # What the app has always run with: WAL, and every commit fsynced.
+    "default": (
+        ("journal_mode", "WAL"),
+        ("synchronous", "FULL"),
+        ("busy_timeout", "3000"),
+        ("foreign_keys", "OFF"),
+    ),
+    # Commits still survive an app crash but may be lost on power failure;
+    # larger page cache, memory-mapped reads and in-memory temp tables.
+    "throughput": (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("busy_timeout", "3000"),
+        ("foreign_keys", "OFF"),
+        ("cache_size", "-65536"),
+        ("mmap_size", "268435456"),
+        ("temp_store", "MEMORY"),
+    ),
+}
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "default").strip().lower() or "default"
+SQLITE_POOL_SIZE = env_int("SQLITE_POOL_SIZE", 5, allow_zero=True)
+SQLITE_POOL_OVERFLOW = env_int("SQLITE_POOL_OVERFLOW", 10, allow_zero=True)
+SQLITE_POOL_TIMEOUT_SECONDS = 30.0
+
+
+# Room checkpoints, journal patches and snapshots: the large, constantly rewritten rows.
+ROOM_STATE_MODELS = (RoomRow, RoomJournalRow, SnapshotRow, SnapshotChunkRow)
 
 
 def db_url() -> str:
@@ -18,7 +55,122 @@ def db_url() -> str:
     return f"sqlite:///{db_path}"
 
 
-engine = create_engine(db_url(), connect_args={"check_same_thread": False, "timeout": 3.0})
+def sqlite_pragmas(profile: str) -> Tuple[Tuple[str, str], ...]:
+    """PRAGMA (name, value) pairs for ``profile``; unknown names get the default profile."""
+    return SQLITE_PROFILES.get(profile, SQLITE_PROFILES["default"])
+
+
+def configure_sqlite_engine(target: Engine, profile: str = SQLITE_PROFILE) -> Engine:
+    """Apply ``profile``'s PRAGMAs to each connection ``target`` opens from now on."""
+    pragmas = sqlite_pragmas(profile)
+
+    @event.listens_for(target, "connect")
+    def _apply_pragmas(dbapi_conn: Any, _record: Any) -> None:
+        cur = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas:
+                cur.execute(f"PRAGMA {name}={value};")
+        finally:
+            cur.close()
+
+    return target
+
+
+def make_engine(url: str, profile: str = SQLITE_PROFILE) -> Engine:
+    """File-backed SQLite engine with an explicit connection pool and the PRAGMA hook."""
+    return configure_sqlite_engine(
+        create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": 3.0},
+            pool_size=SQLITE_POOL_SIZE,
+            max_overflow=SQLITE_POOL_OVERFLOW,
+            pool_timeout=SQLITE_POOL_TIMEOUT_SECONDS,
+        ),
+        profile,
+    )
+
+
+def room_state_db_url() -> Optional[str]:
+    """URL of the separate room state database, or None to keep room state in the main one."""
+    raw = os.getenv("ROOM_STATE_DB_PATH", "").strip()
+    if not raw:
+        return None
+    path = raw if os.path.isabs(raw) else os.path.join(os.getenv("DATA_DIR", "./data"), raw)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return f"sqlite:///{path}"
+
+
+engine = make_engine(db_url())
+# Only set when ROOM_STATE_DB_PATH moves room state into its own file; storage
+# modules fall back to ``engine`` otherwise.
+_state_url = room_state_db_url()
+state_engine: Optional[Engine] = make_engine(_state_url) if _state_url else None
+
+
+def create_room_state_tables(target: Engine) -> None:
+    SQLModel.metadata.create_all(target, tables=[model.__table__ for model in ROOM_STATE_MODELS])
+    _upgrade_room_state_tables(target)
+
+
+def _upgrade_room_state_tables(target: Engine) -> None:
+    # Room state tables may live in either database file, so this goes through the engine.
+    with target.connect() as conn:
+        cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(snapshotrow)").fetchall()}
+        if cols and "chunks_json" not in cols:
+            conn.exec_driver_sql("ALTER TABLE snapshotrow ADD COLUMN chunks_json TEXT;")
+            conn.commit()
+
+
+def move_room_state(source: Engine, target: Engine, batch_size: int = 50) -> Dict[str, int]:
+    """Move every room state row from ``source`` to ``target``, ``batch_size`` rows per transaction.
+
+    Each batch is committed to ``target`` before it is deleted from
+    ``source``, and rows already in ``target`` are overwritten, so an
+    interrupted run can simply be started again.  Returns rows moved per table.
+    """
+    create_room_state_tables(target)
+    moved: Dict[str, int] = {}
+    for model in ROOM_STATE_MODELS:
+        key = model.__table__.primary_key.columns.values()[0]
+        count = 0
+        while True:
+            with Session(source) as src:
+                rows: List[Any] = list(src.exec(select(model).order_by(key).limit(batch_size)).all())
+                src.expunge_all()
+            if not rows:
+                break
+            with Session(target) as dst:
+                for row in rows:
+                    # Column by column: blobs may be bytes or legacy text.
+                    dst.merge(model(**{c.name: getattr(row, c.name) for c in model.__table__.columns}))
+                dst.commit()
+            ids = [getattr(row, key.name) for row in rows]
+            with Session(source) as src:
+                src.exec(delete(model).where(key.in_(ids)))
+                src.commit()
+            count += len(rows)
+        moved[model.__tablename__] = count
+    return moved
+
+
+def _has_room_rows(target: Engine) -> bool:
+    with target.connect() as conn:
+        if not conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type='table' AND name='roomrow'").first():
+            return False
+        return conn.exec_driver_sql("SELECT 1 FROM roomrow LIMIT 1").first() is not None
+
+
+def check_room_state_split(main: Engine, state: Engine) -> None:
+    """Refuse to run on a split whose room state was never moved out of ``main``.
+
+    Otherwise every room would load empty and its first autosave would
+    checkpoint that empty board into ``state``.
+    """
+    if _has_room_rows(main) and not _has_room_rows(state):
+        raise RuntimeError(
+            f"ROOM_STATE_DB_PATH points at {state.url}, which holds no rooms, but {main.url} still does. "
+            "Stop the server and run scripts/move_room_state.py, or unset ROOM_STATE_DB_PATH."
+        )
 
 
 def _sqlite_conn() -> sqlite3.Connection:
@@ -39,13 +191,28 @@ def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
     return cur.fetchone() is not None
 
 
-def init_db() -> None:
+def init_db(allow_unmoved_room_state: bool = False) -> None:
     """
     Creates tables and performs tiny SQLite "migrations" for new columns.
 
-    We intentionally keep this lightweight (no Alembic) for MVP.
+    We intentionally keep this lightweight (no Alembic) for MVP.  With
+    ROOM_STATE_DB_PATH set, room state tables are only created in the state
+    database, and startup fails while the rooms are still in the main one
+    (``allow_unmoved_room_state`` is for the script that moves them).
     """
-    SQLModel.metadata.create_all(engine)
+    if state_engine is None:
+        SQLModel.metadata.create_all(engine)
+    else:
+        state_tables = {model.__table__ for model in ROOM_STATE_MODELS}
+        SQLModel.metadata.create_all(
+            engine, tables=[table for table in SQLModel.metadata.sorted_tables if table not in state_tables]
+        )
+    # An unmoved main database still holds room state, so it is upgraded either way.
+    _upgrade_room_state_tables(engine)
+    if state_engine is not None:
+        create_room_state_tables(state_engine)
+        if not allow_unmoved_room_state:
+            check_room_state_split(engine, state_engine)
 
     # Add columns to existing RoomMetaRow table if upgrading from earlier versions.
     try:
@@ -1,16 +1,42 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Optional, Union
 
+from sqlalchemy import Column, LargeBinary
+from sqlalchemy.types import TypeDecorator
 from sqlmodel import Field, SQLModel
 
 
+class StateBlob(TypeDecorator):
+    """BLOB column holding either legacy JSON text or codec-headed bytes, passed through as stored."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        return None
+
+    def result_processor(self, dialect, coltype):
+        return None
+
+
 class RoomRow(SQLModel, table=True):
     room_id: str = Field(primary_key=True)
-    state_json: str
+    # JSON text, or a compressed BLOB written by storage_blobs.encode_state_blob.
+    state_json: Union[str, bytes] = Field(sa_column=Column(StateBlob, nullable=False))
     updated_at: str
 
 
+class RoomJournalRow(SQLModel, table=True):
+    """One state patch recorded after the room's RoomRow checkpoint."""
+
+    seq: Optional[int] = Field(default=None, primary_key=True)
+    room_id: str = Field(index=True)
+    version: int
+    patch_json: str
+    created_at: str
+
+
 class RoomMetaRow(SQLModel, table=True):
     room_id: str = Field(primary_key=True)
     name: str
@@ -28,8 +54,21 @@ class SnapshotRow(SQLModel, table=True):
     snapshot_id: str = Field(primary_key=True)
     room_id: str = Field(index=True)
     label: str
-    state_json: str
+    # JSON text, or a compressed BLOB written by storage_blobs.encode_state_blob.
+    # Empty for snapshots stored as chunks.
+    state_json: Union[str, bytes] = Field(sa_column=Column(StateBlob, nullable=False))
     created_at: str
+    # JSON list of literal text and {"h": digest} chunk references; see storage_blobs.
+    chunks_json: Optional[str] = None
+
+
+class SnapshotChunkRow(SQLModel, table=True):
+    """One top-level field of a snapshot, shared by every snapshot with the same content."""
+
+    digest: str = Field(primary_key=True)
+    # Compressed like state_json.
+    data: Union[str, bytes] = Field(sa_column=Column(StateBlob, nullable=False))
+    refcount: int = 0
 
 
 class UserRow(SQLModel, table=True):
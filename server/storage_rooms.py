@@ -1,41 +1,98 @@
 from __future__ import annotations
 
 import secrets
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
 
-from sqlmodel import Session, select
+from sqlalchemy import null, union_all
+from sqlmodel import Session, delete, select
 
 from . import storage_db
-from .storage_models import GameSessionMemberRow, RoomMemberRow, RoomMetaRow, RoomRow, SnapshotRow, UserRow
+from .storage_blobs import decode_state_blob, encode_state_blob, release_snapshot_chunks
+from .storage_models import GameSessionMemberRow, RoomJournalRow, RoomMemberRow, RoomMetaRow, RoomRow, SnapshotRow, UserRow
+from .storage_writer import run_batched, writes
 
 engine = storage_db.engine
+# Room state, journal and snapshot rows; the same engine unless they live in their own file.
+state_engine = storage_db.state_engine or engine
 
 _JOIN_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
 
 
-def set_engine(value) -> None:
-    global engine
+def set_engine(value, state_value=None) -> None:
+    global engine, state_engine
     engine = value
+    state_engine = state_value if state_value is not None else value
 
 
 def load_room_state_json(room_id: str) -> Optional[str]:
-    with Session(engine) as s:
+    with Session(state_engine) as s:
         row = s.exec(select(RoomRow).where(RoomRow.room_id == room_id)).first()
-        return row.state_json if row else None
+        return decode_state_blob(row.state_json) if row else None
 
 
 def save_room_state_json(room_id: str, state_json: str, now_iso: str) -> None:
-    with Session(engine) as s:
-        row = s.get(RoomRow, room_id)
-        if row:
-            row.state_json = state_json
-            row.updated_at = now_iso
-        else:
-            row = RoomRow(room_id=room_id, state_json=state_json, updated_at=now_iso)
-            s.add(row)
+    save_room_states_json({room_id: state_json}, now_iso)
+
+
+def save_room_states_json(states: Dict[str, str], now_iso: str) -> None:
+    """Upsert several rooms' state blobs in a single transaction."""
+    commit_room_writes({room_id: encode_state_blob(text) for room_id, text in states.items()}, [], now_iso)
+
+
+@writes
+def commit_room_writes(checkpoints: Dict[str, Union[str, bytes]], journal: Sequence[Tuple[str, int, str]], now_iso: str) -> None:
+    """Write full-state checkpoints and journal patches in one transaction.
+
+    A checkpoint replaces the room's journal, so it is written first; ``journal``
+    rows (room_id, version, patch_json) are appended after it in order.
+    ``checkpoints`` hold stored blobs (``encode_state_blob``): callers compress
+    them first, so the writer thread only runs SQL.
+    """
+    if not checkpoints and not journal:
+        return
+    with Session(state_engine) as s:
+        for room_id, state_json in checkpoints.items():
+            row = s.get(RoomRow, room_id)
+            if row:
+                row.state_json = state_json
+                row.updated_at = now_iso
+            else:
+                row = RoomRow(room_id=room_id, state_json=state_json, updated_at=now_iso)
+                s.add(row)
+        if checkpoints:
+            s.exec(delete(RoomJournalRow).where(RoomJournalRow.room_id.in_(list(checkpoints))))
+        for room_id, version, patch_json in journal:
+            s.add(RoomJournalRow(room_id=room_id, version=version, patch_json=patch_json, created_at=now_iso))
         s.commit()
 
 
+def load_room_checkpoint(room_id: str) -> Tuple[Optional[str], List[str]]:
+    """The room's last checkpoint and the journal patches recorded since, read together.
+
+    Both come from one statement, so one read transaction: a checkpoint
+    committed between two separate reads would pair the old checkpoint with
+    the emptied journal and lose the journaled edits.
+    """
+    checkpoint = select(null().label("seq"), RoomRow.state_json.label("data")).where(RoomRow.room_id == room_id)
+    journal = select(RoomJournalRow.seq, RoomJournalRow.patch_json).where(RoomJournalRow.room_id == room_id)
+    with Session(state_engine) as s:
+        # NULL sorts first, so the checkpoint (if any) leads the journal.
+        rows = s.exec(union_all(checkpoint, journal).order_by("seq")).all()
+    if rows and rows[0][0] is None:
+        return decode_state_blob(rows[0][1]), [patch for _, patch in rows[1:]]
+    return None, [patch for _, patch in rows]
+
+
+def load_room_journal(room_id: str) -> List[str]:
+    """Patches recorded since the room's last checkpoint, oldest first."""
+    with Session(state_engine) as s:
+        rows = s.exec(
+            select(RoomJournalRow.patch_json).where(RoomJournalRow.room_id == room_id).order_by(RoomJournalRow.seq)
+        ).all()
+        return list(rows)
+
+
+@writes
 def create_room_record(
     room_id: str,
     name: str,
@@ -53,6 +110,11 @@ def create_room_record(
         existing = s.get(RoomMetaRow, room_id)
         if existing:
             raise ValueError("Room already exists")
+        if state_engine is not engine:
+            # State first: a blob without its meta row is never loaded, the reverse would be.
+            with Session(state_engine) as state_s:
+                state_s.merge(RoomRow(room_id=room_id, state_json=encode_state_blob(state_json), updated_at=now_iso))
+                state_s.commit()
         s.add(
             RoomMetaRow(
                 room_id=room_id,
@@ -67,7 +129,8 @@ def create_room_record(
                 parent_room_id=parent_room_id,
             )
         )
-        s.add(RoomRow(room_id=room_id, state_json=state_json, updated_at=now_iso))
+        if state_engine is engine:
+            s.add(RoomRow(room_id=room_id, state_json=encode_state_blob(state_json), updated_at=now_iso))
         s.commit()
 
 
@@ -82,6 +145,7 @@ def get_room_session_id(room_id: str) -> Optional[str]:
         return meta.session_id if meta else None
 
 
+@writes
 def update_room_name(room_id: str, name: str) -> bool:
     with Session(engine) as s:
         meta = s.get(RoomMetaRow, room_id)
@@ -93,6 +157,7 @@ def update_room_name(room_id: str, name: str) -> bool:
         return True
 
 
+@writes
 def update_room_display_name(room_id: str, display_name: str) -> bool:
     with Session(engine) as s:
         meta = s.get(RoomMetaRow, room_id)
@@ -104,6 +169,7 @@ def update_room_display_name(room_id: str, display_name: str) -> bool:
         return True
 
 
+@writes
 def update_room_order(room_id: str, room_order: int) -> bool:
     with Session(engine) as s:
         meta = s.get(RoomMetaRow, room_id)
@@ -115,19 +181,32 @@ def update_room_order(room_id: str, room_order: int) -> bool:
         return True
 
 
+def _delete_room_state(s: Session, room_id: str) -> bool:
+    row = s.get(RoomRow, room_id)
+    if row:
+        s.delete(row)
+    release_snapshot_chunks(
+        s, s.exec(select(SnapshotRow.chunks_json).where(SnapshotRow.room_id == room_id)).all()
+    )
+    s.exec(delete(SnapshotRow).where(SnapshotRow.room_id == room_id))
+    s.exec(delete(RoomJournalRow).where(RoomJournalRow.room_id == room_id))
+    return row is not None
+
+
+@writes
 def delete_room_record(room_id: str) -> bool:
     with Session(engine) as s:
         meta = s.get(RoomMetaRow, room_id)
-        row = s.get(RoomRow, room_id)
-        if not meta and not row:
+        if state_engine is engine:
+            had_state = _delete_room_state(s, room_id)
+        else:
+            with Session(state_engine) as state_s:
+                had_state = _delete_room_state(state_s, room_id)
+                state_s.commit()
+        if not meta and not had_state:
             return False
         if meta:
             s.delete(meta)
-        if row:
-            s.delete(row)
-        snaps = s.exec(select(SnapshotRow).where(SnapshotRow.room_id == room_id)).all()
-        for snap in snaps:
-            s.delete(snap)
         memberships = s.exec(select(RoomMemberRow).where(RoomMemberRow.room_id == room_id)).all()
         for membership in memberships:
             s.delete(membership)
@@ -140,6 +219,7 @@ def generate_join_code(prefix: str = "WHAM", length: int = 6) -> str:
     return f"{prefix}-{core}"
 
 
+@writes
 def ensure_room_join_code(room_id: str) -> str:
     with Session(engine) as s:
         meta = s.get(RoomMetaRow, room_id)
@@ -171,6 +251,7 @@ def room_id_from_join_code(code: str) -> Optional[str]:
         return meta.room_id if meta else None
 
 
+@writes
 def add_membership(user_id: int, room_id: str, now_iso: str, role: str = "player") -> None:
     with Session(engine) as s:
         row = s.get(RoomMemberRow, (user_id, room_id))
@@ -184,12 +265,13 @@ def add_membership(user_id: int, room_id: str, now_iso: str, role: str = "player
 
 
 def touch_membership(user_id: int, room_id: str, now_iso: str) -> None:
-    with Session(engine) as s:
+    def op(s: Session) -> None:
         row = s.get(RoomMemberRow, (user_id, room_id))
         if row:
             row.last_seen_at = now_iso
             s.add(row)
-            s.commit()
+
+    run_batched(engine, op)
 
 
 def list_room_member_user_ids(room_id: str) -> List[int]:
@@ -239,6 +321,7 @@ def get_room_member_role(user_id: int, room_id: str) -> Optional[str]:
         return str(row.role or "").strip() or None
 
 
+@writes
 def remove_room_membership(user_id: int, room_id: str) -> bool:
     with Session(engine) as s:
         row = s.get(RoomMemberRow, (user_id, room_id))
@@ -249,6 +332,7 @@ def remove_room_membership(user_id: int, room_id: str) -> bool:
         return True
 
 
+@writes
 def transfer_room_ownership(room_id: str, new_owner_user_id: int, fallback_role: str = "player") -> bool:
     with Session(engine) as s:
         meta = s.get(RoomMetaRow, room_id)
@@ -17,15 +17,21 @@ from .storage_models import (
     SnapshotRow,
     UserRow,
 )
+from .storage_blobs import decode_state_blob, encode_state_blob, load_snapshot_chunks, store_snapshot_chunks
+from .storage_writer import run_batched, writes
 
 engine = storage_db.engine
+# Room state, journal and snapshot rows; the same engine unless they live in their own file.
+state_engine = storage_db.state_engine or engine
 
 
-def set_engine(value) -> None:
-    global engine
+def set_engine(value, state_value=None) -> None:
+    global engine, state_engine
     engine = value
+    state_engine = state_value if state_value is not None else value
 
 
+@writes
 def create_game_session(
     name: str,
     created_by_user_id: Optional[int],
@@ -54,6 +60,7 @@ def get_game_session(session_id: str) -> Optional[GameSessionRow]:
         return s.get(GameSessionRow, session_id)
 
 
+@writes
 def archive_game_session(session_id: str) -> bool:
     with Session(engine) as s:
         row = s.get(GameSessionRow, session_id)
@@ -66,15 +73,16 @@ def archive_game_session(session_id: str) -> bool:
 
 
 def touch_game_session(session_id: str, now_iso: str) -> None:
-    with Session(engine) as s:
+    def op(s: Session) -> None:
         row = s.get(GameSessionRow, session_id)
-        if not row:
-            return
-        row.updated_at = now_iso
-        s.add(row)
-        s.commit()
+        if row:
+            row.updated_at = now_iso
+            s.add(row)
+
+    run_batched(engine, op)
 
 
+@writes
 def add_game_session_member(
     session_id: str,
     user_id: int,
@@ -128,6 +136,7 @@ def count_session_gms(session_id: str) -> int:
     return len(rows)
 
 
+@writes
 def set_game_session_member_role(session_id: str, user_id: int, role: str, now_iso: str) -> bool:
     with Session(engine) as s:
         row = s.exec(
@@ -148,6 +157,7 @@ def set_game_session_member_role(session_id: str, user_id: int, role: str, now_i
     return True
 
 
+@writes
 def remove_game_session_member(session_id: str, user_id: int, now_iso: str) -> bool:
     """Remove a user from the session and cascade-remove them from all session-backed rooms."""
     with Session(engine) as s:
@@ -279,6 +289,7 @@ def next_room_order_for_session(session_id: str) -> int:
     return max(int(row.get("room_order") or 0) for row in rooms) + 1
 
 
+@writes
 def assign_room_to_game_session(
     room_id: str,
     session_id: str,
@@ -309,6 +320,7 @@ def get_game_session_root_room_id(session_id: str) -> Optional[str]:
         return row.root_room_id if row else None
 
 
+@writes
 def set_game_session_root_room(session_id: str, room_id: str, now_iso: str) -> bool:
     with Session(engine) as s:
         row = s.get(GameSessionRow, session_id)
@@ -321,6 +333,7 @@ def set_game_session_root_room(session_id: str, room_id: str, now_iso: str) -> b
         return True
 
 
+@writes
 def set_room_parent(room_id: str, parent_room_id: Optional[str], now_iso: str) -> bool:
     with Session(engine) as s:
         meta = s.get(RoomMetaRow, room_id)
@@ -353,6 +366,7 @@ def set_room_parent(room_id: str, parent_room_id: Optional[str], now_iso: str) -
         return True
 
 
+@writes
 def create_room_in_game_session(
     *,
     session_id: str,
@@ -395,16 +409,26 @@ def create_room_in_game_session(
     touch_game_session(session_id)
 
 
+@writes
 def create_snapshot(room_id: str, label: str, state_json: str, now_iso: str) -> str:
     snapshot_id = secrets.token_hex(8)
-    with Session(engine) as s:
-        s.add(SnapshotRow(snapshot_id=snapshot_id, room_id=room_id, label=label, state_json=state_json, created_at=now_iso))
+    with Session(state_engine) as s:
+        manifest = store_snapshot_chunks(s, state_json)
+        if manifest is None:
+            row = SnapshotRow(
+                snapshot_id=snapshot_id, room_id=room_id, label=label, state_json=encode_state_blob(state_json), created_at=now_iso
+            )
+        else:
+            row = SnapshotRow(
+                snapshot_id=snapshot_id, room_id=room_id, label=label, state_json="", created_at=now_iso, chunks_json=manifest
+            )
+        s.add(row)
         s.commit()
     return snapshot_id
 
 
 def list_snapshots(room_id: str) -> List[Dict[str, str]]:
-    with Session(engine) as s:
+    with Session(state_engine) as s:
         snaps = s.exec(select(SnapshotRow).where(SnapshotRow.room_id == room_id)).all()
         return [
             {"snapshot_id": snap.snapshot_id, "room_id": snap.room_id, "label": snap.label, "created_at": snap.created_at}
@@ -413,9 +437,13 @@ def list_snapshots(room_id: str) -> List[Dict[str, str]]:
 
 
 def load_snapshot_state_json(snapshot_id: str) -> Optional[str]:
-    with Session(engine) as s:
+    with Session(state_engine) as s:
         snap = s.get(SnapshotRow, snapshot_id)
-        return snap.state_json if snap else None
+        if not snap:
+            return None
+        if snap.chunks_json:
+            return load_snapshot_chunks(s, snap.chunks_json)
+        return decode_state_blob(snap.state_json)
 
 
 def list_game_session_shared_packs(session_id: str) -> List[Dict[str, object]]:
@@ -492,6 +520,7 @@ def is_pack_shared_in_game_session(session_id: str, pack_id: int) -> bool:
     return row is not None
 
 
+@writes
 def set_game_session_shared_pack(
     session_id: str,
     pack_id: int,
@@ -534,6 +563,7 @@ def set_game_session_shared_pack(
     return True
 
 
+@writes
 def delete_game_session_shared_pack_rows(pack_id: int) -> int:
     with Session(engine) as s:
         rows = s.exec(
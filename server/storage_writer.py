@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple, TypeVar
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+T = TypeVar("T")
+
+_thread_state = threading.local()
+
+
+def _mark_writer_thread() -> None:
+    _thread_state.is_writer = True
+
+
+# The only thread that writes to SQLite.  Room autosave batches run here too,
+# so imports, audit rows and checkpoints queue up instead of racing for the
+# database lock and timing out.
+WRITER_EXECUTOR = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="sqlite-writer", initializer=_mark_writer_thread
+)
+
+
+@dataclass
+class StorageWriterStats:
+    """Counters for writes funnelled through the writer thread."""
+
+    writes: int = 0
+    failed_writes: int = 0
+    batches: int = 0
+    batched_ops: int = 0
+    max_batch_size: int = 0
+    max_wait_ms: float = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "writes": self.writes,
+            "failed_writes": self.failed_writes,
+            "batches": self.batches,
+            "batched_ops": self.batched_ops,
+            "avg_batch_size": round(self.batched_ops / self.batches, 3) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+        }
+
+
+stats = StorageWriterStats()
+
+
+def on_writer_thread() -> bool:
+    return getattr(_thread_state, "is_writer", False)
+
+
+def run_write(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Call ``fn`` on the writer thread and wait for its result.
+
+    Writes made from the writer thread itself (a write helper calling
+    another) run inline, so nesting cannot deadlock.
+    """
+    if on_writer_thread():
+        return fn(*args, **kwargs)
+    return submit_write(fn, *args, **kwargs).result()
+
+
+def submit_write(fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """Queue ``fn`` on the writer thread without waiting for it.
+
+    For cleanup nobody needs to see finish, so callers on the request path
+    are not held up behind checkpoint batches or imports.
+    """
+    queued = time.perf_counter()
+
+    def job() -> T:
+        stats.max_wait_ms = max(stats.max_wait_ms, (time.perf_counter() - queued) * 1000.0)
+        stats.writes += 1
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            stats.failed_writes += 1
+            raise
+
+    return WRITER_EXECUTOR.submit(job)
+
+
+def writes(fn: Callable[..., T]) -> Callable[..., T]:
+    """Decorator for storage functions that modify the database."""
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        return run_write(fn, *args, **kwargs)
+
+    return wrapper
+
+
+_batch_lock = threading.Lock()
+_batch: List[Tuple[Engine, Callable[[Session], Any], Future]] = []
+
+
+def run_batched(engine: Engine, op: Callable[[Session], T]) -> T:
+    """Apply a small write ``op(session)`` together with any others queued meanwhile.
+
+    Ops that pile up while the writer is busy share a single transaction.
+    ``op`` must not commit; it runs again on its own if its batch fails, so
+    one bad row only fails its own caller.
+    """
+    if on_writer_thread():
+        return _commit_ops(engine, [op])[0]
+    waiter: Future = Future()
+    with _batch_lock:
+        _batch.append((engine, op, waiter))
+        first = len(_batch) == 1
+    if first:
+        WRITER_EXECUTOR.submit(_drain_batch)
+    return waiter.result()
+
+
+def _commit_ops(engine: Engine, ops: List[Callable[[Session], Any]]) -> List[Any]:
+    # expire_on_commit=False: rows handed back stay readable once the session closes.
+    with Session(engine, expire_on_commit=False) as s:
+        results = [op(s) for op in ops]
+        s.commit()
+        return results
+
+
+def _drain_batch() -> None:
+    global _batch
+    with _batch_lock:
+        pending, _batch = _batch, []
+    if not pending:
+        return
+    stats.batches += 1
+    stats.batched_ops += len(pending)
+    stats.max_batch_size = max(stats.max_batch_size, len(pending))
+    groups: Dict[int, List[Tuple[Engine, Callable[[Session], Any], Future]]] = {}
+    for item in pending:
+        groups.setdefault(id(item[0]), []).append(item)
+    for items in groups.values():
+        try:
+            results = _commit_ops(items[0][0], [op for _, op, _ in items])
+        except Exception as exc:
+            if len(items) == 1:
+                stats.failed_writes += 1
+                items[0][2].set_exception(exc)
+                continue
+            for engine, op, waiter in items:
+                try:
+                    waiter.set_result(_commit_ops(engine, [op])[0])
+                except Exception as err:
+                    stats.failed_writes += 1
+                    waiter.set_exception(err)
+        else:
+            for (_, _, waiter), result in zip(items, results):
+                waiter.set_result(result)
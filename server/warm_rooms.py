@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from .env import env_float, env_int
+
+if TYPE_CHECKING:
+    from .rooms import Room
+
+
+# Total estimated size of emptied rooms kept in memory; 0 disables the cache.
+WARM_ROOMS_MAX_BYTES = env_int("WARM_ROOMS_MAX_BYTES", 64 * 1024 * 1024, allow_zero=True)
+# Emptied rooms idle longer than this are dropped even when there is room to spare.
+WARM_ROOMS_IDLE_SECONDS = env_float("WARM_ROOMS_IDLE_SECONDS", 300.0, allow_zero=True)
+
+
+@dataclass
+class _WarmEntry:
+    room: "Room"
+    nbytes: int
+    parked_at: float
+
+
+@dataclass
+class WarmRoomStats:
+    hits: int = 0
+    misses: int = 0
+    parked: int = 0
+    evicted_size: int = 0
+    evicted_idle: int = 0
+    rejected_size: int = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "parked": self.parked,
+            "evicted_size": self.evicted_size,
+            "evicted_idle": self.evicted_idle,
+            "rejected_size": self.rejected_size,
+        }
+
+
+@dataclass
+class WarmRoomCache:
+    """LRU of rooms whose last socket left, so a quick reconnect skips the DB load.
+
+    Only rooms that were fully saved on the way out are parked, so evicting one
+    never loses data.  A room keeps its undo history, resync buffer and cached
+    STATE_SYNC while parked.  Sizes are estimated from the serialized state.
+    """
+
+    max_bytes: int = WARM_ROOMS_MAX_BYTES
+    idle_seconds: float = WARM_ROOMS_IDLE_SECONDS
+    stats: WarmRoomStats = field(default_factory=WarmRoomStats)
+    _entries: "OrderedDict[str, _WarmEntry]" = field(default_factory=OrderedDict)
+    _bytes: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self._entries
+
+    def park(self, room_id: str, room: "Room", nbytes: int, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.discard(room_id)
+        nbytes = max(nbytes, 1)
+        if nbytes > self.max_bytes:
+            self.stats.rejected_size += 1
+            return False
+        self._entries[room_id] = _WarmEntry(room, nbytes, now)
+        self._bytes += nbytes
+        self.stats.parked += 1
+        self.trim(now)
+        return room_id in self._entries
+
+    def take(self, room_id: str, now: Optional[float] = None) -> Optional["Room"]:
+        self.trim(now)
+        entry = self._entries.pop(room_id, None)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+        self._bytes -= entry.nbytes
+        self.stats.hits += 1
+        return entry.room
+
+    def discard(self, room_id: str) -> bool:
+        entry = self._entries.pop(room_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.nbytes
+        return True
+
+    def trim(self, now: Optional[float] = None) -> None:
+        """Drop idle rooms, then least recently parked ones until under budget."""
+        now = time.monotonic() if now is None else now
+        while self._entries:
+            room_id, entry = next(iter(self._entries.items()))
+            if now - entry.parked_at >= self.idle_seconds:
+                self.stats.evicted_idle += 1
+            elif self._bytes > self.max_bytes:
+                self.stats.evicted_size += 1
+            else:
+                break
+            self.discard(room_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        self.trim()
+        return {
+            **self.stats.snapshot(),
+            "rooms": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "idle_seconds": self.idle_seconds,
+        }
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Callable, Dict, Optional, Union
+
+from pydantic import BaseModel
+
+from .models import POINTS_PACK_CONTEXT, POINTS_REF, WireEvent, dump_json
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - optional speedup, stdlib json is the fallback
+    orjson = None
+
+# Websocket subprotocol for binary frames whose point lists are packed float64 arrays.
+# Frame: uint32 LE header length, the JSON envelope (space padded so the data
+# is 8-byte aligned) with each point list replaced by {"@pts": [start, count]},
+# then little-endian float64 x, y pairs.  Both ends still accept JSON text.
+PACKED_SUBPROTOCOL = "warboard.packed.v1"
+
+# Drag-rate events.  Their payload is a plain dict that the handlers check
+# field by field anyway, so building the model skips pydantic validation.
+FAST_DECODE_EVENT_TYPES = frozenset({"TOKEN_MOVE", "TOKENS_MOVE", "SHAPE_UPDATE", "ASSET_INSTANCE_UPDATE"})
+
+
+def _loads(raw: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def model_event(event_type: str, model: BaseModel, **extra: Any) -> WireEvent:
+    """Server event whose payload is ``model``'s fields plus ``extra``.
+
+    ``payload`` is still the plain dict handlers and tests read, but the wire
+    encoding takes the model's own JSON rather than re-serializing that dict
+    value by value.  The payload must not be modified afterwards.
+    """
+    payload = model.model_dump()
+    payload.update(extra)
+    event = WireEvent.model_construct(type=event_type, payload=payload)
+    body = dump_json(model)
+    coords = array("d")
+    packed_body = body
+    if '"x":' in body:
+        packed_body = model.model_dump_json(context={POINTS_PACK_CONTEXT: coords})
+    event._payload_json = _with_extra(body, extra)
+    event._packed_payload = (_with_extra(packed_body, extra), coords)
+    return event
+
+
+def _with_extra(body: str, extra: Dict[str, Any]) -> str:
+    return f"{body[:-1]},{_dumps(extra)[1:]}" if extra else body
+
+
+def _envelope(event: WireEvent, body: str) -> str:
+    return (
+        f'{{"type":{_dumps(event.type)},"payload":{body},"client_id":{_dumps(event.client_id)},'
+        f'"ts":{_dumps(event.ts)},"version":{_dumps(event.version)}}}'
+    )
+
+
+def encode_event(event: WireEvent) -> str:
+    """JSON for ``event``, encoded on first use and reused by every later send.
+
+    An event must not be modified once it has been sent: broadcasts, session
+    fan-out, batches and resync replays all share this one encoding.
+    """
+    text = event._encoded
+    if text is None:
+        body = event._payload_json
+        text = event.model_dump_json() if body is None else _envelope(event, body)
+        event._encoded = text
+    return text
+
+
+def pack_event(event: WireEvent) -> Union[bytes, None, bool]:
+    """Packed frame for an event built by ``model_event``, or False if it can only be packed from its text."""
+    packed = event._packed_payload
+    if packed is None:
+        return False
+    body, coords = packed
+    return _frame(_envelope(event, body), coords)
+
+
+def decode_wire_event(raw: Union[str, bytes]) -> WireEvent:
+    """Parse one client frame into a ``WireEvent``.
+
+    Hot drag events with well-formed envelopes take a constructed fast path;
+    everything else (and anything unusual about a hot event) goes through full
+    validation, so malformed frames still raise ``ValidationError``.
+    """
+    try:
+        data = _loads(raw)
+    except ValueError:
+        return WireEvent.model_validate_json(raw)
+    return _event_from_data(data)
+
+
+def decode_packed_event(raw: bytes) -> WireEvent:
+    """Parse one binary frame of the packed subprotocol into a ``WireEvent``."""
+    return _event_from_data(unpack_frame(raw))
+
+
+def _event_from_data(data: Any) -> WireEvent:
+    if isinstance(data, dict):
+        event_type = data.get("type")
+        payload = data.get("payload", {})
+        client_id = data.get("client_id")
+        ts = data.get("ts")
+        if (
+            event_type in FAST_DECODE_EVENT_TYPES
+            and isinstance(payload, dict)
+            and (client_id is None or isinstance(client_id, str))
+            and (ts is None or (isinstance(ts, (int, float)) and not isinstance(ts, bool)))
+        ):
+            return WireEvent.model_construct(
+                type=event_type,
+                payload=payload,
+                client_id=client_id,
+                ts=None if ts is None else float(ts),
+            )
+    return WireEvent.model_validate(data)
+
+
+def _is_point(item: Any) -> bool:
+    if type(item) is not dict or len(item) != 2:
+        return False
+    x, y = item.get("x"), item.get("y")
+    return type(x) in (float, int) and type(y) in (float, int)
+
+
+def _pack_value(value: Any, coords: "array[float]") -> Any:
+    if isinstance(value, dict):
+        return {key: _pack_value(item, coords) for key, item in value.items()}
+    if isinstance(value, list):
+        if value and all(_is_point(item) for item in value):
+            start = len(coords) // 2
+            for point in value:
+                coords.append(point["x"])
+                coords.append(point["y"])
+            return {POINTS_REF: [start, len(value)]}
+        return [_pack_value(item, coords) for item in value]
+    return value
+
+
+def pack_frame(text: str) -> Optional[bytes]:
+    """Packed binary form of an encoded JSON frame, or None if it has no point lists.
+
+    This parses ``text`` again; frames built from models use ``pack_model``
+    or ``pack_event``, which read the point buffers directly.
+    """
+    if '"x":' not in text:
+        return None
+    coords = array("d")
+    return _frame(_dumps(_pack_value(_loads(text), coords)), coords)
+
+
+def pack_model(model: BaseModel, envelope: Callable[[str], str], **kwargs: Any) -> Optional[bytes]:
+    """Packed frame for ``envelope(model JSON)``; point lists are copied straight from their buffers."""
+    coords = array("d")
+    body = model.model_dump_json(context={POINTS_PACK_CONTEXT: coords}, **kwargs)
+    return _frame(envelope(body), coords)
+
+
+def _frame(header_json: str, coords: "array[float]") -> Optional[bytes]:
+    if not coords:
+        return None
+    header = header_json.encode()
+    header += b" " * (-(4 + len(header)) % 8)
+    if sys.byteorder != "little":
+        coords = array("d", coords)
+        coords.byteswap()
+    return struct.pack("<I", len(header)) + header + coords.tobytes()
+
+
+def unpack_frame(raw: bytes) -> Any:
+    """Decode a packed binary frame back to the plain JSON value it stands for."""
+    if len(raw) < 4:
+        raise ValueError("Truncated frame")
+    (header_len,) = struct.unpack_from("<I", raw)
+    data_start = 4 + header_len
+    if data_start > len(raw) or (len(raw) - data_start) % 8:
+        raise ValueError("Malformed frame")
+    coords = array("d")
+    coords.frombytes(raw[data_start:])
+    if sys.byteorder != "little":
+        coords.byteswap()
+
+    def unref(obj: Dict[str, Any]) -> Any:
+        ref = obj.get(POINTS_REF) if len(obj) == 1 else None
+        if not (isinstance(ref, list) and len(ref) == 2 and all(type(v) is int for v in ref)):
+            return obj
+        start, count = ref
+        if start < 0 or count < 0 or 2 * (start + count) > len(coords):
+            raise ValueError("Point list out of range")
+        return [{"x": coords[i], "y": coords[i + 1]} for i in range(2 * start, 2 * (start + count), 2)]
+
+    return json.loads(raw[4:data_start], object_hook=unref)
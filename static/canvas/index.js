@@ -2005,6 +2005,7 @@
       interiors: s.layer_visibility?.interiors ?? true,
     };
     state.version = s.version || 0;
+    localEditsSinceSync = false;
 
     state.tokens.clear();
     for (const [id, t] of Object.entries(s.tokens || {})) {
@@ -2077,6 +2078,71 @@
     requestRender();
   }
 
+  // Targeted counterpart of applyStateSync used for server UNDO/REDO results.
+  function applyStatePatch(p) {
+    const upserts = p.upserts || {};
+    const deletes = p.deletes || {};
+    for (const [id, t] of Object.entries(upserts.tokens || {})) {
+      const normalized = normalizePackBackedRecord(t);
+      state.tokens.set(id, { ...normalized, badges: normalizedBadgeList(normalized?.badges) });
+    }
+    for (const [id, st] of Object.entries(upserts.strokes || {})) state.strokes.set(id, normalizeStrokeRecord(st));
+    for (const [id, sh] of Object.entries(upserts.shapes || {})) state.shapes.set(id, normalizeShapeRecord(sh));
+    for (const [id, a] of Object.entries(upserts.assets || {})) state.assets.set(id, normalizePackBackedRecord(a));
+    for (const [id, room] of Object.entries(upserts.interiors || {})) state.interiors.set(id, normalizeInteriorRecord(room));
+    for (const id of deletes.interior_edges || []) state.interior_edges.delete(id);
+    for (const [id, edge] of Object.entries(upserts.interior_edges || {})) applyInteriorEdgeOverrideToState({ id, ...edge });
+    for (const [id, cut] of Object.entries(upserts.interior_wall_cuts || {})) state.interior_wall_cuts.set(id, normalizeInteriorWallCutRecord({ id, ...cut }));
+    for (const [id, raw] of Object.entries(upserts.geometry || {})) {
+      const obj = normalizeAndValidateGeometry({ id, ...raw });
+      if (obj) state.geometry.set(id, obj);
+    }
+    for (const [seamKey, raw] of Object.entries(upserts.geometry_seams || {})) {
+      const seam = normalizeGeometrySeamOverride({ id: seamKey, ...raw });
+      if (seam) state.geometry_seams.set(seam.seamKey, seam);
+    }
+    for (const id of deletes.tokens || []) state.tokens.delete(id);
+    for (const id of deletes.strokes || []) state.strokes.delete(id);
+    for (const id of deletes.shapes || []) state.shapes.delete(id);
+    for (const id of deletes.assets || []) state.assets.delete(id);
+    for (const id of deletes.interiors || []) state.interiors.delete(id);
+    for (const id of deletes.interior_wall_cuts || []) state.interior_wall_cuts.delete(id);
+    for (const id of deletes.geometry || []) state.geometry.delete(id);
+    for (const seamKey of deletes.geometry_seams || []) state.geometry_seams.delete(seamKey);
+    for (const [kind, ids] of Object.entries(p.draw_order || {})) {
+      const store = state[kind];
+      if (!Array.isArray(ids) || !store || !(kind in state.draw_order)) continue;
+      state.draw_order[kind] = ids.filter((id) => store.has(id));
+    }
+
+    const s = p.settings;
+    if (s) {
+      state.allow_players_move = !!s.allow_players_move;
+      state.allow_all_move = !!s.allow_all_move;
+      state.lockdown = !!s.lockdown;
+      state.world_tone = clamp(Number(s.world_tone ?? state.world_tone ?? 0.32), 0, 1);
+      applyBackgroundState(s.background_mode, s.background_url, s.terrain_seed, s.terrain_style);
+      if (s.layer_visibility) state.layer_visibility = { ...state.layer_visibility, ...s.layer_visibility };
+    }
+    if (typeof p.version === "number") state.version = p.version;
+
+    if (selectedTokenId && !state.tokens.has(selectedTokenId)) selectedTokenId = null;
+    if (selectedShapeId && !state.shapes.has(selectedShapeId)) selectedShapeId = null;
+    if (selectedAssetId && !state.assets.has(selectedAssetId)) selectedAssetId = null;
+    if (selectedInteriorId && !state.interiors.has(selectedInteriorId)) selectedInteriorId = null;
+    if (selectedGeometryId && !state.geometry.has(selectedGeometryId)) selectedGeometryId = null;
+    setSelection(selectedIdsArray(), selectedTokenId);
+    if (hoveredTokenId && !state.tokens.has(hoveredTokenId)) hoveredTokenId = null;
+    if (hoveredInteriorId && !state.interiors.has(hoveredInteriorId)) hoveredInteriorId = null;
+    markAssetOrderDirty();
+    markInteriorsDirty();
+    markGeometryDerivedDirty();
+    refreshGmUI();
+    pruneUnusedPackBlobUrls();
+    updateCanvasCursor();
+    requestRender();
+  }
+
   // toPlainObjectMap → static/canvas/utils.js
 
   function currentStateSnapshot() {
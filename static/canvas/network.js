@@ -6,12 +6,21 @@
 
 function send(type, payload = {}) {
   if (online && ws && ws.readyState === 1) {
-    ws.send(JSON.stringify({ type, payload }));
+    const packed = ws.protocol === WIRE_PACKED_SUBPROTOCOL ? packWireFrame({ type, payload }) : null;
+    ws.send(packed || JSON.stringify({ type, payload }));
     return;
   }
+  localEditsSinceSync = true;
   applyLocalEvent(type, payload);
 }
 
+// True when the board still mirrors server version state.version of this room,
+// so a reconnect can ask for just the missed events instead of a full STATE_SYNC.
+// Versions only count within the room epoch HELLO reported (it changes on every server load).
+function canResumeRoom(roomId) {
+  return !!roomId && state.room_id === roomId && !localEditsSinceSync && Number.isInteger(state.version) && !!state.epoch;
+}
+
 function connectWS(force = false, options = {}) {
   const waitForSync = !!options.waitForSync;
   const clearView = options.clearView !== false;
@@ -30,16 +39,20 @@ function connectWS(force = false, options = {}) {
     try { ws.close(); } catch {}
   }
 
-  if (clearView) clearLocalRoomView();
+  const resume = !options.clearView && canResumeRoom(targetRoomId);
+  if (clearView && !resume) clearLocalRoomView();
   const room = encodeURIComponent(roomEl.value.trim());
   const cid = encodeURIComponent(cidEl.value.trim());
   const proto = (location.protocol === "https:") ? "wss" : "ws";
-  const url = `${proto}://${location.host}/ws/${room}?client_id=${cid}`;
+  const since = resume ? `&since=${state.version}&epoch=${encodeURIComponent(state.epoch)}` : "";
+  const url = `${proto}://${location.host}/ws/${room}?client_id=${cid}${since}`;
 
   const readyPromise = waitForSync ? beginWsReadyWait(targetRoomId) : null;
   setSessionConnecting(true);
 
-  const thisWs = new WebSocket(url);
+  // Offer packed binary frames for point lists only when opted in; a server that doesn't pick it keeps JSON.
+  const thisWs = wirePackedEnabled() ? new WebSocket(url, [WIRE_PACKED_SUBPROTOCOL]) : new WebSocket(url);
+  thisWs.binaryType = "arraybuffer";
   const thisSeq = ++wsConnectSeq;
   ws = thisWs;
   thisWs.onopen = () => {
@@ -95,14 +108,24 @@ function connectWS(force = false, options = {}) {
     if (ws !== thisWs || thisSeq !== wsConnectSeq) return;
     let ev = null;
     try {
-      ev = JSON.parse(msg.data);
+      ev = typeof msg.data === "string" ? JSON.parse(msg.data) : unpackWireFrame(msg.data);
     } catch (e) {
       console.error("WS parse failed", e, msg?.data);
       return;
     }
+    if (ev?.type === "EVENT_BATCH" && Array.isArray(ev.payload?.events)) {
+      // Drag updates coalesced by the server's broadcast tick, oldest first.
+      for (const inner of ev.payload.events) handleWsEvent(inner);
+      return;
+    }
+    handleWsEvent(ev);
+  };
+
+  function handleWsEvent(ev) {
     try {
     if (STATE_CHANGE_EVENTS.has(ev.type)) markInboundChange();
     if (WATCHDOG_MUTATION_EVENTS.has(ev.type)) seenInboundMutationSinceConnect = true;
+    if (typeof ev.version === "number") state.version = ev.version;
 
     if (ev.type === "STATE_SYNC") {
       hideResyncBadge();
@@ -121,7 +144,25 @@ function connectWS(force = false, options = {}) {
       return;
     }
 
+    if (ev.type === "STATE_RESYNC") {
+      // Missed events were replayed just before this marker; the board is current again.
+      hideResyncBadge();
+      if (typeof ev.payload?.version === "number") state.version = ev.payload.version;
+      setSessionConnecting(false);
+      resolveWsReady(roomEl.value.trim());
+      log(`STATE_RESYNC v${ev.payload?.from_version} -> v${state.version} (${ev.payload?.events || 0} events)`);
+      updateSessionPill();
+      refreshSessionModalAuth();
+      return;
+    }
+
+    if (ev.type === "STATE_PATCH") {
+      applyStatePatch(ev.payload || {});
+      return;
+    }
+
     if (ev.type === "HELLO") {
+      if (typeof ev.payload?.epoch === "string") state.epoch = ev.payload.epoch;
       if (typeof ev.payload?.room_name === "string") {
         state.room_name = ev.payload.room_name;
       }
@@ -756,7 +797,7 @@ function connectWS(force = false, options = {}) {
     } catch (e) {
       console.error("WS dispatch failed", ev, e);
     }
-  };
+  }
 
   if (!waitForSync) refreshSnapshotsPanel();
   return readyPromise;
@@ -314,7 +314,8 @@ function ensureStaleWatchdog() {
       lastResyncRequestTs = Date.now();
       try {
         showResyncBadge();
-        ws.send(JSON.stringify({ type: "REQ_STATE_SYNC", payload: {} }));
+        const payload = canResumeRoom(state.room_id) ? { since_version: state.version, epoch: state.epoch } : {};
+        ws.send(JSON.stringify({ type: "REQ_STATE_SYNC", payload }));
         log("No recent updates detected; requested state sync.");
       } catch (e) {
         hideResyncBadge();
@@ -457,6 +458,7 @@ function clearLocalRoomView() {
   prepareForRoomTransition();
   state.room_id = null;
   state.room_name = null;
+  state.epoch = null;
   state.background_mode = "solid";
   state.background_url = null;
   state.terrain_seed = 1;
@@ -25,6 +25,8 @@ let lastInboundChangeTs = Date.now();
 let lastResyncRequestTs = 0;
 let resyncBadgeTimer = null;
 let seenInboundMutationSinceConnect = false;
+// Set when the board is edited while offline; such a board cannot resume from its version.
+let localEditsSinceSync = false;
 let sessionConnecting = false;
 let wsReadyPromise = null;
 let wsReadyResolver = null;
@@ -33,6 +35,8 @@ let wsReadyRoomId = "";
 const players = new Set();
 const STATE_CHANGE_EVENTS = new Set([
   "STATE_SYNC",
+  "STATE_PATCH",
+  "STATE_RESYNC",
   "ROOM_SETTINGS",
   "TOKEN_CREATE",
   "TOKEN_MOVE",
@@ -66,6 +70,7 @@ const STATE_CHANGE_EVENTS = new Set([
   "GEOMETRY_SEAM_SET",
 ]);
 const WATCHDOG_MUTATION_EVENTS = new Set([
+  "STATE_PATCH",
   "ROOM_SETTINGS",
   "TOKEN_CREATE",
   "TOKEN_MOVE",
@@ -115,6 +120,8 @@ const state = {
   layer_visibility: { grid: true, drawings: true, shapes: true, assets: true, tokens: true, interiors: true },
   draw_order: { strokes: [], shapes: [], assets: [], interiors: [] },
   version: 0,
+  // Server room epoch from HELLO; a resume is only valid within the same epoch.
+  epoch: null,
   tokens: new Map(),
   strokes: new Map(),
   shapes: new Map(),
@@ -0,0 +1,80 @@
+// wireCodec.js — packed binary websocket frames (server/wire.py PACKED_SUBPROTOCOL)
+// Loaded before network.js; all functions are globals in the same script scope.
+//
+// Frame: uint32 LE header length, the JSON envelope (space padded so the data
+// is 8-byte aligned) with each point list replaced by {"@pts": [start, count]},
+// then little-endian float64 x, y pairs.  Frames without point lists stay JSON text.
+
+"use strict";
+
+const WIRE_PACKED_SUBPROTOCOL = "warboard.packed.v1";
+const WIRE_POINTS_REF = "@pts";
+// Packed frames are opt-in: set this localStorage key to "1" to offer the subprotocol.
+const WIRE_PACKED_OPT_IN_KEY = "warhamster:v1:packed_wire";
+
+function wirePackedEnabled() {
+  try {
+    return localStorage.getItem(WIRE_PACKED_OPT_IN_KEY) === "1";
+  } catch (_) {
+    return false;
+  }
+}
+
+function isWirePoint(p) {
+  if (!p || typeof p !== "object" || Array.isArray(p)) return false;
+  const keys = Object.keys(p);
+  return keys.length === 2 && Number.isFinite(p.x) && Number.isFinite(p.y);
+}
+
+// Returns an ArrayBuffer, or null when the message has no point lists to pack.
+function packWireFrame(msg) {
+  const coords = [];
+  const walk = (value) => {
+    if (Array.isArray(value)) {
+      if (value.length && value.every(isWirePoint)) {
+        const start = coords.length / 2;
+        for (const p of value) coords.push(p.x, p.y);
+        return { [WIRE_POINTS_REF]: [start, value.length] };
+      }
+      return value.map(walk);
+    }
+    if (value && typeof value === "object") {
+      const out = {};
+      for (const [key, item] of Object.entries(value)) out[key] = walk(item);
+      return out;
+    }
+    return value;
+  };
+  const header = walk(msg);
+  if (!coords.length) return null;
+  const headerBytes = new TextEncoder().encode(JSON.stringify(header));
+  const pad = (8 - ((4 + headerBytes.length) % 8)) % 8;
+  const dataStart = 4 + headerBytes.length + pad;
+  const buf = new ArrayBuffer(dataStart + coords.length * 8);
+  new DataView(buf).setUint32(0, headerBytes.length + pad, true);
+  const bytes = new Uint8Array(buf);
+  bytes.set(headerBytes, 4);
+  bytes.fill(32, 4 + headerBytes.length, dataStart);
+  const view = new DataView(buf, dataStart);
+  coords.forEach((v, i) => view.setFloat64(i * 8, v, true));
+  return buf;
+}
+
+function unpackWireFrame(buf) {
+  const headerLen = new DataView(buf).getUint32(0, true);
+  const dataStart = 4 + headerLen;
+  const header = new TextDecoder().decode(new Uint8Array(buf, 4, headerLen));
+  const view = new DataView(buf, dataStart);
+  return JSON.parse(header, (key, value) => {
+    if (!value || typeof value !== "object" || Array.isArray(value)) return value;
+    const ref = value[WIRE_POINTS_REF];
+    if (!Array.isArray(ref) || ref.length !== 2 || Object.keys(value).length !== 1) return value;
+    const [start, count] = ref;
+    const points = new Array(count);
+    for (let i = 0; i < count; i++) {
+      const offset = (start + i) * 16;
+      points[i] = { x: view.getFloat64(offset, true), y: view.getFloat64(offset + 8, true) };
+    }
+    return points;
+  });
+}
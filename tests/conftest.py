@@ -44,6 +44,23 @@ def fresh_db(monkeypatch):
     yield mem_engine
 
 
+@pytest.fixture
+def file_db(fresh_db, tmp_path, monkeypatch):
+    """
+    Swap fresh_db's engine for a pooled, file-backed one.  For tests where
+    several threads (the SQLite writer thread, asyncio.to_thread calls) use
+    the DB at once: they all share the single in-memory connection, so one
+    thread's rollback would end another's transaction.
+    """
+    from server.storage_db import make_engine
+
+    file_engine = make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(storage, "engine", file_engine)
+    SQLModel.metadata.create_all(file_engine)
+    yield file_engine
+    file_engine.dispose()
+
+
 # ---------------------------------------------------------------------------
 # FastAPI app + HTTP client helpers
 # ---------------------------------------------------------------------------
@@ -6,6 +6,7 @@ WebSocket tests use Starlette's synchronous TestClient.
 """
 from __future__ import annotations
 
+import asyncio
 import io
 import json
 import uuid
@@ -209,6 +210,71 @@ class TestAuth:
         assert r.status_code == 200
         assert r.json().get("username") == "gm_user"
 
+    async def test_request_resolves_session_once(self, auth_client, monkeypatch):
+        from server import app as app_module
+        calls = []
+        real_lookup = app_module.get_user_by_sid
+
+        def counting_lookup(sid):
+            calls.append(sid)
+            return real_lookup(sid)
+
+        monkeypatch.setattr(app_module, "get_user_by_sid", counting_lookup)
+        r = await auth_client.get("/api/me")
+        assert r.status_code == 200
+        assert len(calls) == 1
+
+    async def test_password_hashing_runs_off_the_event_loop(self):
+        import threading
+        from server.auth_helpers import PasswordHasher
+
+        class RecordingContext:
+            threads = []
+
+            def hash(self, password):
+                self.threads.append(threading.current_thread().name)
+                return "hashed:" + password
+
+            def verify_and_update(self, password, stored_hash):
+                self.threads.append(threading.current_thread().name)
+                return stored_hash == "hashed:" + password, None
+
+        hasher = PasswordHasher(RecordingContext())
+        stored = await hasher.hash("secret-password")
+        assert await hasher.verify_and_update("secret-password", stored) == (True, None)
+        assert await hasher.verify_and_update("wrong-password", stored) == (False, None)
+        assert all(name.startswith("password-hash") for name in RecordingContext.threads)
+        assert hasher.snapshot()["calls"] == 3
+
+    async def test_password_hashing_refuses_when_saturated(self):
+        import asyncio
+        import threading
+        from fastapi import HTTPException
+        from server.auth_helpers import PasswordHasher
+        release = threading.Event()
+
+        class BlockingContext:
+            def hash(self, password):
+                release.wait(5)
+                return password
+
+        hasher = PasswordHasher(BlockingContext(), max_workers=1, max_pending=2)
+        running = [asyncio.ensure_future(hasher.hash(f"pw{i}")) for i in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc:
+            await hasher.hash("one-too-many")
+        assert exc.value.status_code == 503
+        release.set()
+        assert await asyncio.gather(*running) == ["pw0", "pw1"]
+        assert hasher.snapshot()["rejected"] == 1
+
+    async def test_logout_stops_cached_session(self, auth_client):
+        assert (await auth_client.get("/api/me")).status_code == 200
+        sid = auth_client.cookies.get("warhamster_sid")
+        await auth_client.post("/api/auth/logout")
+        auth_client.cookies.set("warhamster_sid", sid)
+        assert (await auth_client.get("/api/me")).status_code == 401
+
 
 # ---------------------------------------------------------------------------
 # Room CRUD
@@ -536,6 +602,7 @@ class TestAssetUpload:
 # WebSocket — basic connection tests (synchronous Starlette TestClient)
 # ---------------------------------------------------------------------------
 
+@pytest.mark.usefixtures("file_db")
 class TestWebSocket:
     def _make_app(self):
         from server.app import app
@@ -675,6 +742,149 @@ class TestWebSocket:
                 assert hello is not None
                 assert hello["payload"]["is_gm"] is True
 
+    def test_ws_req_state_sync_with_version_replays_missed_events(self):
+        u, sid = _seed_user_and_session("ws_resync")
+        room_id = _seed_room(u.user_id, room_id="resync-room", join_code="WHAM-RESYN1")
+
+        app = self._make_app()
+        with TestClient(app) as client:
+            with client.websocket_connect(f"/ws/{room_id}", cookies={"warhamster_sid": sid}) as ws:
+                messages = [json.loads(ws.receive_text()) for _ in range(3)]
+                sync = next(m for m in messages if m["type"] == "STATE_SYNC")
+                since = sync["payload"]["version"]
+                epoch = next(m for m in messages if m["type"] == "HELLO")["payload"]["epoch"]
+
+                ws.send_text(json.dumps({"type": "TOKEN_CREATE", "payload": {"id": "t1", "x": 1, "y": 2}}))
+                created = json.loads(ws.receive_text())
+                assert created["type"] == "TOKEN_CREATE"
+                assert created["version"] == since + 1
+
+                ws.send_text(json.dumps({"type": "REQ_STATE_SYNC", "payload": {"since_version": since, "epoch": epoch}}))
+                replayed = json.loads(ws.receive_text())
+                done = json.loads(ws.receive_text())
+                assert replayed == created
+                assert done["type"] == "STATE_RESYNC"
+                assert done["payload"] == {"from_version": since, "version": since + 1, "events": 1}
+
+                # A version from another epoch (e.g. before a restart) gets a full sync instead.
+                ws.send_text(json.dumps({"type": "REQ_STATE_SYNC", "payload": {"since_version": since + 1, "epoch": "old"}}))
+                assert json.loads(ws.receive_text())["type"] == "STATE_SYNC"
+
+    def test_ws_packed_subprotocol_sends_point_lists_as_binary(self):
+        from server.wire import PACKED_SUBPROTOCOL, pack_frame, unpack_frame
+        u, sid = _seed_user_and_session("ws_packed")
+        room_id = _seed_room(u.user_id, room_id="packed-room", join_code="WHAM-PACKD1")
+        points = [{"x": float(i), "y": i / 3} for i in range(50)]
+        frame = pack_frame(json.dumps({"type": "STROKE_ADD", "payload": {"id": "s1", "points": points}}))
+
+        app = self._make_app()
+        with TestClient(app) as client:
+            with client.websocket_connect(
+                f"/ws/{room_id}", cookies={"warhamster_sid": sid}, subprotocols=[PACKED_SUBPROTOCOL]
+            ) as ws:
+                assert ws.accepted_subprotocol == PACKED_SUBPROTOCOL
+                for _ in range(3):
+                    ws.receive_text()
+                ws.send_bytes(frame)
+                added = unpack_frame(ws.receive_bytes())
+                assert added["type"] == "STROKE_ADD"
+                assert added["payload"]["points"] == points
+
+                # Frames without point lists, in either direction, stay JSON text.
+                ws.send_text(json.dumps({"type": "TOKEN_CREATE", "payload": {"id": "t1", "x": 1, "y": 2}}))
+                assert json.loads(ws.receive_text())["type"] == "TOKEN_CREATE"
+
+            with client.websocket_connect(f"/ws/{room_id}", cookies={"warhamster_sid": sid}) as ws:
+                assert ws.accepted_subprotocol is None
+                sync = json.loads(ws.receive_text())
+                assert sync["payload"]["strokes"]["s1"]["points"] == points
+
+    def test_ws_events_reuse_cached_access_check(self, monkeypatch):
+        from server import app as app_module
+        u, sid = _seed_user_and_session("ws_access_cache")
+        room_id = _seed_room(u.user_id, room_id="access-cache-room", join_code="WHAM-ACCES1")
+        checks = []
+        real_check = app_module._room_access_still_valid
+
+        def counting_check(user_id, room_id):
+            try:
+                asyncio.get_running_loop()
+                on_loop = True
+            except RuntimeError:
+                on_loop = False
+            checks.append((room_id, on_loop))
+            return real_check(user_id, room_id)
+
+        monkeypatch.setattr(app_module, "_room_access_still_valid", counting_check)
+        app = self._make_app()
+        with TestClient(app) as client:
+            with client.websocket_connect(f"/ws/{room_id}", cookies={"warhamster_sid": sid}) as ws:
+                for _ in range(3):
+                    ws.receive_text()
+                for i in range(5):
+                    ws.send_text(json.dumps({"type": "TOKEN_CREATE", "payload": {"id": f"t{i}", "x": i, "y": i}}))
+                    assert json.loads(ws.receive_text())["type"] == "TOKEN_CREATE"
+            # The first user is the site owner, so it can read the cache counters.
+            hits = client.get("/api/admin/rooms/autosave", cookies={"warhamster_sid": sid}).json()["access_cache"]["hits"]
+        # One DB check, at connect and off the event loop.
+        assert checks == [(room_id, False)]
+        assert hits >= 5
+
+    def test_ws_revoked_session_is_disconnected_despite_sibling_heartbeats(self):
+        from starlette.websockets import WebSocketDisconnect
+        u, kept_sid = _seed_user_and_session("ws_revoke_sid")
+        revoked_sid = create_session(u.user_id)
+        room_id = _seed_room(u.user_id, room_id="revoke-sid-room", join_code="WHAM-RVSID1")
+
+        app = self._make_app()
+        with TestClient(app) as client:
+            with client.websocket_connect(f"/ws/{room_id}", cookies={"warhamster_sid": kept_sid}) as kept_ws, \
+                 client.websocket_connect(f"/ws/{room_id}", cookies={"warhamster_sid": revoked_sid}) as revoked_ws:
+                _drain_bootstrap(revoked_ws)
+                _drain_bootstrap(kept_ws)
+                r = client.post(f"/api/account/sessions/{revoked_sid}/revoke", cookies={"warhamster_sid": kept_sid})
+                assert r.status_code == 200
+                # The other session's heartbeat refreshes only its own grant.
+                kept_ws.send_text(json.dumps({"type": "HEARTBEAT", "payload": {}}))
+                assert json.loads(kept_ws.receive_text())["type"] == "HEARTBEAT"
+                revoked_ws.send_text(json.dumps({"type": "TOKEN_CREATE", "payload": {"id": "t1", "x": 0, "y": 0}}))
+                with pytest.raises(WebSocketDisconnect):
+                    for _ in range(10):
+                        assert json.loads(revoked_ws.receive_text())["type"] != "TOKEN_CREATE"
+                kept_ws.send_text(json.dumps({"type": "TOKEN_CREATE", "payload": {"id": "t2", "x": 0, "y": 0}}))
+                # PRESENCE from the closed socket may come first.
+                for _ in range(3):
+                    if json.loads(kept_ws.receive_text())["type"] == "TOKEN_CREATE":
+                        break
+                else:
+                    raise AssertionError("kept session lost access")
+
+    def test_ws_removed_member_is_disconnected_on_next_event(self):
+        from starlette.websockets import WebSocketDisconnect
+        owner, owner_sid = _seed_user_and_session("ws_revoke_owner")
+        player, player_sid = _seed_user_and_session("ws_revoke_player")
+        room_id = _seed_room(owner.user_id, room_id="revoke-room", join_code="WHAM-REVOK1")
+        add_membership(player.user_id, room_id, role="player")
+
+        app = self._make_app()
+        with TestClient(app) as client:
+            with client.websocket_connect(f"/ws/{room_id}", cookies={"warhamster_sid": player_sid}) as ws:
+                for _ in range(3):
+                    ws.receive_text()
+                ws.send_text(json.dumps({"type": "TOKEN_CREATE", "payload": {"id": "t1", "x": 0, "y": 0}}))
+                assert json.loads(ws.receive_text())["type"] == "TOKEN_CREATE"
+
+                r = client.post(
+                    f"/api/rooms/{room_id}/members/{player.user_id}/remove",
+                    json={},
+                    cookies={"warhamster_sid": owner_sid},
+                )
+                assert r.status_code == 200
+                ws.send_text(json.dumps({"type": "TOKEN_CREATE", "payload": {"id": "t2", "x": 0, "y": 0}}))
+                with pytest.raises(WebSocketDisconnect):
+                    for _ in range(10):
+                        assert json.loads(ws.receive_text())["type"] != "TOKEN_CREATE"
+
 
 # ---------------------------------------------------------------------------
 # Session hierarchy — HTTP integration tests
@@ -944,6 +1154,7 @@ def _drain_bootstrap(ws) -> None:
     raise AssertionError("HEARTBEAT echo never arrived — bootstrap drain failed")
 
 
+@pytest.mark.usefixtures("file_db")
 class TestWebSocketHardening:
     """Regression coverage for normalized bootstrap and session move fanout."""
 
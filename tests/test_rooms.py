@@ -9,7 +9,7 @@ from __future__ import annotations
 
 import pytest
 
-from server.models import AssetInstance, FogStroke, RoomState, Shape, Stroke, Token, WireEvent, Point
+from server.models import AssetInstance, FogStroke, PointArray, RoomState, Shape, Stroke, Token, WireEvent, Point
 from server.rooms import (
     MAX_FOG_STROKE_POINTS,
     MAX_FOG_STROKES,
@@ -352,6 +352,78 @@ class TestStrokeAdd:
         assert "s1" in room.state.draw_order["strokes"]
 
 
+# ---------------------------------------------------------------------------
+# Draw order
+# ---------------------------------------------------------------------------
+
+class TestDrawOrder:
+    def test_draw_order_serializes_as_id_lists(self):
+        state = RoomState.model_validate_json('{"room_id": "r", "draw_order": {"strokes": ["a", "b", "a"]}}')
+        assert state.draw_order["strokes"] == ["a", "b"]
+        assert RoomState.model_validate_json(state.model_dump_json()).model_dump()["draw_order"]["strokes"] == ["a", "b"]
+
+    def test_normalize_order_repairs_loaded_state(self, rm):
+        state = RoomState.model_validate_json('{"room_id": "r", "draw_order": {"strokes": ["gone", "s2"]}}')
+        state.strokes["s1"] = Stroke(id="s1", points=[Point(x=0, y=0), Point(x=1, y=1)])
+        state.strokes["s2"] = Stroke(id="s2", points=[Point(x=0, y=0), Point(x=1, y=1)])
+        rm._normalize_order(state)
+        assert state.draw_order["strokes"] == ["s2", "s1"]
+        assert state.draw_order["interiors"] == []
+
+    async def test_interior_update_moves_to_top(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "INTERIOR_ADD", id="r1", x=0, y=0, w=10, h=10)
+        await apply(rm, room, room_id, "INTERIOR_ADD", id="r2", x=0, y=0, w=10, h=10)
+        await apply(rm, room, room_id, "INTERIOR_UPDATE", id="r1", x=5)
+        assert room.state.draw_order["interiors"] == ["r2", "r1"]
+
+
+# ---------------------------------------------------------------------------
+# Point storage
+# ---------------------------------------------------------------------------
+
+class TestPointArray:
+    def test_points_keep_their_json_shape(self):
+        raw = (
+            '{"room_id": "r", "strokes": {"s1": {"id": "s1", "points": [{"x": 1, "y": 2.5}, {"x": -3.0, "y": 4}]}},'
+            ' "fog_paint": {"strokes": {"f1": {"id": "f1", "points": [{"x": 0, "y": 0}, {"x": 5, "y": 5}]}}}}'
+        )
+        state = RoomState.model_validate_json(raw)
+        stroke = state.strokes["s1"]
+        assert isinstance(stroke.points, PointArray)
+        assert len(stroke.points) == 2
+        assert stroke.points[1].x == -3.0
+        assert list(stroke.points.pairs()) == [(1.0, 2.5), (-3.0, 4.0)]
+        dumped = state.model_dump()
+        assert dumped["strokes"]["s1"]["points"] == [{"x": 1.0, "y": 2.5}, {"x": -3.0, "y": 4.0}]
+        assert dumped["fog_paint"]["strokes"]["f1"]["points"] == [{"x": 0.0, "y": 0.0}, {"x": 5.0, "y": 5.0}]
+        assert RoomState.model_validate_json(state.model_dump_json()) == state
+
+    def test_dump_json_writes_points_from_the_buffer(self):
+        from server.models import dump_json
+        state = RoomState(room_id="r")
+        state.strokes["s1"] = Stroke(id="s1", points=[{"x": 1, "y": 2.5}, {"x": -3e-7, "y": 1e16}])
+        state.strokes["s2"] = Stroke(id="s2", points=[])
+        state.fog_paint.strokes["f1"] = FogStroke(id="f1", points=[{"x": float("nan"), "y": 4}])
+        assert dump_json(state) == state.model_dump_json()
+        # The text is kept: an unchanged stroke is not encoded again.
+        cached = state.strokes["s1"].points.to_json()
+        assert state.strokes["s1"].points.to_json() is cached
+
+    def test_invalid_points_are_rejected(self):
+        with pytest.raises(ValueError):
+            Stroke(id="s1", points=[{"x": 1}])
+        with pytest.raises(ValueError):
+            Stroke.model_validate_json('{"id": "s1", "points": [{"x": "a", "y": 1}]}')
+
+    async def test_terrain_stroke_add_round_trips_points(self, gm_room):
+        rm, room, room_id = gm_room
+        result = await apply(rm, room, room_id, "TERRAIN_STROKE_ADD",
+                             id="ts1", material_id="stone", points=make_points(3))
+        assert result.payload["points"] == make_points(3)
+        assert room.state.terrain_paint.strokes["ts1"].points == make_points(3)
+
+
 # ---------------------------------------------------------------------------
 # STROKE_DELETE
 # ---------------------------------------------------------------------------
@@ -410,6 +482,46 @@ class TestStrokeDelete:
         assert "sh1" not in room.state.shapes
         assert "t1" not in room.state.tokens
 
+    async def test_erase_only_hits_nearby_strokes(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "STROKE_ADD", id="near", points=[{"x": 0, "y": 0}, {"x": 4, "y": 4}])
+        await apply(rm, room, room_id, "STROKE_ADD", id="far", points=[{"x": 5000, "y": 5000}, {"x": 5004, "y": 5004}])
+        result = await apply(rm, room, room_id, "ERASE_AT", x=2, y=2, r=5)
+        assert result.payload["stroke_ids"] == ["near"]
+        assert "far" in room.state.strokes
+        assert "near" not in room.spatial.strokes
+
+    async def test_erase_reports_ids_in_insertion_order(self, gm_room):
+        rm, room, room_id = gm_room
+        for sid in ("s9", "s10", "s2"):
+            await apply(rm, room, room_id, "STROKE_ADD", id=sid, points=[{"x": 0, "y": 0}, {"x": 4, "y": 4}])
+        result = await apply(rm, room, room_id, "ERASE_AT", x=2, y=2, r=5)
+        assert result.payload["stroke_ids"] == ["s9", "s10", "s2"]
+
+    async def test_erase_uses_moved_token_position(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=3000, y=3000)
+        miss = await apply(rm, room, room_id, "ERASE_AT", x=0, y=0, r=10)
+        assert miss.payload["token_ids"] == []
+        hit = await apply(rm, room, room_id, "ERASE_AT", x=3000, y=3000, r=10)
+        assert hit.payload["token_ids"] == ["t1"]
+
+    async def test_erase_after_undo_sees_restored_stroke(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "STROKE_ADD", id="s1", points=[{"x": 0, "y": 0}, {"x": 4, "y": 4}])
+        await apply(rm, room, room_id, "ERASE_AT", x=0, y=0, r=5)
+        await apply(rm, room, room_id, "UNDO")
+        result = await apply(rm, room, room_id, "ERASE_AT", x=0, y=0, r=5)
+        assert result.payload["stroke_ids"] == ["s1"]
+
+    async def test_erase_with_huge_radius_falls_back_to_full_scan(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "STROKE_ADD", id="s1", points=[{"x": -90000, "y": 0}, {"x": -89990, "y": 0}])
+        await apply(rm, room, room_id, "STROKE_ADD", id="s2", points=[{"x": 90000, "y": 0}, {"x": 90010, "y": 0}])
+        result = await apply(rm, room, room_id, "ERASE_AT", x=0, y=0, r=100000)
+        assert sorted(result.payload["stroke_ids"]) == ["s1", "s2"]
+
 
 # ---------------------------------------------------------------------------
 # SHAPE_ADD — coordinate bounds
@@ -634,8 +746,9 @@ class TestUndoRedo:
         assert "t1" in room.state.tokens
 
         result = await apply(rm, room, room_id, "UNDO")
-        assert result.type == "STATE_SYNC"
+        assert result.type == "STATE_PATCH"
         assert "t1" not in room.state.tokens
+        assert result.payload["deletes"] == {"tokens": ["t1"]}
 
     async def test_redo_reapplies_undone_action(self, gm_room):
         rm, room, room_id = gm_room
@@ -644,8 +757,9 @@ class TestUndoRedo:
         assert "t1" not in room.state.tokens
 
         result = await apply(rm, room, room_id, "REDO")
-        assert result.type == "STATE_SYNC"
+        assert result.type == "STATE_PATCH"
         assert "t1" in room.state.tokens
+        assert result.payload["upserts"]["tokens"]["t1"]["id"] == "t1"
 
     async def test_undo_empty_history_returns_error(self, gm_room):
         rm, room, room_id = gm_room
@@ -671,6 +785,57 @@ class TestUndoRedo:
         result = await apply_as_player(rm, room, room_id, "UNDO")
         assert result.type == "ERROR"
 
+    async def test_undo_only_patches_touched_entities(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await apply(rm, room, room_id, "STROKE_ADD", id="s1", points=make_points(3))
+        await apply(rm, room, room_id, "TOKEN_RENAME", id="t1", name="Goblin")
+        result = await apply(rm, room, room_id, "UNDO")
+        assert result.payload["upserts"] == {"tokens": {"t1": room.state.tokens["t1"].model_dump()}}
+        assert result.payload["deletes"] == {}
+        assert room.state.tokens["t1"].name == "Token"
+        assert "s1" in room.state.strokes
+        assert result.payload["version"] == room.state.version
+
+    async def test_undo_erase_restores_draw_order_positions(self, gm_room):
+        rm, room, room_id = gm_room
+        for sid in ("s1", "s2", "s3"):
+            await apply(rm, room, room_id, "STROKE_ADD", id=sid, points=[{"x": 0, "y": 0}, {"x": 1, "y": 1}] if sid == "s2" else [{"x": 500, "y": 500}, {"x": 501, "y": 501}])
+        await apply(rm, room, room_id, "ERASE_AT", x=0, y=0, r=5)
+        assert room.state.draw_order["strokes"] == ["s1", "s3"]
+        result = await apply(rm, room, room_id, "UNDO")
+        assert room.state.draw_order["strokes"] == ["s1", "s2", "s3"]
+        assert result.payload["draw_order"] == {"strokes": ["s1", "s2", "s3"]}
+
+    async def test_undo_redo_room_settings(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "ROOM_SETTINGS", lockdown=True, layer_visibility={"grid": False})
+        result = await apply(rm, room, room_id, "UNDO")
+        assert room.state.lockdown is False
+        assert room.state.layer_visibility["grid"] is True
+        assert result.payload["settings"]["lockdown"] is False
+        await apply(rm, room, room_id, "REDO")
+        assert room.state.lockdown is True
+        assert room.state.layer_visibility["grid"] is False
+
+    async def test_undo_interior_delete_restores_edges_and_cuts(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "INTERIOR_ADD", id="r1", x=0, y=0, w=100, h=100)
+        cut = make_event("INTERIOR_WALL_CUT_ADD", id="c1", room_id="r1", side="top", t_start=0.2, t_end=0.4)
+        await rm.apply_event(room_id, room, cut, "gm", 1)
+        await apply(rm, room, room_id, "INTERIOR_DELETE", id="r1")
+        assert "c1" not in room.state.interior_wall_cuts
+        await apply(rm, room, room_id, "UNDO")
+        assert "r1" in room.state.interiors
+        assert "c1" in room.state.interior_wall_cuts
+        assert room.state.draw_order["interiors"] == ["r1"]
+
+    async def test_history_is_bounded(self, gm_room):
+        rm, room, room_id = gm_room
+        for i in range(60):
+            await apply(rm, room, room_id, "TOKEN_CREATE", id=f"t{i}", x=0, y=0)
+        assert len(room.history) == 50
+
 
 # ---------------------------------------------------------------------------
 # ROOM_SETTINGS
@@ -1016,3 +1181,881 @@ class TestFogPaint:
         rm, room, room_id = gm_room
         await apply(rm, room, room_id, "FOG_STROKE_ADD", id="fg1", points=make_terrain_points(3), op="mystery")
         assert room.state.fog_paint.strokes["fg1"].op == "reveal"
+
+
+# ---------------------------------------------------------------------------
+# Autosave scheduling
+# ---------------------------------------------------------------------------
+
+class TestAutosave:
+    @pytest.fixture
+    def fast_autosave(self, monkeypatch):
+        from server import autosave
+        monkeypatch.setattr(autosave, "AUTOSAVE_DEBOUNCE_SECONDS", 0.05)
+        monkeypatch.setattr(autosave, "AUTOSAVE_MAX_DEBOUNCE_SECONDS", 0.1)
+        monkeypatch.setattr(autosave, "AUTOSAVE_MAX_INTERVAL_SECONDS", 0.2)
+        monkeypatch.setattr(autosave, "AUTOSAVE_MAX_INTERVAL_CEILING_SECONDS", 0.4)
+
+    async def test_quiet_room_flushes_after_debounce(self, gm_room, fast_autosave):
+        import asyncio
+        from server.storage import load_room_state_json
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await asyncio.sleep(0.15)
+        assert room.dirty is False
+        assert room.autosave.flush_count == 1
+        assert room.autosave.forced_flush_count == 0
+        assert '"t1"' in (load_room_state_json(room_id) or "")
+
+    async def test_continuous_edits_flush_within_max_interval(self, gm_room, fast_autosave):
+        import asyncio
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        # Edits every 20ms never leave a quiet debounce window.
+        for i in range(25):
+            await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=i, y=i)
+            await asyncio.sleep(0.02)
+        assert room.autosave.flush_count >= 1
+        assert room.autosave.forced_flush_count >= 1
+        assert room.autosave.bytes_written > 0
+
+    async def test_busy_and_large_rooms_stretch_debounce(self, fast_autosave):
+        from server.autosave import AutosaveStats
+        stats = AutosaveStats()
+        base = stats.debounce_seconds()
+        stats.state_bytes = 4 * 1024 * 1024
+        assert stats.debounce_seconds() > base
+        assert stats.max_interval_seconds() == pytest.approx(0.4)
+        stats.state_bytes = 0
+        for i in range(20):
+            stats.note_change(i * 0.01)
+        assert stats.event_rate > 5
+        assert stats.debounce_seconds() == pytest.approx(0.1)
+
+    async def test_quiet_room_stops_counting_as_busy(self, fast_autosave):
+        from server.autosave import AutosaveStats
+        stats = AutosaveStats()
+        for i in range(20):
+            stats.note_change(i * 0.01)
+        assert stats.debounce_seconds(0.2) == pytest.approx(0.1)
+        # The rate only updates on edits; reads decay it by the quiet time.
+        assert stats.rate_at(30.0) < 1
+        assert stats.debounce_seconds(30.0) == pytest.approx(0.05)
+        stats.begin_flush()
+        assert stats.next_flush_at(0.19, 30.0) == pytest.approx(0.24)
+
+    async def test_autosave_stats_report_flush_counters(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await rm._flush_save(room_id, room)
+        stats = rm.autosave_stats()[room_id]
+        assert stats["flush_count"] == 1
+        assert stats["bytes_written"] == stats["last_bytes"] > 0
+        assert stats["dirty"] is False
+        assert stats["dirty_since"] is None
+
+
+# ---------------------------------------------------------------------------
+# Off-loop persistence
+# ---------------------------------------------------------------------------
+
+class TestStatePersistence:
+    async def test_flush_writes_on_writer_thread(self, gm_room, monkeypatch):
+        import threading
+        from server import persistence
+        writes = []
+        monkeypatch.setattr(
+            persistence, "commit_room_writes",
+            lambda states, journal: writes.extend((threading.current_thread().name, room_id) for room_id in states),
+        )
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        assert await rm._flush_save(room_id, room) is True
+        assert writes == [(writes[0][0], room_id)]
+        assert writes[0][0].startswith("sqlite-writer")
+        assert writes[0][0] != threading.current_thread().name
+
+    async def test_snapshots_are_encoded_and_compressed_off_the_writer_thread(self, gm_room, monkeypatch):
+        import threading
+        from server import persistence
+        threads = []
+
+        def recording(fn):
+            def wrapper(*args, **kwargs):
+                threads.append((fn.__name__, threading.current_thread().name))
+                return fn(*args, **kwargs)
+            return wrapper
+
+        monkeypatch.setattr(persistence, "dump_json", recording(persistence.dump_json))
+        monkeypatch.setattr(persistence, "encode_state_blob", recording(persistence.encode_state_blob))
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        assert await rm._flush_save(room_id, room, checkpoint=True) is True
+        assert [name for name, _ in threads] == ["dump_json", "encode_state_blob"]
+        assert all(thread.startswith("room-encoder") for _, thread in threads)
+
+    async def test_snapshot_is_isolated_from_later_edits(self, gm_room):
+        from server.persistence import snapshot_room_state
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await apply(rm, room, room_id, "STROKE_ADD", id="s1", points=make_points(3))
+        snap = snapshot_room_state(room.state)
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t2", x=0, y=0)
+        await apply(rm, room, room_id, "STROKE_DELETE", id="s1")
+        assert set(snap.tokens) == {"t1"}
+        assert "s1" in snap.strokes
+        assert list(snap.draw_order["strokes"]) == ["s1"]
+
+    async def test_writes_for_a_room_land_in_order(self, gm_room, monkeypatch):
+        import asyncio
+        from server import persistence
+        from server.storage_blobs import decode_state_blob
+        rm, room, room_id = gm_room
+        seen = []
+        # Checkpoints arrive compressed, ready to store.
+        monkeypatch.setattr(persistence, "commit_room_writes", lambda states, journal: seen.extend(map(decode_state_blob, states.values())))
+        flushes = []
+        for i in range(5):
+            await apply(rm, room, room_id, "TOKEN_CREATE", id=f"t{i}", x=0, y=0)
+            flushes.append(asyncio.ensure_future(rm._flush_save(room_id, room)))
+        await asyncio.gather(*flushes)
+        token_counts = [sum(f'"t{i}"' in s for i in range(5)) for s in seen]
+        assert token_counts == sorted(token_counts)
+        assert '"t4"' in seen[-1]
+
+    async def test_failed_write_keeps_room_dirty(self, gm_room, monkeypatch):
+        from server import persistence
+
+        def boom(states, journal):
+            raise RuntimeError("disk full")
+
+        monkeypatch.setattr(persistence, "commit_room_writes", boom)
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        assert await rm._flush_save(room_id, room) is False
+        assert room.dirty is True
+        assert room.autosave.dirty_since is not None
+        assert room.autosave.flush_count == 0
+        assert rm.writer_stats()["failed_batch_count"] == 1
+
+    async def test_concurrent_flushes_share_a_transaction(self, rm, monkeypatch):
+        import asyncio
+        from server import persistence
+        batches = []
+        monkeypatch.setattr(persistence, "commit_room_writes", lambda states, journal: batches.append(sorted(states)))
+        rooms = []
+        for i in range(6):
+            room = await rm.get_or_create_room(f"room-{i}")
+            room.state.gm_user_id = 1
+            room.state.gm_id = "gm"
+            await apply(rm, room, f"room-{i}", "TOKEN_CREATE", id="t1", x=0, y=0)
+            rooms.append((f"room-{i}", room))
+        await asyncio.gather(*(rm._flush_save(room_id, room) for room_id, room in rooms))
+        assert sorted(rid for batch in batches for rid in batch) == [f"room-{i}" for i in range(6)]
+        assert len(batches) < 6
+        stats = rm.writer_stats()
+        assert stats["rooms_written"] == 6
+        assert stats["max_batch_size"] == max(len(b) for b in batches) > 1
+
+    async def test_batched_rooms_are_saved(self, rm):
+        import asyncio
+        from server.storage import load_room_state_json
+        rooms = [(f"room-{i}", await rm.get_or_create_room(f"room-{i}")) for i in range(3)]
+        for room_id, room in rooms:
+            room.state.terrain_seed = 7
+            room.dirty = True
+        await asyncio.gather(*(rm._flush_save(room_id, room) for room_id, room in rooms))
+        for room_id, _ in rooms:
+            assert '"terrain_seed":7' in (load_room_state_json(room_id) or "")
+
+
+# ---------------------------------------------------------------------------
+# Event journal
+# ---------------------------------------------------------------------------
+
+class TestRoomJournal:
+    async def test_steady_state_flush_appends_small_patch(self, gm_room):
+        from server.storage import load_room_journal
+        from server.storage_rooms import load_room_state_json as load_checkpoint
+        rm, room, room_id = gm_room
+        for i in range(50):
+            await apply(rm, room, room_id, "STROKE_ADD", id=f"s{i}", points=make_points(20))
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await rm._flush_save(room_id, room)
+        checkpoint = load_checkpoint(room_id)
+        await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=40, y=50)
+        await rm._flush_save(room_id, room)
+        journal = load_room_journal(room_id)
+        assert len(journal) == 1
+        assert len(journal[0]) < 600
+        assert load_checkpoint(room_id) == checkpoint
+        assert room.autosave.checkpoint_count == 1
+
+    async def test_reload_replays_journal_tail(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        for sid in ("s1", "s2", "s3"):
+            await apply(rm, room, room_id, "STROKE_ADD", id=sid, points=make_points(3))
+        await rm._flush_save(room_id, room)
+        await apply(rm, room, room_id, "STROKE_DELETE", id="s2")
+        await apply(rm, room, room_id, "STROKE_ADD", id="s4", points=make_points(3))
+        await rm._flush_save(room_id, room)
+        await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=7, y=8)
+        await apply(rm, room, room_id, "ROOM_SETTINGS", allow_players_move=True, layer_visibility={"grid": False})
+        await apply(rm, room, room_id, "TERRAIN_STROKE_ADD", id="ts1", points=make_terrain_points(3), material_id="dirt")
+        await rm._flush_save(room_id, room)
+        assert room.autosave.checkpoint_count == 1
+
+        reloaded = await RoomManager().get_or_create_room(room_id)
+        assert reloaded.state.model_dump() == room.state.model_dump()
+        assert list(reloaded.state.draw_order["strokes"]) == ["s1", "s3", "s4"]
+
+    async def test_journal_compacts_into_checkpoint(self, gm_room, monkeypatch):
+        from server import journal
+        from server.storage import load_room_journal, load_room_state_json
+        monkeypatch.setattr(journal, "JOURNAL_COMPACT_EVERY_ENTRIES", 3)
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await rm._flush_save(room_id, room)
+        for i in range(3):
+            await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=i, y=i)
+            await rm._flush_save(room_id, room)
+        assert len(load_room_journal(room_id)) == 3
+        await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=99, y=99)
+        await rm._flush_save(room_id, room)
+        assert load_room_journal(room_id) == []
+        assert room.autosave.checkpoint_count == 2
+        assert '"x":99.0' in load_room_state_json(room_id)
+
+    async def test_failed_batch_forces_checkpoint(self, gm_room, monkeypatch):
+        from server import persistence
+        from server.storage import load_room_journal
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await rm._flush_save(room_id, room)
+        real = persistence.commit_room_writes
+
+        def boom(states, journal):
+            raise RuntimeError("disk full")
+
+        monkeypatch.setattr(persistence, "commit_room_writes", boom)
+        await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=5, y=5)
+        assert await rm._flush_save(room_id, room) is False
+        monkeypatch.setattr(persistence, "commit_room_writes", real)
+        await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=6, y=6)
+        assert await rm._flush_save(room_id, room) is True
+        assert room.autosave.checkpoint_count == 2
+        assert load_room_journal(room_id) == []
+
+
+# ---------------------------------------------------------------------------
+# STATE_SYNC encode cache
+# ---------------------------------------------------------------------------
+
+class TestStateSyncCache:
+    async def test_matches_wire_event_encoding(self, gm_room):
+        import json
+        rm, room, room_id = gm_room
+        room.state.gm_key_hash = "secret"
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await apply(rm, room, room_id, "STROKE_ADD", id="s1", points=make_points(3))
+        expected = WireEvent(type="STATE_SYNC", payload=room.state.model_dump(exclude={"gm_key_hash"})).model_dump_json()
+        msg = rm.state_sync_json(room)
+        assert json.loads(msg) == json.loads(expected)
+        assert "secret" not in msg
+
+    async def test_same_version_encodes_once(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        first = rm.state_sync_json(room)
+        assert all(rm.state_sync_json(room) is first for _ in range(10))
+        assert room.sync_cache_misses == 1
+        assert room.sync_cache_hits == 10
+
+    async def test_req_state_sync_uses_the_cache(self, gm_room):
+        from server.wire import encode_event
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "STROKE_ADD", id="s1", points=make_points(3))
+        first = await apply(rm, room, room_id, "REQ_STATE_SYNC")
+        second = await apply(rm, room, room_id, "REQ_STATE_SYNC")
+        assert encode_event(first) is encode_event(second) is rm.state_sync_json(room)
+        assert first.payload["strokes"]["s1"]["id"] == "s1"
+        assert room.sync_cache_misses == 1
+
+    async def test_packed_sync_is_copied_from_point_buffers(self, gm_room, monkeypatch):
+        import json
+        from server import wire
+        from server.wire import unpack_frame
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "STROKE_ADD", id="s1", points=make_points(3))
+        await apply(rm, room, room_id, "FOG_STROKE_ADD", id="f1", points=make_points(2))
+        ws = _RecordingSocket()
+        rm.attach_client(room, ws, "c1", 1, binary=True)
+        monkeypatch.setattr(wire, "_loads", lambda raw: pytest.fail("packed by parsing the JSON again"))
+        frame = rm.state_sync_frame(room)
+        raw = frame.packed()
+        assert len(raw) % 8 == 0
+        assert unpack_frame(raw) == json.loads(frame.text)
+
+    async def test_mark_dirty_invalidates(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        before = rm.state_sync_json(room)
+        await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=30, y=40)
+        assert room.sync_cache is None
+        after = rm.state_sync_json(room)
+        assert after != before
+        assert '"x":30.0' in after
+
+
+# ---------------------------------------------------------------------------
+# Delta resync
+# ---------------------------------------------------------------------------
+
+class TestResync:
+    async def test_mutations_are_stamped_with_version(self, gm_room):
+        rm, room, room_id = gm_room
+        out = await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        assert out.version == room.state.version
+        rejected = await apply(rm, room, room_id, "TOKEN_DELETE", id="missing")
+        assert rejected.type == "ERROR"
+        assert rejected.version is None
+
+    async def test_returns_missed_events_in_order(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        since = room.state.version
+        await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=5, y=5)
+        await apply(rm, room, room_id, "STROKE_ADD", id="s1", points=make_points(3))
+        missed = rm.resync_events(room, since, room.epoch)
+        assert [e.type for e in missed] == ["TOKEN_MOVE", "STROKE_ADD"]
+        assert missed[-1].version == room.state.version
+        assert rm.resync_events(room, room.state.version, room.epoch) == []
+
+    async def test_gap_beyond_buffer_needs_full_sync(self, rm, monkeypatch):
+        from server import rooms
+        monkeypatch.setattr(rooms, "RESYNC_BUFFER_EVENTS", 4)
+        room = await rm.get_or_create_room("small-buffer")
+        room.state.gm_user_id = 1
+        room.state.gm_id = "gm"
+        await apply(rm, room, "small-buffer", "TOKEN_CREATE", id="t1", x=0, y=0)
+        since = room.state.version
+        for i in range(5):
+            await apply(rm, room, "small-buffer", "TOKEN_MOVE", id="t1", x=i, y=i)
+        assert rm.resync_events(room, since, room.epoch) is None
+        assert len(rm.resync_events(room, since + 1, room.epoch)) == 4
+
+    async def test_out_of_band_change_needs_full_sync(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        since = room.state.version
+        room.state.gm_id = "someone-else"
+        rm._mark_dirty(room_id, room)
+        assert rm.resync_events(room, since, room.epoch) is None
+        assert rm.resync_events(room, since + 5, room.epoch) is None
+
+
+    async def test_other_epoch_needs_full_sync(self, gm_room):
+        rm, room, room_id = gm_room
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        epoch, version = room.epoch, room.state.version
+        assert rm.resync_events(room, version, "stale") is None
+        assert rm.resync_events(room, version, None) is None
+        # A reload (restart, or a deleted and recreated room) starts a new epoch at any version.
+        await rm._flush_save(room_id, room, checkpoint=True)
+        await rm.drop_room(room_id)
+        reloaded = await rm.get_or_create_room(room_id)
+        assert reloaded.state.version == version
+        assert reloaded.epoch != epoch
+        assert rm.resync_events(reloaded, version, epoch) is None
+        assert rm.resync_events(reloaded, version, reloaded.epoch) == []
+
+
+class TestRoomLoading:
+    async def test_concurrent_loads_share_one_read(self, rm, monkeypatch):
+        import asyncio
+        import threading
+        from server import rooms
+        reads = []
+
+        def slow_load(room_id):
+            reads.append(threading.current_thread().name)
+            return None
+
+        monkeypatch.setattr(rooms, "load_room_state_json", slow_load)
+        loaded = await asyncio.gather(*(rm.get_or_create_room("cold") for _ in range(5)))
+        assert len(reads) == 1
+        assert reads[0] != threading.current_thread().name
+        assert all(r is loaded[0] for r in loaded)
+
+    async def test_failed_load_is_retried(self, rm, monkeypatch):
+        from server import rooms
+        calls = []
+
+        def flaky_load(room_id):
+            calls.append(room_id)
+            if len(calls) == 1:
+                raise RuntimeError("db down")
+            return None
+
+        monkeypatch.setattr(rooms, "load_room_state_json", flaky_load)
+        with pytest.raises(RuntimeError):
+            await rm.get_or_create_room("flaky")
+        room = await rm.get_or_create_room("flaky")
+        assert room.state.room_id == "flaky"
+        assert len(calls) == 2
+
+    async def test_drop_during_load_discards_the_loaded_room(self, rm, monkeypatch):
+        import asyncio
+        import threading
+        from server import rooms
+        release = threading.Event()
+        started = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def blocked_load(room_id):
+            loop.call_soon_threadsafe(started.set)
+            release.wait(5)
+            return None
+
+        monkeypatch.setattr(rooms, "load_room_state_json", blocked_load)
+        loading = asyncio.ensure_future(rm.get_or_create_room("deleted"))
+        await started.wait()
+        await rm.kick_all_and_drop("deleted")
+        release.set()
+        stale = await loading
+        assert "deleted" not in rm._rooms
+        # A later connect loads afresh instead of reusing the stale result.
+        ws = object()
+        room = await rm.connect("deleted", ws)
+        assert room is not stale
+        assert rm._rooms["deleted"] is room
+
+    async def test_saving_one_room_does_not_block_another(self, rm, monkeypatch):
+        import asyncio
+        from server import persistence
+        release = asyncio.Event()
+        started = asyncio.Event()
+        real_write = rm._writer.write
+
+        async def slow_write(room_id, snapshot):
+            started.set()
+            await release.wait()
+            return await real_write(room_id, snapshot)
+
+        monkeypatch.setattr(rm._writer, "write", slow_write)
+        monkeypatch.setattr(persistence, "commit_room_writes", lambda states, journal: None)
+        (await rm.connect("a", object())).dirty = True
+        leaving = asyncio.ensure_future(rm.disconnect("a", next(iter(rm._rooms["a"].sockets))))
+        await started.wait()
+        ws = object()
+        room_b = await asyncio.wait_for(rm.connect("b", ws), timeout=1)
+        assert ws in room_b.sockets
+        assert "a" in rm._rooms
+        release.set()
+        await leaving
+        assert "a" not in rm._rooms
+
+    async def test_connect_during_disconnect_keeps_room(self, rm, monkeypatch):
+        import asyncio
+        from server import persistence
+        release = asyncio.Event()
+        real_write = rm._writer.write
+
+        async def slow_write(room_id, snapshot):
+            await release.wait()
+            return await real_write(room_id, snapshot)
+
+        monkeypatch.setattr(rm._writer, "write", slow_write)
+        monkeypatch.setattr(persistence, "commit_room_writes", lambda states, journal: None)
+        first, second = object(), object()
+        room = await rm.connect("r", first)
+        room.dirty = True
+        leaving = asyncio.ensure_future(rm.disconnect("r", first))
+        await asyncio.sleep(0)
+        joining = asyncio.ensure_future(rm.connect("r", second))
+        await asyncio.sleep(0)
+        release.set()
+        await leaving
+        rejoined = await joining
+        assert second in rejoined.sockets
+        assert rm._rooms["r"] is rejoined
+        assert rejoined is room
+
+    def _block_commits(self, monkeypatch):
+        import asyncio
+        import threading
+        from server import persistence
+        release = threading.Event()
+        started = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        real_commit = persistence.commit_room_writes
+
+        def blocked_commit(states, journal):
+            loop.call_soon_threadsafe(started.set)
+            release.wait(5)
+            real_commit(states, journal)
+
+        monkeypatch.setattr(persistence, "commit_room_writes", blocked_commit)
+        return started, release
+
+    async def test_reconnect_after_disconnect_sees_a_blocked_autosave(self, gm_room, monkeypatch):
+        import asyncio
+        from server.storage import load_room_state_json
+        from server.warm_rooms import WarmRoomCache
+        rm, room, room_id = gm_room
+        # Nothing is kept warm, so the reconnect has to load from the DB.
+        rm._warm = WarmRoomCache(max_bytes=0)
+        started, release = self._block_commits(monkeypatch)
+        ws = object()
+        await rm.connect(room_id, ws)
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        room.autosave_task.cancel()
+        room.autosave_task = asyncio.ensure_future(rm._flush_save(room_id, room))
+        await started.wait()
+
+        leaving = asyncio.ensure_future(rm.disconnect(room_id, ws))
+        await asyncio.sleep(0.05)
+        joining = asyncio.ensure_future(rm.connect(room_id, object()))
+        await asyncio.sleep(0.05)
+        assert not leaving.done() and not joining.done()
+        release.set()
+        await leaving
+        again = await joining
+        assert again is not room
+        assert "t1" in again.state.tokens
+        assert '"t1"' in load_room_state_json(room_id)
+
+    async def test_load_waits_for_a_queued_write(self, gm_room, monkeypatch):
+        import asyncio
+        rm, room, room_id = gm_room
+        started, release = self._block_commits(monkeypatch)
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        flushing = asyncio.ensure_future(rm._flush_save(room_id, room, checkpoint=True))
+        await started.wait()
+        rm._rooms.pop(room_id)
+        loading = asyncio.ensure_future(rm.get_or_create_room(room_id))
+        await asyncio.sleep(0.05)
+        assert not loading.done()
+        release.set()
+        assert await flushing is True
+        assert "t1" in (await loading).state.tokens
+
+    async def test_cancelled_flush_keeps_room_dirty(self, gm_room, monkeypatch):
+        import asyncio
+        rm, room, room_id = gm_room
+        started, release = self._block_commits(monkeypatch)
+        await rm._flush_save(room_id, room, checkpoint=True)
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        room.autosave_task.cancel()
+        flushing = asyncio.ensure_future(rm._flush_save(room_id, room))
+        await started.wait()
+        flushing.cancel()
+        await asyncio.wait([flushing])
+        assert room.dirty is True
+        assert room.journal is None
+        assert room.autosave.dirty_since is not None
+        release.set()
+        await rm._writer.drain(room_id)
+
+
+class TestWarmRooms:
+    async def test_reconnect_reuses_emptied_room(self, gm_room, monkeypatch):
+        from server import rooms
+        rm, room, room_id = gm_room
+        ws = object()
+        await rm.connect(room_id, ws)
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await rm.disconnect(room_id, ws)
+        assert room_id not in rm._rooms
+
+        def no_db(room_id):
+            raise AssertionError("warm room should not be reloaded")
+
+        monkeypatch.setattr(rooms, "load_room_state_json", no_db)
+        again = await rm.connect(room_id, object())
+        assert again is room
+        assert room.history
+        assert rm.warm_stats()["hits"] == 1
+
+    async def test_idle_rooms_are_evicted(self, rm):
+        from server.warm_rooms import WarmRoomCache
+        cache = WarmRoomCache(max_bytes=1000, idle_seconds=10)
+        room = await rm.get_or_create_room("idle")
+        assert cache.park("idle", room, 100, now=0.0)
+        assert cache.take("idle", now=10.0) is None
+        assert cache.stats.evicted_idle == 1
+
+    async def test_least_recent_rooms_evicted_over_budget(self, rm):
+        from server.warm_rooms import WarmRoomCache
+        cache = WarmRoomCache(max_bytes=250, idle_seconds=60)
+        for i, name in enumerate(("a", "b", "c")):
+            cache.park(name, await rm.get_or_create_room(name), 100, now=float(i))
+        assert "a" not in cache
+        assert "b" in cache and "c" in cache
+        assert not cache.park("huge", await rm.get_or_create_room("huge"), 1000, now=3.0)
+        assert cache.stats.evicted_size == 1
+        assert cache.stats.rejected_size == 1
+        assert len(cache) == 2
+
+    async def test_deleted_room_leaves_warm_cache(self, gm_room):
+        rm, room, room_id = gm_room
+        ws = object()
+        await rm.connect(room_id, ws)
+        await rm.disconnect(room_id, ws)
+        assert room_id in rm._warm
+        await rm.drop_room(room_id)
+        assert room_id not in rm._warm
+
+
+class TestWireDecode:
+    def test_hot_events_match_full_validation(self):
+        import json
+        from server.wire import decode_wire_event
+        raw = json.dumps({"type": "TOKEN_MOVE", "payload": {"id": "t1", "x": 1.5, "y": 2}, "ts": 3})
+        fast = decode_wire_event(raw)
+        assert fast == WireEvent.model_validate_json(raw)
+        assert fast.model_dump_json() == WireEvent.model_validate_json(raw).model_dump_json()
+
+    def test_malformed_frames_still_fail_validation(self):
+        from pydantic import ValidationError
+        from server.wire import decode_wire_event
+        for raw in ("not json", '{"type": "NOT_A_TYPE"}', '{"type": "TOKEN_MOVE", "payload": []}', "[]"):
+            with pytest.raises(ValidationError):
+                decode_wire_event(raw)
+
+    def test_unusual_hot_envelope_takes_validated_path(self):
+        from server.wire import decode_wire_event
+        event = decode_wire_event('{"type": "SHAPE_UPDATE", "payload": {"id": "s1"}, "ts": "4.5"}')
+        assert event.ts == 4.5
+
+    def test_every_event_family_is_dispatched(self, rm):
+        from typing import get_args
+        from server.models import EventType
+        from server.rooms import EVENT_HANDLERS
+        handled = {t for types in EVENT_HANDLERS.values() for t in types}
+        assert handled <= set(get_args(EventType))
+        assert set(rm._handlers) == handled
+
+    async def test_unknown_type_is_an_error(self, gm_room):
+        rm, room, room_id = gm_room
+        out = await rm.apply_event(room_id, room, WireEvent(type="HELLO"), "gm", 1)
+        assert out.type == "ERROR"
+        assert "Unhandled event type" in out.payload["message"]
+
+
+class _RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, msg):
+        self.sent.append(msg)
+
+
+async def sent_to(room, ws):
+    """Messages delivered to ``ws`` once its send queue has drained."""
+    await room.senders[ws].flushed()
+    return ws.sent
+
+
+class TestDragCoalescing:
+    async def _drag_room(self, gm_room):
+        rm, room, room_id = gm_room
+        ws = _RecordingSocket()
+        room.sockets.add(ws)
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0)
+        await apply(rm, room, room_id, "TOKEN_CREATE", id="t2", x=0, y=0)
+        return rm, room, room_id, ws
+
+    async def _drag(self, rm, room, room_id, token_id, x, **extra):
+        out = await apply(rm, room, room_id, "TOKEN_MOVE", id=token_id, x=x, y=0, **extra)
+        await rm.publish(room, out)
+
+    async def test_only_latest_drag_per_entity_is_sent_per_tick(self, gm_room):
+        import asyncio
+        import json
+        rm, room, room_id, ws = await self._drag_room(gm_room)
+        rm.drag_tick_hz = 50.0
+        for x in range(1, 6):
+            await self._drag(rm, room, room_id, "t1", x, commit=False, move_seq=x, move_client="gm")
+        await self._drag(rm, room, room_id, "t2", 9, commit=False)
+        # The first drag goes out at once; the rest wait for the tick.
+        assert [json.loads(m)["payload"]["x"] for m in await sent_to(room, ws)] == [1]
+        await asyncio.sleep(0.05)
+        batch = json.loads((await sent_to(room, ws))[1])
+        assert batch["type"] == "EVENT_BATCH"
+        assert [(e["payload"]["id"], e["payload"]["x"]) for e in batch["payload"]["events"]] == [("t1", 5), ("t2", 9)]
+        assert batch["payload"]["events"][0]["payload"]["move_seq"] == 5
+        versions = [e["version"] for e in batch["payload"]["events"]]
+        assert versions == sorted(versions) and versions[-1] == room.state.version
+        assert room.drags.stats.superseded == 3
+
+    async def test_commit_flushes_pending_drags_first(self, gm_room):
+        import json
+        rm, room, room_id, ws = await self._drag_room(gm_room)
+        rm.drag_tick_hz = 1.0
+        await self._drag(rm, room, room_id, "t1", 1, commit=False)
+        await self._drag(rm, room, room_id, "t1", 2, commit=False)
+        await self._drag(rm, room, room_id, "t1", 3, commit=True)
+        sent = [json.loads(m) for m in await sent_to(room, ws)]
+        # The socket's queue already replaced the first drag with the second.
+        assert [(m["payload"]["x"], m["payload"].get("commit")) for m in sent] == [(2, False), (3, True)]
+        assert not room.drags.pending
+        room.drags.task.cancel()
+
+    async def test_rejected_moves_are_not_coalesced(self, gm_room):
+        from server.coalesce import coalesce_key
+        rm, room, room_id, _ = await self._drag_room(gm_room)
+        room.state.tokens["t1"].locked = True
+        out = await apply_as_player(rm, room, room_id, "TOKEN_MOVE", id="t1", x=5, y=5, commit=False)
+        assert out.payload["rejected"] is True
+        assert coalesce_key(out) is None
+        group = await apply(rm, room, room_id, "TOKENS_MOVE", moves=[{"id": "t2", "x": 1, "y": 1}, {"id": "t1", "x": 2, "y": 2}])
+        assert coalesce_key(group) == ("TOKENS_MOVE", ("t1", "t2"))
+
+    async def test_zero_tick_rate_sends_every_update(self, gm_room):
+        import json
+        rm, room, room_id, ws = await self._drag_room(gm_room)
+        rm.drag_tick_hz = 0
+        for x in range(3):
+            await self._drag(rm, room, room_id, "t1", x, commit=False)
+        assert room.drags.task is None
+        assert room.drags.stats.received == 0
+        assert json.loads((await sent_to(room, ws))[-1])["payload"]["x"] == 2
+
+
+class _StuckSocket(_RecordingSocket):
+    def __init__(self):
+        super().__init__()
+        import asyncio
+        self.release = asyncio.Event()
+
+    async def send_text(self, msg):
+        await self.release.wait()
+        self.sent.append(msg)
+
+
+class TestSendQueues:
+    async def test_slow_socket_does_not_hold_broadcast(self, gm_room):
+        import asyncio
+        rm, room, room_id = gm_room
+        fast, slow = _RecordingSocket(), _StuckSocket()
+        room.sockets.update({fast, slow})
+        await asyncio.wait_for(rm.broadcast(room, rm.presence_event(room)), timeout=1)
+        assert len(await sent_to(room, fast)) == 1
+        assert slow.sent == []
+        slow.release.set()
+        assert len(await sent_to(room, slow)) == 1
+
+    async def test_queued_drags_for_same_entity_are_replaced(self, gm_room):
+        import asyncio
+        import json
+        rm, room, room_id = gm_room
+        ws = _StuckSocket()
+        room.sockets.add(ws)
+        await rm.broadcast(room, await apply(rm, room, room_id, "TOKEN_CREATE", id="t1", x=0, y=0))
+        await asyncio.sleep(0)
+        for x in range(1, 5):
+            await rm.broadcast(room, await apply(rm, room, room_id, "TOKEN_MOVE", id="t1", x=x, y=0, commit=False))
+        ws.release.set()
+        sent = [json.loads(m) for m in await sent_to(room, ws)]
+        # TOKEN_CREATE was in flight; of the queued drags only the newest is left.
+        assert [m["type"] for m in sent] == ["TOKEN_CREATE", "TOKEN_MOVE"]
+        assert sent[-1]["payload"]["x"] == 4
+        assert room.send_stats.superseded == 3
+
+    async def test_lagging_socket_gets_one_fresh_state_sync(self, gm_room):
+        import asyncio
+        import json
+        rm, room, room_id = gm_room
+        ws = _StuckSocket()
+        room.sockets.add(ws)
+        await rm.broadcast(room, rm.presence_event(room))
+        await asyncio.sleep(0)
+        rm._sender(room, ws).max_depth = 5
+        for i in range(20):
+            await rm.broadcast(room, await apply(rm, room, room_id, "TOKEN_CREATE", id=f"t{i}", x=i, y=i))
+        await rm.broadcast(room, rm.presence_event(room))
+        assert rm._sender(room, ws).depth() <= 5
+        ws.release.set()
+        sent = [json.loads(m) for m in await sent_to(room, ws)]
+        assert [m["type"] for m in sent] == ["PRESENCE", "STATE_SYNC", "PRESENCE"]
+        assert len(sent[1]["payload"]["tokens"]) == 20
+        assert room.send_stats.resyncs == 1
+        assert rm.autosave_stats()[room_id]["send"]["resyncs"] == 1
+
+    async def test_failed_send_drops_only_that_socket(self, gm_room):
+        rm, room, room_id = gm_room
+        good = _RecordingSocket()
+        bad = object()
+        room.sockets.update({good, bad})
+        await rm.broadcast(room, rm.presence_event(room))
+        await room.senders[bad].flushed()
+        assert bad not in room.sockets and bad not in room.senders
+        assert len(await sent_to(room, good)) == 1
+        assert room.send_stats.dropped_sockets == 1
+
+
+class TestWireEncode:
+    def test_model_event_encodes_like_the_payload_dict(self):
+        import json
+        from server.wire import encode_event, model_event
+        shape = Shape(id="s1", type="text", x1=0, y1=0, x2=1.5, y2=1, text='say "hi" ü')
+        event = model_event("SHAPE_UPDATE", shape, commit=False, move_seq=3, move_client="c1")
+        event.version = 7
+        reference = WireEvent(type="SHAPE_UPDATE", payload=event.payload, version=7)
+        assert json.loads(encode_event(event)) == json.loads(reference.model_dump_json())
+        assert event.payload["move_seq"] == 3 and event.payload["x2"] == 1.5
+
+    def test_model_event_packs_from_point_buffers(self, monkeypatch):
+        import json
+        from server import wire
+        from server.send_queue import encode_frame
+        from server.wire import model_event, unpack_frame
+        event = model_event("STROKE_ADD", Stroke(id="s1", points=make_points(4)), commit=True)
+        monkeypatch.setattr(wire, "_loads", lambda raw: pytest.fail("packed by parsing the JSON again"))
+        frame = encode_frame(event)
+        assert unpack_frame(frame.packed()) == json.loads(frame.text)
+        assert encode_frame(model_event("TOKEN_CREATE", Token(id="t1", x=1, y=2))).packed() is None
+
+    async def test_event_is_encoded_once_across_rooms(self, rm, monkeypatch):
+        presence = WireEvent(type="PRESENCE", payload={"clients": []})
+        calls = []
+        real_dump = WireEvent.model_dump_json
+
+        def counting_dump(self, **kwargs):
+            calls.append(self.type)
+            return real_dump(self, **kwargs)
+
+        monkeypatch.setattr(WireEvent, "model_dump_json", counting_dump)
+        sockets = []
+        for room_id in ("a", "b"):
+            room = await rm.get_or_create_room(room_id)
+            for _ in range(3):
+                ws = _RecordingSocket()
+                room.sockets.add(ws)
+                sockets.append((room, ws))
+            await rm.broadcast(room, presence)
+        for room, ws in sockets:
+            assert len(await sent_to(room, ws)) == 1
+        assert calls == ["PRESENCE"]
+
+    def test_packed_frames_round_trip_point_lists(self):
+        import json
+        from server.wire import decode_packed_event, pack_frame
+        points = [{"x": 1.5, "y": -2.0}, {"x": 3.0, "y": 4.25}]
+        text = json.dumps({"type": "FOG_STROKE_ADD", "payload": {"id": "f1", "points": points, "meta": [{"x": 1, "y": 2, "z": 3}]}})
+        raw = pack_frame(text)
+        assert len(raw) % 8 == 0
+        event = decode_packed_event(raw)
+        assert event == WireEvent.model_validate_json(text)
+        assert pack_frame('{"type":"HEARTBEAT","payload":{}}') is None
+
+    def test_malformed_packed_frames_are_rejected(self):
+        import json
+        import struct
+        from server.wire import pack_frame, unpack_frame
+        raw = pack_frame(json.dumps({"type": "STROKE_ADD", "payload": {"points": [{"x": 1, "y": 2}]}}))
+        for bad in (b"", raw[:-4], struct.pack("<I", 10_000) + raw[4:]):
+            with pytest.raises(ValueError):
+                unpack_frame(bad)
@@ -12,7 +12,7 @@ import pytest
 
 from sqlmodel import SQLModel, create_engine as _sa_create_engine
 
-from server import storage
+from server import storage, storage_writer
 from server.storage import (
     add_game_session_member,
     add_membership,
@@ -221,7 +221,29 @@ class TestSessions:
             s.add(row)
             s.commit()
         assert get_user_by_sid(sid) is None
-        # Row should be cleaned up
+        # Row should be cleaned up once the writer gets to it
+        storage_writer.run_write(lambda: None)
+        with Session(storage.engine) as s:
+            assert s.get(SessionRow, sid) is None
+
+    def test_expired_sid_does_not_wait_for_the_writer(self):
+        import threading
+
+        u = _make_user()
+        sid = create_session(u.user_id)
+        past = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+        with Session(storage.engine) as s:
+            row = s.get(SessionRow, sid)
+            row.expires_at = past
+            s.add(row)
+            s.commit()
+        release = threading.Event()
+        storage_writer.WRITER_EXECUTOR.submit(release.wait, 5)
+        try:
+            assert get_user_by_sid(sid) is None
+        finally:
+            release.set()
+        storage_writer.run_write(lambda: None)
         with Session(storage.engine) as s:
             assert s.get(SessionRow, sid) is None
 
@@ -234,6 +256,62 @@ class TestSessions:
     def test_delete_session_nonexistent_is_noop(self):
         delete_session("ghost-sid")  # should not raise
 
+    def test_get_user_by_sid_is_cached(self, monkeypatch):
+        from server import storage_auth
+        u = _make_user()
+        sid = create_session(u.user_id)
+        assert get_user_by_sid(sid).user_id == u.user_id
+
+        def no_db(*args, **kwargs):
+            raise AssertionError("cached sid should not hit the DB")
+
+        monkeypatch.setattr(storage_auth, "Session", no_db)
+        assert get_user_by_sid(sid).user_id == u.user_id
+
+    def test_user_changes_invalidate_cached_sid(self):
+        from server.storage import delete_all_sessions_for_user, update_user_status
+        u = _make_user()
+        sid = create_session(u.user_id)
+        other = create_session(u.user_id)
+        assert get_user_by_sid(sid) is not None
+        update_user_last_room(u.user_id, "room-x")
+        assert get_user_by_sid(sid).last_room_id == "room-x"
+        delete_all_sessions_for_user(u.user_id, except_sid=other)
+        assert get_user_by_sid(sid) is None
+        assert get_user_by_sid(other) is not None
+        update_user_status(u.user_id, "disabled")
+        assert get_user_by_sid(other) is None
+
+    def test_invalidation_during_a_miss_is_not_undone(self, monkeypatch):
+        from server import storage_auth
+        from server.storage import update_user_status
+        from server.storage_models import UserRow
+        u = _make_user()
+        sid = create_session(u.user_id)
+        raced = []
+
+        class RacingSession(Session):
+            def get(self, model, ident, **kwargs):
+                row = super().get(model, ident, **kwargs)
+                if model is UserRow and not raced:
+                    # The user is disabled after this lookup read the old row.
+                    raced.append(True)
+                    update_user_status(u.user_id, "disabled")
+                return row
+
+        monkeypatch.setattr(storage_auth, "Session", RacingSession)
+        assert get_user_by_sid(sid).user_id == u.user_id
+        monkeypatch.setattr(storage_auth, "Session", Session)
+        assert sid not in storage_auth._user_by_sid_cache
+        assert get_user_by_sid(sid) is None
+
+    def test_deleted_session_is_not_served_from_cache(self):
+        u = _make_user()
+        sid = create_session(u.user_id)
+        assert get_user_by_sid(sid) is not None
+        delete_session(sid)
+        assert get_user_by_sid(sid) is None
+
 
 # ---------------------------------------------------------------------------
 # Rooms
@@ -846,3 +924,427 @@ class TestParentRoomId:
         )
         meta = get_room_meta(child_rid)
         assert meta.parent_room_id == root_rid
+
+
+# ---------------------------------------------------------------------------
+# SQLite connection setup — storage_db.make_engine
+# ---------------------------------------------------------------------------
+
+class TestSqliteProfiles:
+    def _pragmas(self, engine, names):
+        with engine.connect() as conn:
+            return [conn.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names]
+
+    def test_profile_pragmas_applied_to_pooled_connections(self, tmp_path):
+        from server import storage_db
+
+        engine = storage_db.make_engine(f"sqlite:///{tmp_path / 'tuned.db'}", "throughput")
+        try:
+            names = ["journal_mode", "synchronous", "cache_size", "temp_store"]
+            # synchronous=NORMAL is 1, temp_store=MEMORY is 2
+            assert self._pragmas(engine, names) == ["wal", 1, -65536, 2]
+            # A second connection checked out alongside the first is tuned too.
+            with engine.connect():
+                assert self._pragmas(engine, names) == ["wal", 1, -65536, 2]
+        finally:
+            engine.dispose()
+
+    def test_unknown_profile_uses_default(self, tmp_path):
+        from server import storage_db
+
+        engine = storage_db.make_engine(f"sqlite:///{tmp_path / 'plain.db'}", "nonsense")
+        try:
+            # synchronous=FULL is 2
+            assert self._pragmas(engine, ["journal_mode", "synchronous", "busy_timeout"]) == ["wal", 2, 3000]
+        finally:
+            engine.dispose()
+
+    def test_env_settings_fall_back_on_bad_values(self, monkeypatch):
+        from server.env import env_float, env_int
+
+        for raw, expected in (("", 5), ("abc", 5), ("-3", 5), ("0", 5), ("7", 7)):
+            monkeypatch.setenv("SQLITE_POOL_SIZE", raw)
+            assert env_int("SQLITE_POOL_SIZE", 5) == expected
+        monkeypatch.setenv("SQLITE_POOL_SIZE", "0")
+        assert env_int("SQLITE_POOL_SIZE", 5, allow_zero=True) == 0
+        monkeypatch.setenv("SQLITE_POOL_SIZE", "-1")
+        assert env_int("SQLITE_POOL_SIZE", 5, allow_zero=True) == 5
+        monkeypatch.setenv("ROOM_WRITER_TICK_SECONDS", "0.5")
+        assert env_float("ROOM_WRITER_TICK_SECONDS", 0.25) == 0.5
+
+
+# ---------------------------------------------------------------------------
+# Single SQLite writer — storage_writer
+# ---------------------------------------------------------------------------
+
+class TestStorageWriter:
+    def _hold_writer(self):
+        """Park the writer thread until the returned event is set."""
+        import threading
+        from server import storage_writer
+
+        release = threading.Event()
+        storage_writer.WRITER_EXECUTOR.submit(release.wait, 5)
+        return release
+
+    def _wait_for_batch(self, size):
+        import time
+        from server import storage_writer
+
+        deadline = time.monotonic() + 5
+        while len(storage_writer._batch) < size and time.monotonic() < deadline:
+            time.sleep(0.001)
+        assert len(storage_writer._batch) == size
+
+    def test_writes_run_on_the_writer_thread(self):
+        import threading
+        from server import storage_writer
+
+        assert storage_writer.run_write(lambda: threading.current_thread().name).startswith("sqlite-writer")
+        # Nested writes from the writer thread run inline instead of deadlocking.
+        assert storage_writer.run_write(lambda: storage_writer.run_write(lambda: 42)) == 42
+
+    def test_queued_small_writes_commit_as_one_batch(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from server import storage_writer
+
+        u = _make_user()
+        room_id = _make_room(owner_id=u.user_id)
+        add_membership(u.user_id, room_id, role="owner")
+        batches = storage_writer.stats.batches
+        release = self._hold_writer()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [
+                pool.submit(
+                    storage.append_audit_log,
+                    actor_user_id=u.user_id,
+                    action=f"test.{i}",
+                    target_type="room",
+                    target_id=room_id,
+                    summary="batched",
+                )
+                for i in range(3)
+            ]
+            futures.append(pool.submit(touch_membership, u.user_id, room_id))
+            self._wait_for_batch(4)
+            release.set()
+            rows = [f.result(timeout=5) for f in futures[:3]]
+            futures[3].result(timeout=5)
+        assert storage_writer.stats.batches == batches + 1
+        assert len({row.audit_id for row in rows}) == 3
+        assert {log["action"] for log in storage.list_audit_logs(target_id=room_id)} == {"test.0", "test.1", "test.2"}
+
+    def test_failed_op_only_fails_its_own_caller(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from server import storage_writer
+
+        def boom(_session):
+            raise RuntimeError("bad row")
+
+        release = self._hold_writer()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            bad = pool.submit(storage_writer.run_batched, storage.engine, boom)
+            good = pool.submit(
+                storage.append_audit_log,
+                actor_user_id=None,
+                action="test.ok",
+                target_type="room",
+                target_id="r1",
+                summary="kept",
+            )
+            self._wait_for_batch(2)
+            release.set()
+            with pytest.raises(RuntimeError):
+                bad.result(timeout=5)
+            assert good.result(timeout=5).audit_id is not None
+        assert [log["action"] for log in storage.list_audit_logs(target_id="r1")] == ["test.ok"]
+
+
+# ---------------------------------------------------------------------------
+# Separate room state database — ROOM_STATE_DB_PATH
+# ---------------------------------------------------------------------------
+
+class TestRoomStateDatabase:
+    @pytest.fixture
+    def state_engine(self, tmp_path, monkeypatch):
+        from server import storage_db
+
+        state = storage_db.make_engine(f"sqlite:///{tmp_path / 'rooms.db'}")
+        storage_db.create_room_state_tables(state)
+        monkeypatch.setattr(storage, "state_engine", state)
+        yield state
+        state.dispose()
+
+    def _count(self, engine, model):
+        from sqlmodel import Session, select
+
+        with Session(engine) as s:
+            return len(s.exec(select(model)).all())
+
+    def test_room_state_and_snapshots_use_the_state_database(self, state_engine):
+        from server.storage import load_room_state_json, load_snapshot_state_json, save_room_state_json
+        from server.storage_models import RoomRow, SnapshotRow
+
+        u = _make_user()
+        room_id = _make_room(owner_id=u.user_id)
+        save_room_state_json(room_id, '{"room_id": "room1", "version": 3}')
+        snapshot_id = create_snapshot(room_id, "before", '{"room_id": "room1"}')
+        assert self._count(storage.engine, RoomRow) == 0
+        assert self._count(state_engine, RoomRow) == 1
+        assert self._count(state_engine, SnapshotRow) == 1
+        assert get_room_meta(room_id) is not None
+        assert load_room_state_json(room_id) == '{"room_id": "room1", "version": 3}'
+        assert load_snapshot_state_json(snapshot_id) == '{"room_id": "room1"}'
+
+        assert delete_room_record(room_id) is True
+        assert get_room_meta(room_id) is None
+        assert self._count(state_engine, RoomRow) == 0
+        assert self._count(state_engine, SnapshotRow) == 0
+
+    def test_checkpoint_and_journal_are_read_in_one_transaction(self, state_engine, monkeypatch):
+        import json
+        from sqlmodel import Session
+        from server import storage_rooms
+        from server.storage import commit_room_writes, load_room_state_json
+
+        u = _make_user()
+        room_id = _make_room(owner_id=u.user_id)
+        commit_room_writes({room_id: '{"room_id": "room1", "version": 1}'}, [])
+        commit_room_writes({}, [(room_id, 2, json.dumps({"version": 2}))])
+
+        class RacingSession(Session):
+            reads = 0
+
+            def exec(self, *args, **kwargs):
+                result = super().exec(*args, **kwargs)
+                RacingSession.reads += 1
+                if RacingSession.reads == 1:
+                    # A checkpoint lands right after the first read.
+                    with state_engine.begin() as conn:
+                        conn.exec_driver_sql("UPDATE roomrow SET state_json = '{\"version\": 3}'")
+                        conn.exec_driver_sql("DELETE FROM roomjournalrow")
+                return result
+
+        monkeypatch.setattr(storage_rooms, "Session", RacingSession)
+        assert json.loads(load_room_state_json(room_id))["version"] == 2
+        monkeypatch.setattr(storage_rooms, "Session", Session)
+        assert json.loads(load_room_state_json(room_id))["version"] == 3
+
+    def test_move_room_state_copies_then_deletes(self, tmp_path):
+        from server import storage_db
+        from server.storage_models import RoomJournalRow, RoomRow, SnapshotRow
+
+        u = _make_user()
+        for i in range(3):
+            create_room_record(
+                room_id=f"room{i}", name="Test Room", state_json="{}", owner_user_id=u.user_id, join_code=f"WHAM-MOVE0{i}"
+            )
+            create_snapshot(f"room{i}", "snap", "{}")
+        storage.commit_room_writes({}, [("room0", 1, "{}"), ("room0", 2, "{}")])
+
+        target = storage_db.make_engine(f"sqlite:///{tmp_path / 'moved.db'}")
+        try:
+            moved = storage_db.move_room_state(storage.engine, target, batch_size=2)
+            assert moved == {"roomrow": 3, "roomjournalrow": 2, "snapshotrow": 3, "snapshotchunkrow": 0}
+            for model, count in ((RoomRow, 3), (RoomJournalRow, 2), (SnapshotRow, 3)):
+                assert self._count(target, model) == count
+                assert self._count(storage.engine, model) == 0
+            # Nothing left to move on a second run.
+            assert sum(storage_db.move_room_state(storage.engine, target).values()) == 0
+        finally:
+            target.dispose()
+
+    def test_move_room_state_keeps_compressed_and_plain_blobs(self, tmp_path):
+        import json
+        import warnings
+
+        from server import storage_db
+        from server.storage_models import RoomRow
+
+        u = _make_user()
+        big = json.dumps({"notes": "x" * 2048})
+        create_room_record(room_id="packed", name="Packed", state_json=big, owner_user_id=u.user_id, join_code="WHAM-MOVEB1")
+        create_room_record(room_id="plain", name="Plain", state_json="{}", owner_user_id=u.user_id, join_code="WHAM-MOVEB2")
+        target = storage_db.make_engine(f"sqlite:///{tmp_path / 'moved.db'}")
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                storage_db.move_room_state(storage.engine, target)
+            with Session(target) as s:
+                assert isinstance(s.get(RoomRow, "packed").state_json, bytes)
+                assert s.get(RoomRow, "plain").state_json == "{}"
+        finally:
+            target.dispose()
+
+    def test_startup_refuses_a_split_before_rooms_are_moved(self, tmp_path):
+        from server import storage_db
+
+        u = _make_user()
+        _make_room(owner_id=u.user_id)
+        target = storage_db.make_engine(f"sqlite:///{tmp_path / 'rooms.db'}")
+        try:
+            storage_db.create_room_state_tables(target)
+            with pytest.raises(RuntimeError, match="move_room_state"):
+                storage_db.check_room_state_split(storage.engine, target)
+            storage_db.move_room_state(storage.engine, target)
+            storage_db.check_room_state_split(storage.engine, target)
+        finally:
+            target.dispose()
+
+    def test_init_db_keeps_room_state_tables_out_of_the_main_database(self, tmp_path, monkeypatch):
+        from sqlalchemy import inspect
+        from server import storage_db
+
+        main = storage_db.make_engine(f"sqlite:///{tmp_path / 'main.db'}")
+        state = storage_db.make_engine(f"sqlite:///{tmp_path / 'rooms.db'}")
+        monkeypatch.setattr(storage_db, "engine", main)
+        monkeypatch.setattr(storage_db, "state_engine", state)
+        try:
+            storage_db.init_db()
+            main_tables = set(inspect(main).get_table_names())
+            assert "roommetarow" in main_tables
+            assert not main_tables & {model.__tablename__ for model in storage_db.ROOM_STATE_MODELS}
+            assert "roomrow" in inspect(state).get_table_names()
+        finally:
+            main.dispose()
+            state.dispose()
+
+
+# ---------------------------------------------------------------------------
+# Compressed state blobs — storage_blobs
+# ---------------------------------------------------------------------------
+
+class TestStateBlobs:
+    def _big_state(self):
+        import json
+
+        return json.dumps({"room_id": "room1", "points": [{"x": float(i), "y": float(i)} for i in range(500)]})
+
+    def _stored(self, model, key):
+        from sqlmodel import Session
+
+        with Session(storage.engine) as s:
+            return s.get(model, key).state_json
+
+    def test_state_and_snapshots_are_compressed_at_rest(self):
+        from server.storage import load_room_state_json, load_snapshot_state_json, save_room_state_json
+        from server.storage_blobs import ZLIB_HEADER
+        from sqlmodel import Session, select
+        from server.storage_models import RoomRow, SnapshotChunkRow
+
+        big = self._big_state()
+        u = _make_user()
+        room_id = _make_room(owner_id=u.user_id)
+        save_room_state_json(room_id, big)
+        snapshot_id = create_snapshot(room_id, "snap", big)
+        with Session(storage.engine) as s:
+            chunk = s.exec(select(SnapshotChunkRow)).one()
+        for stored in (self._stored(RoomRow, room_id), chunk.data):
+            assert isinstance(stored, bytes) and stored[:1] == ZLIB_HEADER
+            assert len(stored) < len(big) // 4
+        assert load_room_state_json(room_id) == big
+        assert load_snapshot_state_json(snapshot_id) == big
+
+    def test_plain_rows_still_load_and_recompress(self):
+        from sqlmodel import Session
+        from server.storage import load_room_state_json
+        from server.storage_blobs import recompress_state_rows
+        from server.storage_models import RoomRow
+
+        big = self._big_state()
+        u = _make_user()
+        room_id = _make_room(owner_id=u.user_id)
+        with Session(storage.engine) as s:
+            row = s.get(RoomRow, room_id)
+            row.state_json = big
+            s.add(row)
+            s.commit()
+        assert load_room_state_json(room_id) == big
+
+        report = recompress_state_rows(storage.engine, "zlib", batch_size=1)
+        assert report["roomrow"]["rewritten"] == 1
+        assert report["roomrow"]["bytes_after"] < report["roomrow"]["bytes_before"]
+        assert isinstance(self._stored(RoomRow, room_id), bytes)
+        assert load_room_state_json(room_id) == big
+
+        recompress_state_rows(storage.engine, "none")
+        assert self._stored(RoomRow, room_id) == big
+
+
+# ---------------------------------------------------------------------------
+# Snapshot chunks — storage_blobs
+# ---------------------------------------------------------------------------
+
+class TestSnapshotChunks:
+    def _state(self, strokes):
+        import json
+
+        return json.dumps(
+            {"room_id": "room1", "version": 1, "strokes": strokes, "terrain": [[float(i)] * 8 for i in range(80)]},
+            separators=(",", ":"),
+        )
+
+    def _chunks(self):
+        from sqlmodel import Session, select
+        from server.storage_models import SnapshotChunkRow
+
+        with Session(storage.engine) as s:
+            return {row.digest: row.refcount for row in s.exec(select(SnapshotChunkRow)).all()}
+
+    def test_unchanged_collections_are_shared(self):
+        from server.storage import load_snapshot_state_json
+
+        u = _make_user()
+        room_id = _make_room(owner_id=u.user_id)
+        first = self._state([[1.0, 2.0]] * 60)
+        second = self._state([[3.0, 4.0]] * 60)
+        ids = [create_snapshot(room_id, "a", first), create_snapshot(room_id, "b", first), create_snapshot(room_id, "c", second)]
+        # Two strokes chunks and one terrain chunk used by all three snapshots.
+        assert sorted(self._chunks().values()) == [1, 2, 3]
+        assert [load_snapshot_state_json(i) for i in ids] == [first, first, second]
+
+    def test_replayed_state_shares_chunks_with_its_checkpoint(self):
+        import json
+        from server.storage import load_room_state_json, save_room_state_json
+
+        u = _make_user()
+        room_id = _make_room(owner_id=u.user_id)
+        state = {"room_id": room_id, "version": 1, "strokes": [{"label": "Brûlé", "points": [[1.0, 2.0]] * 40}] * 3}
+        save_room_state_json(room_id, json.dumps(state, separators=(",", ":"), ensure_ascii=False))
+        storage.commit_room_writes({}, [(room_id, 2, '{"version":2}')])
+        # Taken with a journal tail, so the state is replayed from the checkpoint.
+        create_snapshot(room_id, "tail", load_room_state_json(room_id))
+        state["version"] = 2
+        save_room_state_json(room_id, json.dumps(state, separators=(",", ":"), ensure_ascii=False))
+        create_snapshot(room_id, "checkpoint", load_room_state_json(room_id))
+        assert list(self._chunks().values()) == [2]
+
+    def test_deleting_the_room_releases_its_chunks(self):
+        from server.storage import load_snapshot_state_json
+
+        u = _make_user()
+        keep = _make_room("keep", owner_id=u.user_id)
+        gone = "gone"
+        create_room_record(room_id=gone, name="Gone", state_json="{}", owner_user_id=u.user_id, join_code="WHAM-GONE11")
+        state = self._state([[1.0, 2.0]] * 60)
+        keep_id = create_snapshot(keep, "keep", state)
+        create_snapshot(gone, "a", state)
+        create_snapshot(gone, "b", state)
+        assert sorted(self._chunks().values()) == [3, 3]
+
+        delete_room_record(gone)
+        assert sorted(self._chunks().values()) == [1, 1]
+        delete_room_record(keep)
+        assert self._chunks() == {}
+        assert load_snapshot_state_json(keep_id) is None
+
+    def test_small_or_non_object_states_stay_inline(self):
+        from server.storage import load_snapshot_state_json
+
+        u = _make_user()
+        room_id = _make_room(owner_id=u.user_id)
+        small = create_snapshot(room_id, "small", '{"a": 1}')
+        listed = create_snapshot(room_id, "list", "[1, 2, 3]")
+        assert self._chunks() == {}
+        assert load_snapshot_state_json(small) == '{"a": 1}'
+        assert load_snapshot_state_json(listed) == "[1, 2, 3]"